@@ -0,0 +1,57 @@
+"""add_secondary_indexes
+
+Revision ID: 3c9e51f0b2d7
+Revises: aa3febf53565
+Create Date: 2026-10-18 13:30:12.481936
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3c9e51f0b2d7"
+down_revision = "aa3febf53565"
+branch_labels = None
+depends_on = None
+
+# (index名, table名, column, 部分indexの条件)
+# 論理削除済の行は通常の検索対象外のため、deleted_at IS NULL の部分indexとする
+INDEXES = [
+    (
+        "ix_notes_user_id_created_at",
+        "notes",
+        ["user_id", sa.text("created_at DESC")],
+        "deleted_at IS NULL",
+    ),
+    ("ix_training_notes_note_id", "training_notes", ["note_id"], None),
+    (
+        "ix_trainings_user_id_created_at",
+        "trainings",
+        ["user_id", sa.text("created_at DESC")],
+        "deleted_at IS NULL",
+    ),
+    ("ix_profiles_user_id", "profiles", ["user_id"], None),
+    ("ix_profiles_created_at", "profiles", [sa.text("created_at DESC")], None),
+    ("ix_comments_note_id", "comments", ["note_id"], "deleted_at IS NULL"),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLYはtransaction内で実行できないため、autocommitで実行する
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns, where in INDEXES:
+            op.create_index(
+                index_name,
+                table_name,
+                columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for index_name, table_name, _, _ in reversed(INDEXES):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
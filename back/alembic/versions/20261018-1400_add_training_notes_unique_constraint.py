@@ -0,0 +1,61 @@
+"""add_training_notes_unique_constraint
+
+Revision ID: 8d41c7a2e6f3
+Revises: 3c9e51f0b2d7
+Create Date: 2026-10-18 14:00:41.906257
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "8d41c7a2e6f3"
+down_revision = "3c9e51f0b2d7"
+branch_labels = None
+depends_on = None
+
+CONSTRAINT_NAME = "uq_training_notes_note_id_training_id"
+
+
+def upgrade():
+    # 同じノート・トレーニングの重複行は、最後に登録された行のみを残す
+    op.execute(
+        """
+        DELETE FROM training_notes AS a
+        USING training_notes AS b
+        WHERE a.note_id = b.note_id
+          AND a.training_id = b.training_id
+          AND (a.created_at, a.ctid) < (b.created_at, b.ctid)
+        """
+    )
+    # 書き込みをlockしないよう、indexをCONCURRENTLYで作成してから制約に変換する
+    with op.get_context().autocommit_block():
+        op.create_index(
+            CONSTRAINT_NAME,
+            "training_notes",
+            ["note_id", "training_id"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+    op.execute(
+        f"ALTER TABLE training_notes ADD CONSTRAINT {CONSTRAINT_NAME} UNIQUE USING INDEX {CONSTRAINT_NAME}"
+    )
+    # note_idでの検索は制約のindexで行えるため、note_idのみのindexは削除する
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_training_notes_note_id",
+            table_name="training_notes",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_training_notes_note_id",
+            "training_notes",
+            ["note_id"],
+            postgresql_concurrently=True,
+        )
+    op.drop_constraint(CONSTRAINT_NAME, "training_notes", type_="unique")
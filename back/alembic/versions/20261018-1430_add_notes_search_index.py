@@ -0,0 +1,37 @@
+"""add_notes_search_index
+
+Revision ID: 5f2b8e0d9a14
+Revises: 8d41c7a2e6f3
+Create Date: 2026-10-18 14:30:27.553018
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "5f2b8e0d9a14"
+down_revision = "8d41c7a2e6f3"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_notes_search_trgm"
+# app.models.base.NOTE_SEARCH_DOCUMENT と同じ式とすること(式が異なるとindexが使用されない)
+SEARCH_DOCUMENT = "theme || ' ' || assignment || ' ' || coalesce(practice, '')"
+
+
+def upgrade():
+    # 日本語(マルチバイト文字)のtrigramを生成するため、DBのLC_CTYPEはUTF-8のlocaleであること
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CREATE INDEX CONCURRENTLYはtransaction内で実行できないため、autocommitで実行する
+    with op.get_context().autocommit_block():
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY {INDEX_NAME} ON notes "
+            f"USING gin (({SEARCH_DOCUMENT}) gin_trgm_ops) WHERE deleted_at IS NULL"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name="notes", postgresql_concurrently=True)
+    # pg_trgmは他でも使用される可能性があるため削除しない
@@ -0,0 +1,88 @@
+from collections.abc import Callable
+from typing import Any
+
+from fastapi import Depends, Form, HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_async_db
+from app.core.logger import get_logger
+from app.crud import user as user_crud
+from app.schemas.auth import CurrentUser
+
+# 複数のendpointで共通して使用するDependsを定義
+
+logger = get_logger(__name__)
+
+
+async def _get_current_user(db: AsyncSession, firebase_uid: str) -> CurrentUser:
+    user = await user_crud.resolve_current_user(db, firebase_uid)
+    if not user:
+        logger.warning(f"ユーザーが見つかりません: {firebase_uid}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません"
+        )
+    return user
+
+
+async def get_current_user(
+    firebase_uid: str,
+    db: AsyncSession = Depends(get_async_db),
+) -> CurrentUser:
+    """pathまたはqueryのfirebase_uidからユーザーを取得する
+    endpoint側と同じget_async_dbを使用するため、同一リクエスト内では同じsessionが共有される.
+    """
+    return await _get_current_user(db, firebase_uid)
+
+
+async def get_current_user_by_form(
+    firebase_uid: str = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+) -> CurrentUser:
+    """FormDataのfirebase_uidからユーザーを取得する."""
+    return await _get_current_user(db, firebase_uid)
+
+
+class SparseFields:
+    """?fields=id,theme のように、レスポンスに含めるfieldをカンマ区切りで受け取るDepends
+
+    response_schemaに存在しないfieldが指定された場合は400を返す.
+    指定されたfieldをresponse_schemaの定義順のlistで返す。未指定の場合はNone(全てのfield).
+    usage: fields: list[str] | None = Depends(SparseFields(NoteDetailResponse))
+    """
+
+    def __init__(self, response_schema: type[BaseModel]) -> None:
+        self.allowed_fields = list(response_schema.model_fields.keys())
+
+    def __call__(
+        self,
+        fields: str | None = Query(None, description="レスポンスに含めるfield(カンマ区切り)"),
+    ) -> list[str] | None:
+        if not fields:
+            return None
+        requested_fields = {field.strip() for field in fields.split(",") if field.strip()}
+        invalid_fields = requested_fields - set(self.allowed_fields)
+        if invalid_fields or not requested_fields:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"指定できないfieldです: {fields}",
+            )
+        return [field for field in self.allowed_fields if field in requested_fields]
+
+
+def to_sparse_content(
+    obj: Any,
+    fields: list[str],
+    computed_fields: dict[str, Callable[[Any], Any]] | None = None,
+) -> dict[str, Any]:
+    """objからfieldsの値のみを取り出し、JSONResponseで返せるdictにする
+    computed_fieldsには、columnではないfield(image_urlなど)の値を生成する関数を指定する.
+    """
+    computed_fields = computed_fields or {}
+    return jsonable_encoder(
+        {
+            field: computed_fields[field](obj) if field in computed_fields else getattr(obj, field)
+            for field in fields
+        }
+    )
@@ -1,6 +1,11 @@
+from typing import Any
+
 from fastapi import APIRouter
 
 from app.core.logger import get_logger
+from app.core.pool_metrics import get_pool_stats
+from app.core.query_stats import get_compiled_cache_stats
+from app.core.slow_query import get_slow_queries
 
 logger = get_logger(__name__)
 
@@ -10,3 +15,23 @@ router = APIRouter()
 @router.get("/hoge", operation_id="get_admin_hoge")
 async def get_admin_hoge() -> dict[str, str]:
     return {"response": "hoge"}
+
+
+@router.get("/db/pool", operation_id="get_admin_db_pool_stats")
+async def get_db_pool_stats() -> list[dict[str, Any]]:
+    """connection poolの利用状況(checkout数、overflow、待ち時間のヒストグラム、timeout数)を返す."""
+    return get_pool_stats()
+
+
+@router.get("/db/compiled-cache", operation_id="get_admin_db_compiled_cache_stats")
+async def get_db_compiled_cache_stats() -> list[dict[str, Any]]:
+    """engineごとのSQLのコンパイル結果のキャッシュ(hit/miss、件数)を返す."""
+    return get_compiled_cache_stats()
+
+
+@router.get("/db/slow-queries", operation_id="get_admin_db_slow_queries")
+async def get_db_slow_queries() -> list[dict[str, Any]]:
+    """閾値を超えたSQL(SQLの形、bind parameterの型、実行時間、endpoint、実行計画)を最大実行時間の降順で返す
+    SLOW_QUERY_LOG_ENABLED=Trueの場合のみ記録される.
+    """
+    return get_slow_queries()
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, List
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models.base import Users, Profiles, Notes, Trainings, TrainingNotes
 from app.core.logger import get_logger
 
@@ -10,21 +12,21 @@ logger = get_logger(__name__)
 
 router = APIRouter()
 
+# 件数の多い一覧は、全件をORMのobjectとしてメモリに載せないよう、STREAM_YIELD_PER件ずつDBから取得しながら変換する
 
-def get_all_table_data(db: Session) -> Dict[str, List[Dict[str, Any]]]:
+
+async def get_all_table_data(db: AsyncSession) -> Dict[str, List[Dict[str, Any]]]:
     """
     システム内の全テーブルデータを取得する関数
     """
 
     # 全ユーザー情報（削除されたものも含む）
     users = []
-    user_records = (
-        db.query(Users)
-        .execution_options(include_deleted=True)  # 削除済みデータも含める
+    async for user in await db.stream_scalars(
+        select(Users)
+        .execution_options(include_deleted=True, yield_per=settings.STREAM_YIELD_PER)  # 削除済みデータも含める
         .order_by(Users.created_at.desc())
-        .all()
-    )
-    for user in user_records:
+    ):
         users.append(
             {
                 "id": str(user.id),
@@ -41,13 +43,11 @@ def get_all_table_data(db: Session) -> Dict[str, List[Dict[str, Any]]]:
 
     # 全プロフィール情報（削除されたものも含む）
     profiles = []
-    profile_records = (
-        db.query(Profiles)
-        .execution_options(include_deleted=True)  # 削除済みデータも含める
+    async for profile in await db.stream_scalars(
+        select(Profiles)
+        .execution_options(include_deleted=True, yield_per=settings.STREAM_YIELD_PER)  # 削除済みデータも含める
         .order_by(Profiles.created_at.desc())
-        .all()
-    )
-    for profile in profile_records:
+    ):
         profiles.append(
             {
                 "id": str(profile.id),
@@ -70,13 +70,11 @@ def get_all_table_data(db: Session) -> Dict[str, List[Dict[str, Any]]]:
 
     # 全ノート情報（削除されたものも含む）
     notes = []
-    note_records = (
-        db.query(Notes)
-        .execution_options(include_deleted=True)  # 削除済みデータも含める
+    async for note in await db.stream_scalars(
+        select(Notes)
+        .execution_options(include_deleted=True, yield_per=settings.STREAM_YIELD_PER)  # 削除済みデータも含める
         .order_by(Notes.created_at.desc())
-        .all()
-    )
-    for note in note_records:
+    ):
         notes.append(
             {
                 "id": str(note.id),
@@ -97,13 +95,11 @@ def get_all_table_data(db: Session) -> Dict[str, List[Dict[str, Any]]]:
 
     # 全トレーニング情報（削除されたものも含む）
     trainings = []
-    training_records = (
-        db.query(Trainings)
-        .execution_options(include_deleted=True)  # 削除済みデータも含める
+    async for training in await db.stream_scalars(
+        select(Trainings)
+        .execution_options(include_deleted=True, yield_per=settings.STREAM_YIELD_PER)  # 削除済みデータも含める
         .order_by(Trainings.created_at.desc())
-        .all()
-    )
-    for training in training_records:
+    ):
         trainings.append(
             {
                 "id": str(training.id),
@@ -120,13 +116,11 @@ def get_all_table_data(db: Session) -> Dict[str, List[Dict[str, Any]]]:
 
     # 全トレーニングノート関連情報（削除されたものも含む）
     training_notes = []
-    tn_records = (
-        db.query(TrainingNotes)
-        .execution_options(include_deleted=True)  # 削除済みデータも含める
+    async for tn in await db.stream_scalars(
+        select(TrainingNotes)
+        .execution_options(include_deleted=True, yield_per=settings.STREAM_YIELD_PER)  # 削除済みデータも含める
         .order_by(TrainingNotes.created_at.desc())
-        .all()
-    )
-    for tn in tn_records:
+    ):
         training_notes.append(
             {
                 "id": str(tn.id),
@@ -148,8 +142,8 @@ def get_all_table_data(db: Session) -> Dict[str, List[Dict[str, Any]]]:
     }
 
 
-def get_user_related_data(
-    db: Session,
+async def get_user_related_data(
+    db: AsyncSession,
     user_id: str,
 ) -> Dict[str, Any]:
     """
@@ -158,12 +152,12 @@ def get_user_related_data(
 
     # プロフィール情報取得（削除されたものも含む）
     my_profile = None
-    profile = (
-        db.query(Profiles)
-        .filter(Profiles.user_id == user_id)
+    result = await db.execute(
+        select(Profiles)
+        .where(Profiles.user_id == user_id)
         .execution_options(include_deleted=True)
-        .first()
     )
+    profile = result.scalars().first()
     if profile:
         my_profile = {
             "id": str(profile.id),
@@ -184,14 +178,12 @@ def get_user_related_data(
 
     # ノート情報取得（削除されたものも含む）
     my_notes = []
-    note_records = (
-        db.query(Notes)
-        .filter(Notes.user_id == user_id)
-        .execution_options(include_deleted=True)
+    async for note in await db.stream_scalars(
+        select(Notes)
+        .where(Notes.user_id == user_id)
+        .execution_options(include_deleted=True, yield_per=settings.STREAM_YIELD_PER)
         .order_by(Notes.created_at.desc())
-        .all()
-    )
-    for note in note_records:
+    ):
         my_notes.append(
             {
                 "id": str(note.id),
@@ -211,14 +203,12 @@ def get_user_related_data(
 
     # トレーニング情報取得（削除されたものも含む）
     my_trainings = []
-    training_records = (
-        db.query(Trainings)
-        .filter(Trainings.user_id == user_id)
-        .execution_options(include_deleted=True)
+    async for training in await db.stream_scalars(
+        select(Trainings)
+        .where(Trainings.user_id == user_id)
+        .execution_options(include_deleted=True, yield_per=settings.STREAM_YIELD_PER)
         .order_by(Trainings.created_at.desc())
-        .all()
-    )
-    for training in training_records:
+    ):
         my_trainings.append(
             {
                 "id": str(training.id),
@@ -234,15 +224,13 @@ def get_user_related_data(
 
     # トレーニングノート関連情報（削除されたものも含む）
     my_training_notes = []
-    training_note_records = (
-        db.query(TrainingNotes)
+    async for tn in await db.stream_scalars(
+        select(TrainingNotes)
         .join(Notes, TrainingNotes.note_id == Notes.id)
-        .filter(Notes.user_id == user_id)
-        .execution_options(include_deleted=True)
+        .where(Notes.user_id == user_id)
+        .execution_options(include_deleted=True, yield_per=settings.STREAM_YIELD_PER)
         .order_by(TrainingNotes.created_at.desc())
-        .all()
-    )
-    for tn in training_note_records:
+    ):
         my_training_notes.append(
             {
                 "id": str(tn.id),
@@ -266,7 +254,7 @@ def get_user_related_data(
 @router.get("/data", response_model=Dict[str, Any])
 async def get_user_data(
     firebase_uid: str = Query(..., description="Firebase UID of the user"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     特定ユーザーの情報を取得するエンドポイント
@@ -274,12 +262,12 @@ async def get_user_data(
     """
 
     # ユーザーが存在するか確認（削除されたユーザーも含む）
-    user = (
-        db.query(Users)
-        .filter(Users.firebase_uid == firebase_uid)
+    result = await db.execute(
+        select(Users)
+        .where(Users.firebase_uid == firebase_uid)
         .execution_options(include_deleted=True)
-        .first()
     )
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -295,14 +283,14 @@ async def get_user_data(
     }
 
     # ヘルパー関数を使用してユーザー関連データを取得
-    my_data = get_user_related_data(db, user.id)
+    my_data = await get_user_related_data(db, user.id)
 
     return {"current_user": current_user, "my_data": my_data}
 
 
 @router.get("/all-data", response_model=Dict[str, Any])
 async def get_all_data(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     全データを取得するエンドポイント
@@ -310,4 +298,4 @@ async def get_all_data(
     """
 
     # ヘルパー関数を使用して全テーブル情報を取得
-    return get_all_table_data(db)
+    return await get_all_table_data(db)
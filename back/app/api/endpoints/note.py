@@ -6,25 +6,89 @@ from fastapi import (
     Form,
     File,
     UploadFile,
+    Query,
 )
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session, joinedload
 
-from typing import Optional
+from typing import Any, Optional
+from datetime import date
+import asyncio
 import json
 
-from app.core.database import get_async_db, get_db
-from app.schemas.note import NoteResponse, NoteListResponse, NoteDetailResponse
+from app.api.deps import (
+    SparseFields,
+    get_current_user,
+    get_current_user_by_form,
+    to_sparse_content,
+)
+from app.core.database import get_async_db
+from app.schemas.note import (
+    NoteResponse,
+    NoteListItem,
+    NoteListResponse,
+    NoteDetailResponse,
+    NoteDetailsRequest,
+    NoteDetailsResponse,
+    NoteSearchResponse,
+)
 from app.crud import note as note_crud
+from app.crud import training as training_crud
 from app.crud import user as user_crud
-from app.models.base import TrainingNotes, Users
+from app.crud.loader import get_by_id_loader
+from app.schemas.auth import CurrentUser
+from app.models.base import Notes, TrainingNotes
 from app.utils.video import validate_video, save_note_video
 from app.core.logger import get_logger
-from app.utils.video import delete_note_video
+from app.utils.video import delete_note_video, get_video_url_async
 
 from uuid import UUID
 
 logger = get_logger(__name__)
+
+
+def _to_training_note_detail(tn: TrainingNotes) -> dict[str, Any]:
+    """ノート詳細のtraining_notesの1件分のデータ"""
+    return {
+        "id": tn.id,
+        "training_id": tn.training_id,
+        "note_id": tn.note_id,
+        "count": tn.count,
+        "created_at": tn.created_at,
+        "updated_at": tn.updated_at,
+        "training": {"id": tn.training.id, "menu": tn.training.menu}
+        if tn.training
+        else None,
+    }
+
+
+def _to_note_detail_response(
+    note: Notes, my_video_url: Optional[str] = None
+) -> NoteDetailResponse:
+    """トレーニングノート・トレーニング情報を読み込み済のノートから、ノート詳細のレスポンスを生成する
+    my_video_urlはget_video_url_asyncで生成したものを渡す
+    """
+    return NoteDetailResponse.model_validate(
+        {
+            "id": note.id,
+            "user_id": note.user_id,
+            "theme": note.theme,
+            "assignment": note.assignment,
+            "practice_video": note.practice_video,
+            "my_video": note.my_video,
+            "my_video_url": my_video_url,
+            "weight": note.weight,
+            "sleep": note.sleep,
+            "looked_day": note.looked_day,
+            "practice": note.practice,
+            "created_at": note.created_at,
+            "updated_at": note.updated_at,
+            "training_notes": [_to_training_note_detail(tn) for tn in note.training_notes],
+        }
+    )
+
+
 router = APIRouter()
 
 
@@ -32,7 +96,6 @@ router = APIRouter()
     "/create", response_model=NoteResponse, status_code=status.HTTP_201_CREATED
 )
 async def create_note(
-    firebase_uid: str = Form(...),
     theme: str = Form(...),
     assignment: str = Form(...),
     weight: float = Form(...),
@@ -42,16 +105,11 @@ async def create_note(
     practice: Optional[str] = Form(""),
     trainings: str = Form(...),  # JSONデータが文字列として送信される
     my_video: Optional[UploadFile] = File(None),
+    user: CurrentUser = Depends(get_current_user_by_form),
     db: AsyncSession = Depends(get_async_db),
 ):
     """野球ノートを新規作成する"""
     try:
-        # ユーザーの取得
-        user = await user_crud.get_user_by_firebase_uid_async(db, firebase_uid)
-        if not user:
-            logger.warning(f"ユーザーが見つかりません: {firebase_uid}")
-            raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
-
         # 動画ファイルの処理
         video_path = None
         if my_video:
@@ -70,21 +128,11 @@ async def create_note(
             "trainings": trainings,  # 文字列のまま渡してCRUD内でパースする
         }
 
-        # ノートの作成
-        created_note = await note_crud.create_note(
+        # ノートの作成(登録したトレーニングノートもRETURNINGで返されるため、再取得しない)
+        created_note, training_notes = await note_crud.create_note(
             db=db, user_id=user.id, note_data=note_data, video_path=video_path
         )
 
-        # SQLAlchemyモデルを直接変換するのではなく、
-        # トレーニングノートを別途取得して辞書を作成
-        from sqlalchemy import select
-        from app.models.base import TrainingNotes
-
-        # トレーニングノートを明示的に取得
-        stmt = select(TrainingNotes).where(TrainingNotes.note_id == created_note.id)
-        result = await db.execute(stmt)
-        training_notes = result.scalars().all()
-
         # 手動でレスポンス用の辞書を構築
         response_dict = {
             "id": created_note.id,
@@ -99,7 +147,6 @@ async def create_note(
             "practice": created_note.practice,
             "created_at": created_note.created_at,
             "updated_at": created_note.updated_at,
-            # トレーニングノートを明示的に変換
             "training_notes": [
                 {
                     "id": tn.id,
@@ -132,20 +179,31 @@ async def create_note(
 
 
 @router.get("/get/{firebase_uid}", response_model=NoteListResponse)
-def get_user_notes(
-    firebase_uid: str,
-    db: Session = Depends(get_db),
+async def get_user_notes(
+    user: CurrentUser = Depends(get_current_user),
+    fields: Optional[list[str]] = Depends(SparseFields(NoteListItem)),
+    per_page: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """自分で作成したノートの一覧を取得します"""
+    """自分で作成したノートの一覧を、作成日時の新しい順に取得します
+    ?fields=id,theme のように指定した場合は、そのfieldのみを返します
+    ?from=2026-01-01&to=2026-01-31 のように指定した場合は、その期間に作成したノートのみを返します
+    ?per_page=20 を指定した場合は20件ずつ返し、次のページはnext_cursorを ?cursor= に指定して取得します
+    """
     try:
-        # ユーザーの取得
-        user = user_crud.get_user_by_firebase_uid(db, firebase_uid)
-        if not user:
-            logger.warning(f"ユーザーが見つかりません: {firebase_uid}")
-            raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
-
-        notes = note_crud.get_note(db, user.id)
-        return {"items": notes}
+        notes, next_cursor = await note_crud.get_note(
+            db, user.id, fields, per_page, cursor, from_date, to_date
+        )
+        if fields is not None:
+            return JSONResponse(
+                content={"items": jsonable_encoder(notes), "next_cursor": next_cursor}
+            )
+        return {"items": notes, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"ノート取得エラー:{str(e)}", exc_info=True)
         raise HTTPException(
@@ -154,27 +212,64 @@ def get_user_notes(
 
 
 @router.get("/user/{user_id}", response_model=NoteListResponse)
-def get_users_notes_by_user_id(
+async def get_users_notes_by_user_id(
     user_id: UUID,
-    db: Session = Depends(get_db),
+    fields: Optional[list[str]] = Depends(SparseFields(NoteListItem)),
+    per_page: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """user_idと一致するノートの一覧を取得します"""
+    """user_idと一致するノートの一覧を、作成日時の新しい順に取得します
+    ?fields=, ?from=, ?to=, ?per_page=, ?cursor= は /get/{firebase_uid} と同じです
+    """
     try:
-        user = db.query(Users).filter(Users.id == user_id).first()
+        user = await user_crud.get_user_by_id(db, user_id)
         if not user:
             logger.warning(f"{user_id}: idに該当するユーザーが見つかりません")
             return {"items": []}
-        notes = note_crud.get_note(db, user_id)
-        return {"items": notes}
+        notes, next_cursor = await note_crud.get_note(
+            db, user_id, fields, per_page, cursor, from_date, to_date
+        )
+        if fields is not None:
+            return JSONResponse(
+                content={"items": jsonable_encoder(notes), "next_cursor": next_cursor}
+            )
+        return {"items": notes, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.info(f"ノート一覧取得に失敗しました: {str(e)}", exc_info=True)
         return {"items": []}
 
 
+@router.get("/search", response_model=NoteSearchResponse)
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=100),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    user_id: Optional[UUID] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+) -> dict[str, Any]:
+    """theme, assignment, practiceにキーワードを含むノートを検索します
+    ?q=バッティング 素振り のように空白で区切った場合は、全てのキーワードを含むノートを返します
+    ?user_id= を指定した場合は、そのユーザーのノートのみを検索します
+    """
+    try:
+        notes, has_next = await note_crud.search_notes(db, q, page, per_page, user_id)
+        return {"items": notes, "page": page, "per_page": per_page, "has_next": has_next}
+    except Exception as e:
+        logger.error(f"ノート検索エラー: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500, detail=f"ノート検索中にエラーが発生しました: {str(e)}"
+        )
+
+
 @router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_note(note_id: UUID, db: Session = Depends(get_db)):
+async def delete_note(note_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """指定されたIDのノートを論理削除します"""
-    success = note_crud.delete_note(db, note_id)
+    success = await note_crud.delete_note(db, note_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="ノートが見つかりません"
@@ -183,56 +278,87 @@ def delete_note(note_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/detail/{note_id}", response_model=NoteDetailResponse)
-def get_note_detail(note_id: UUID, db: Session = Depends(get_db)):
-    """ノートの詳細情報を取得します"""
+async def get_note_detail(
+    note_id: UUID,
+    fields: Optional[list[str]] = Depends(SparseFields(NoteDetailResponse)),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """ノートの詳細情報を取得します
+    ?fields=id,theme のように指定した場合は、そのfieldのみを取得して返します
+    """
     try:
-        # ノート詳細の取得
-        note_detail = note_crud.get_note_detail(db, note_id)
+        # 同じノートの詳細は、更新・削除されるまでキャッシュから返す(DBに問い合わせない)
+        if fields is None:
+            cached_response = note_crud.note_detail_cache.get(note_id)
+            if cached_response is not None:
+                return cached_response
+
+        # ノート詳細の取得(トレーニングノート・トレーニング情報も1回のSELECTで取得する)
+        note_detail = await note_crud.get_note_detail(db, note_id, fields)
         if not note_detail:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="ノートが見つかりません"
             )
-        # トレーニングデータを別途取得（確実に全件取得するため）
-        # joinして、TrainingNotes テーブルと、それとリレーションを持つ training テーブルを内部結合して、一緒に情報を取得する
-        training_notes = (
-            db.query(TrainingNotes)
-            .join(TrainingNotes.training)
-            .filter(TrainingNotes.note_id == note_id)
-            .all()
+        my_video_url = None
+        if fields is None or "my_video_url" in fields:
+            my_video_url = await get_video_url_async(note_detail.my_video)
+        if fields is not None:
+            # columnではないfieldの値の生成方法
+            computed_fields = {
+                "my_video_url": lambda note: my_video_url,
+                "training_notes": lambda note: [
+                    _to_training_note_detail(tn) for tn in note.training_notes
+                ],
+            }
+            return JSONResponse(
+                content=to_sparse_content(note_detail, fields, computed_fields)
+            )
+
+        response = _to_note_detail_response(note_detail, my_video_url)
+        note_crud.set_note_detail_cache(db, note_id, response)
+        return response
+    except Exception as e:
+        logger.error(f"ノート詳細取得エラー: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"ノート詳細取得中にエラーが発生しました: {str(e)}",
         )
 
-        response_data = {
-            "id": note_detail.id,
-            "user_id": note_detail.user_id,
-            "theme": note_detail.theme,
-            "assignment": note_detail.assignment,
-            "practice_video": note_detail.practice_video,
-            "my_video": note_detail.my_video,
-            "weight": note_detail.weight,
-            "sleep": note_detail.sleep,
-            "looked_day": note_detail.looked_day,
-            "practice": note_detail.practice,
-            "created_at": note_detail.created_at,
-            "updated_at": note_detail.updated_at,
-            "training_notes": [
-                {
-                    "id": tn.id,
-                    "training_id": tn.training_id,
-                    "note_id": tn.note_id,
-                    "count": tn.count,
-                    "created_at": tn.created_at,
-                    "updated_at": tn.updated_at,
-                    "training": {"id": tn.training.id, "menu": tn.training.menu}
-                    if tn.training
-                    else None,
-                }
-                for tn in training_notes
-            ],
+
+@router.post("/details", response_model=NoteDetailsResponse)
+async def get_note_details(
+    request: NoteDetailsRequest,
+    db: AsyncSession = Depends(get_async_db),
+) -> dict[str, Any]:
+    """複数のノートの詳細情報をまとめて取得します
+    note_idsの順で返します。存在しない(削除済の)ノートは含みません
+    """
+    try:
+        note_ids = list(dict.fromkeys(request.note_ids))
+        # キャッシュに無いノートのみを、トレーニングノート・トレーニング情報と一緒に1回のSELECTで取得する
+        responses = {
+            note_id: cached_response
+            for note_id in note_ids
+            if (cached_response := note_crud.note_detail_cache.get(note_id)) is not None
         }
+        notes = await note_crud.get_note_details(
+            db, [note_id for note_id in note_ids if note_id not in responses]
+        )
 
-        return NoteDetailResponse.model_validate(response_data)
+        # 動画URLの生成(Firebase Storageへのアクセス)は、threadで並行して実行する
+        video_urls = await asyncio.gather(
+            *(get_video_url_async(note.my_video) for note in notes)
+        )
+        for note, video_url in zip(notes, video_urls):
+            response = _to_note_detail_response(note, video_url)
+            note_crud.set_note_detail_cache(db, note.id, response)
+            responses[note.id] = response
+
+        return {
+            "items": [responses[note_id] for note_id in note_ids if note_id in responses]
+        }
     except Exception as e:
-        logger.error(f"ノート詳細取得エラー: {str(e)}", exc_info=True)
+        logger.error(f"ノート詳細一括取得エラー: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"ノート詳細取得中にエラーが発生しました: {str(e)}",
@@ -242,7 +368,6 @@ def get_note_detail(note_id: UUID, db: Session = Depends(get_db)):
 @router.put("/{note_id}", response_model=NoteDetailResponse)
 async def update_note(
     note_id: UUID,
-    firebase_uid: str = Form(...),
     theme: str = Form(...),
     assignment: str = Form(...),
     weight: float = Form(...),
@@ -253,20 +378,14 @@ async def update_note(
     trainings: str = Form(...),  # JSONデータが文字列として送信される
     my_video: Optional[UploadFile] = File(None),
     delete_video: bool = Form(False),
+    user: CurrentUser = Depends(get_current_user_by_form),
     db: AsyncSession = Depends(get_async_db),
 ):
     """野球ノートを更新する"""
     try:
-        # ユーザーの取得と認証
-        user = await user_crud.get_user_by_firebase_uid_async(db, firebase_uid)
-        if not user:
-            logger.warning(f"ユーザーが見つかりません: {firebase_uid}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません"
-            )
-
-        # ノートの存在確認と所有権チェック(dbを非同期処理で行っているので、こちらの取得方法も非同期処理で統一している。)
-        note = await note_crud.get_note_detail_async(db, note_id)
+        # ノートの存在確認と所有権チェック
+        # (dbを非同期処理で行っているので、こちらの取得方法も非同期処理で統一している。)
+        note = await note_crud.get_note_detail(db, note_id)
         if not note:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="ノートが見つかりません"
@@ -278,6 +397,12 @@ async def update_note(
                 detail="このノートを編集する権限がありません",
             )
 
+        # 取得済のトレーニング情報をloaderに登録し、更新後のレスポンスの生成時に再取得しないようにする
+        training_loader = get_by_id_loader(db, training_crud.training_crud_base)
+        for tn in note.training_notes:
+            if tn.training is not None:
+                training_loader.prime(tn.training)
+
         # 動画ファイルの処理
         video_path = note.my_video  # もともと存在していた動画のパス
 
@@ -315,22 +440,18 @@ async def update_note(
             "trainings": trainings,  # 文字列のまま渡してCRUD内でパースする
         }
 
-        # ノートの更新
-        updated_note = await note_crud.update_note(
+        # ノートの更新(更新後のトレーニングノートも返されるため、再取得しない)
+        updated = await note_crud.update_note(
             db=db, note_id=note_id, note_data=note_data
         )
-        # レスポンスデータの構築（get_note_detailと同様の方法で）
-        from sqlalchemy import select
-        from app.models.base import TrainingNotes
-
-        # トレーニングノートを明示的に取得（updated_noteにトレーニングはリターンされていないため、手動で取得してレスポンスに挿入する）
-        stmt = (
-            select(TrainingNotes)
-            .options(joinedload(TrainingNotes.training))
-            .where(TrainingNotes.note_id == note_id)
-        )
-        result = await db.execute(stmt)
-        training_notes = result.unique().scalars().all()
+        if updated is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="ノートが見つかりません"
+            )
+        updated_note, training_notes = updated
+        # トレーニング情報はloaderから取得する
+        # (prime済のものは再取得せず、追加したトレーニングのみ1回のSELECTで取得する)
+        loaded_trainings = await training_loader.load_many(tn.training_id for tn in training_notes)
 
         response_data = {
             "id": updated_note.id,
@@ -339,6 +460,7 @@ async def update_note(
             "assignment": updated_note.assignment,
             "practice_video": updated_note.practice_video,
             "my_video": updated_note.my_video,
+            "my_video_url": await get_video_url_async(updated_note.my_video),
             "weight": updated_note.weight,
             "sleep": updated_note.sleep,
             "looked_day": updated_note.looked_day,
@@ -353,11 +475,11 @@ async def update_note(
                     "count": tn.count,
                     "created_at": tn.created_at,
                     "updated_at": tn.updated_at,
-                    "training": {"id": tn.training.id, "menu": tn.training.menu}
-                    if tn.training
+                    "training": {"id": training.id, "menu": training.menu}
+                    if training
                     else None,
                 }
-                for tn in training_notes
+                for tn, training in zip(training_notes, loaded_trainings)
             ],
         }
 
@@ -3,6 +3,8 @@ from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from datetime import datetime, date
+from fastapi.responses import JSONResponse
+from app.api.deps import SparseFields, get_current_user_by_form, to_sparse_content
 from app.core.database import get_async_db
 from app.crud import profile as profile_crud
 from app.schemas.profile import (
@@ -12,9 +14,13 @@ from app.schemas.profile import (
     ResponseProfileList,
 )
 from app.core.logger import get_logger
-from app.utils.image import save_profile_image, delete_profile_image, validate_image
-from app.models.base import Users
-from sqlalchemy import select
+from app.utils.image import (
+    save_profile_image,
+    delete_profile_image,
+    validate_image,
+    get_image_url,
+)
+from app.schemas.auth import CurrentUser
 
 logger = get_logger(__name__)
 
@@ -22,6 +28,13 @@ logger = get_logger(__name__)
 # ここでrouter = APIRouter(prefix="/profiles",  # "/profiles" tags=["profiles"])は必要ない
 # main.pyでファイル名がパスになるように設定している
 router = APIRouter()
+
+# プロフィールのcolumnではないfieldの値の生成方法(?fields=指定時)
+PROFILE_COMPUTED_FIELDS = {
+    "image_url": lambda profile: get_image_url(profile.image_path)
+    if profile.image_path
+    else None,
+}
 # パスでログインした時の処理
 # @router.post('/')  # プロフィール作成のエンドポイント
 # @router.get('/{user_id}')  # プロフィール取得のエンドポイント
@@ -37,10 +50,10 @@ async def create_profile_endpoint(
     birthday: str = Form(...),
     player_dominant: str = Form(...),
     player_position: str = Form(...),
-    firebase_uid: str = Form(...),
     admired_player: Optional[str] = Form(None),
     introduction: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
+    user: CurrentUser = Depends(get_current_user_by_form),
     db: AsyncSession = Depends(get_async_db),
 ):
     try:
@@ -86,15 +99,7 @@ async def create_profile_endpoint(
                 status_code=400, detail="生年月日の形式が正しくありません"
             )
 
-        try:
-            # Firebase UIDとしてユーザーを検索
-            user_result = await db.execute(
-                select(Users).where(Users.firebase_uid == firebase_uid)
-            )
-            user = user_result.scalar_one_or_none()
-            user_id = user.id
-        except ValueError as e:
-            raise HTTPException(status_code=404, detail=f"{e}ユーザーが見つかりません")
+        user_id = user.id
 
         image_path = None  # プロフィール作成なので、画像は保存されていない状態
         # Firebaseに保存してから、URLを作成するためのパスのみを取得している
@@ -139,16 +144,30 @@ async def create_profile_endpoint(
     response_model=ResponseProfileList,
     operation_id="get_all_profile",
 )
-async def get_all_profile(db: AsyncSession = Depends(get_async_db)):
+async def get_all_profile(
+    fields: Optional[list[str]] = Depends(SparseFields(ResponseProfile)),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # ?fields=id,name のように指定した場合は、そのfieldのみを取得して返す
     try:
         logger.info("全選手のプロフィール取得のリクエスト受信成功")
         try:
-            all_profiles = await profile_crud.get_all_profile(db)
+            all_profiles = await profile_crud.get_all_profile(db, fields)
 
             if not all_profiles:
                 logger.info("プロフィールが見つかりません")
                 return {"items": []}  # 空のリストを返す（エラーではない）
 
+            if fields is not None:
+                return JSONResponse(
+                    content={
+                        "items": [
+                            to_sparse_content(profile, fields, PROFILE_COMPUTED_FIELDS)
+                            for profile in all_profiles
+                        ]
+                    }
+                )
+
             # 各プロフィールをResponseProfileモデルに変換（None値をフィルタリング）
             response_profiles = []
             for profile in all_profiles:
@@ -177,14 +196,19 @@ async def get_all_profile(db: AsyncSession = Depends(get_async_db)):
     "/{firebase_uid}", response_model=ResponseProfile, operation_id="get_profile"
 )
 async def get_profile_endpoint(
-    firebase_uid: str, db: AsyncSession = Depends(get_async_db)
+    firebase_uid: str,
+    fields: Optional[list[str]] = Depends(SparseFields(ResponseProfile)),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    # ?fields=id,name のように指定した場合は、そのfieldのみを取得して返す
     try:
         logger.info("プロフィール取得リクエスト受信成功")
         # プロフィール取得
         try:
             # Firebase UIDとして検索
-            profile = await profile_crud.get_profile_by_firebase_uid(db, firebase_uid)
+            profile = await profile_crud.get_profile_by_firebase_uid(
+                db, firebase_uid, fields
+            )
         except ValueError as e:
             raise HTTPException(
                 status_code=404, detail=f"{e}プロフィールが存在しません"
@@ -194,6 +218,10 @@ async def get_profile_endpoint(
             logger.info(f"ユーザー{firebase_uid}のプロフィールが存在しません")
 
         logger.info("プロフィール取得成功")
+        if fields is not None and profile is not None:
+            return JSONResponse(
+                content=to_sparse_content(profile, fields, PROFILE_COMPUTED_FIELDS)
+            )
         response_profile = ResponseProfile.model_validate(profile)
         return response_profile
     except HTTPException:
@@ -336,18 +364,25 @@ async def update_profile_endpoint(
     operation_id="get_profile_by_user_id",
 )
 async def get_profile_by_user_id_endpoint(
-    user_id: UUID, db: AsyncSession = Depends(get_async_db)
+    user_id: UUID,
+    fields: Optional[list[str]] = Depends(SparseFields(ResponseProfile)),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    # ?fields=id,name のように指定した場合は、そのfieldのみを取得して返す
     try:
         logger.info(f"ユーザーID {user_id} からプロフィール取得リクエスト受信")
         # プロフィール取得
-        profile = await profile_crud.get_profile_by_user_id(db, user_id)
+        profile = await profile_crud.get_profile_by_user_id(db, user_id, fields)
 
         if profile is None:
             logger.info(f"ユーザーID {user_id} のプロフィールが存在しません")
             raise HTTPException(status_code=404, detail="プロフィールが存在しません")
 
         logger.info(f"ユーザーID {user_id} のプロフィール取得成功")
+        if fields is not None:
+            return JSONResponse(
+                content=to_sparse_content(profile, fields, PROFILE_COMPUTED_FIELDS)
+            )
         response_profile = ResponseProfile.model_validate(profile)
         return response_profile
     except HTTPException:
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from app.core.database import get_db
+from app.api.deps import get_current_user
+from app.core.database import get_async_db
+from app.schemas.auth import CurrentUser
 from app.schemas.training import TrainingCreate, TrainingResponse, TrainingList
 from app.crud import training as training_crud
+from app.crud import user as user_crud
 from app.core.logger import get_logger
 
 
@@ -16,25 +19,34 @@ router = APIRouter()
 @router.post(
     "/menu", response_model=TrainingResponse, status_code=status.HTTP_201_CREATED
 )
-def create_training_menu(training_data: TrainingCreate, db: Session = Depends(get_db)):
+async def create_training_menu(
+    training_data: TrainingCreate, db: AsyncSession = Depends(get_async_db)
+):
     """新しいトレーニングメニューを作成します"""
-    return training_crud.create_training(db, training_data)
+    user = await user_crud.resolve_current_user(db, training_data.firebase_uid)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません"
+        )
+    return await training_crud.create_training(db, training_data, user.id)
 
 
 @router.get("/menu/list", response_model=TrainingList)
-def read_training_menu(
-    firebase_uid: str = Query(..., description="ユーザーのFirebase UID"),
-    db: Session = Depends(get_db),
+async def read_training_menu(
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """自分で追加したトレーニングメニュー一覧を取得します"""
-    trainings = training_crud.get_specific_trainings(db, firebase_uid)
+    trainings = await training_crud.get_specific_trainings(db, user.id)
     return {"items": trainings}
 
 
 @router.delete("/menu/{training_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_training_menu(training_id: UUID, db: Session = Depends(get_db)):
+async def delete_training_menu(
+    training_id: UUID, db: AsyncSession = Depends(get_async_db)
+):
     """指定されたIDのトレーニングメニューを削除します"""
-    success = training_crud.delete_training(db, training_id)
+    success = await training_crud.delete_training(db, training_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -44,7 +56,7 @@ def delete_training_menu(training_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/menu/all", response_model=TrainingList)
-def read_all_training_menus(db: Session = Depends(get_db)):
+async def read_all_training_menus(db: AsyncSession = Depends(get_async_db)):
     """すべてのトレーニングメニューを取得します"""
-    trainings = training_crud.get_all_trainings(db)
+    trainings = await training_crud.get_all_trainings(db)
     return {"items": trainings}
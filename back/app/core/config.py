@@ -28,6 +28,54 @@ class Settings(BaseSettings):
     DB_NAME: str = ""
     DB_USER_NAME: str = ""
     DB_PASSWORD: str = ""
+    # 同期engine(psycopg2)を作成するかどうか。endpointは全てasync_engineを使用するため通常は不要
+    DB_SYNC_ENGINE_ENABLED: bool = False
+    # connection poolの設定(デフォルト値はsqlalchemyのデフォルトと同じ)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1  # 秒。-1の場合は再接続しない
+    # SQLのコンパイル結果のキャッシュ件数(sqlalchemyのデフォルトと同じ)
+    DB_QUERY_CACHE_SIZE: int = 500
+    # 読み取り専用のreplica。"host"または"host:port"の形式で指定する(認証情報とDB名はprimaryと共通)
+    DB_REPLICA_HOSTS: list[str] = []
+    # firebase_uid -> (user_id, role) のキャッシュ設定。0を指定するとキャッシュしない
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10000
+    # ノート詳細(GET /note/detail/{note_id})のレスポンスのキャッシュ設定。0を指定するとキャッシュしない
+    NOTE_DETAIL_CACHE_TTL_SECONDS: int = 60
+    NOTE_DETAIL_CACHE_MAX_SIZE: int = 1000
+    # ノート一覧で返すassignmentの最大文字数(SQLで切り詰める)。0を指定すると切り詰めない
+    NOTE_LIST_ASSIGNMENT_PREVIEW_LENGTH: int = 100
+    # ノート詳細の一括取得(POST /note/details)で1回に指定できるノートの最大数
+    NOTE_DETAILS_MAX_IDS: int = 50
+    # ノート一覧の期間指定(from_date, to_date)の日付の区切りとするタイムゾーン
+    NOTE_DATE_TIMEZONE: str = "Asia/Tokyo"
+    # ページングの総件数の設定
+    # cachedの場合のキャッシュ期間と件数、cappedの場合に数える件数の上限
+    PAGING_COUNT_CACHE_TTL_SECONDS: int = 30
+    PAGING_COUNT_CACHE_MAX_SIZE: int = 1000
+    PAGING_COUNT_CAP: int = 1000
+    # ETag(レスポンスのbodyのhash)を付与するGETのレスポンスの最大サイズ(byte)。超える場合はETagを付与しない
+    ETAG_MAX_BODY_SIZE: int = 5 * 1024 * 1024
+    # CRUDBase.bulk_createで1つのINSERT文にまとめる件数
+    BULK_CREATE_CHUNK_SIZE: int = 1000
+    # CRUDBase.stream_db_obj_listなどで1回にDBから取得(fetch)する件数
+    STREAM_YIELD_PER: int = 1000
+    # リクエストごとのSQL計測(Server-Timing, N+1検出)を行う割合(0.0〜1.0)。往復回数は常に計測する
+    QUERY_STATS_SAMPLE_RATE: float = 1.0
+    # 同じ形のクエリがこの回数を超えて実行された場合にN+1としてログに出力する
+    QUERY_STATS_N_PLUS_ONE_THRESHOLD: int = 10
+    # 1リクエストのDB時間がこの値(ms)を超えた場合に最も遅いクエリをログに出力する
+    QUERY_STATS_SLOW_REQUEST_MS: float = 500
+    # 閾値(ms)を超えたSQLを記録し、実行計画(EXPLAIN)を取得する。GET /admin/db/slow-queries で参照する
+    SLOW_QUERY_LOG_ENABLED: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200
+    SLOW_QUERY_MAX_ENTRIES: int = 200
+    SLOW_QUERY_EXPLAIN_ENABLED: bool = True
+    # 同じ形のSQLに対してEXPLAINを実行する最短間隔(秒)と、同時に実行するEXPLAINの上限
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: float = 600
+    SLOW_QUERY_EXPLAIN_MAX_CONCURRENCY: int = 1
     API_GATEWAY_STAGE_PATH: str = ""
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     SECRET_KEY: str = "secret"
@@ -43,18 +91,23 @@ class Settings(BaseSettings):
     FIREBASE_STORAGE_BUCKET: str = "web-baseball.firebasestorage.app"
     FIREBASE_SERVICE_ACCOUNT_KEY_PATH: str = ".firebase-service-account-key.json"
 
-    def get_database_url(self, is_async: bool = False) -> str:
+    def get_database_url(self, is_async: bool = False, host: str | None = None) -> str:
+        """hostを指定した場合は、そのhost(replica)への接続URLを返す."""
+        db_host, db_port = self.DB_HOST, self.DB_PORT
+        if host:
+            db_host, _, port = host.partition(":")
+            db_port = port or self.DB_PORT
         if is_async:
             return (
                 "postgresql+asyncpg://"
                 f"{self.DB_USER_NAME}:{self.DB_PASSWORD}@"
-                f"{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+                f"{db_host}:{db_port}/{self.DB_NAME}"
             )
         else:
             return (
                 "postgresql://"
                 f"{self.DB_USER_NAME}:{self.DB_PASSWORD}@"
-                f"{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+                f"{db_host}:{db_port}/{self.DB_NAME}"
             )
 
     model_config = SettingsConfigDict(env_file=".env")
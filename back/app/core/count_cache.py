@@ -0,0 +1,69 @@
+import threading
+from itertools import chain
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# ページングの総件数(count)のキャッシュ
+# tableごとの世代番号をキャッシュのkeyに含め、
+# tableへの書き込み時に世代番号を進めることで、そのtableのキャッシュを無効にする
+# 書き込みはflush(ORM)、insert()/update()/delete()の実行(do_orm_execute)、commitの各時点で検知する
+
+# session.infoに、flushで書き込んだtable名を保持するkey
+_WRITTEN_TABLES_INFO_KEY = "count_cache_written_tables"
+
+count_cache: TTLCache[tuple[Any, ...], int] = TTLCache(
+    maxsize=settings.PAGING_COUNT_CACHE_MAX_SIZE, ttl=settings.PAGING_COUNT_CACHE_TTL_SECONDS
+)
+
+_generations: dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+
+def get_generation(table_name: str) -> int:
+    return _generations.get(table_name, 0)
+
+
+def invalidate_tables(table_names: set[str]) -> None:
+    """table_namesのキャッシュを無効にする."""
+    with _generations_lock:
+        for table_name in table_names:
+            _generations[table_name] = _generations.get(table_name, 0) + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_tables(session: Session, flush_context: Any) -> None:
+    table_names = {
+        inspect(obj).mapper.local_table.name for obj in chain(session.new, session.dirty, session.deleted)
+    }
+    if table_names:
+        invalidate_tables(table_names)
+        session.info.setdefault(_WRITTEN_TABLES_INFO_KEY, set()).update(table_names)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_executed_tables(execute_state: Any) -> None:
+    if not (execute_state.is_insert or execute_state.is_update or execute_state.is_delete):
+        return
+    mapper = execute_state.bind_arguments.get("mapper")
+    if mapper is not None:
+        invalidate_tables({mapper.local_table.name})
+        execute_state.session.info.setdefault(_WRITTEN_TABLES_INFO_KEY, set()).add(mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_tables(session: Session) -> None:
+    # flushからcommitまでの間に、他のリクエストが変更前の件数をキャッシュした場合に備え、commit時にも無効にする
+    table_names = session.info.pop(_WRITTEN_TABLES_INFO_KEY, None)
+    if table_names:
+        invalidate_tables(table_names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_written_tables(session: Session) -> None:
+    session.info.pop(_WRITTEN_TABLES_INFO_KEY, None)
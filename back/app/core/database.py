@@ -1,52 +1,149 @@
+import random
 from collections.abc import AsyncGenerator, Generator
+from contextvars import ContextVar
+from typing import Any
 
 from debug_toolbar.panels.sqlalchemy import SQLAlchemyPanel as BasePanel
 from fastapi import Request
-from sqlalchemy import MetaData, create_engine
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import MetaData, Select, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy.sql import text
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.config import settings
 from app.core.logger import get_logger
+from app.core.query_stats import register_query_stats
+from app.core.slow_query import register_slow_query_log
+from app.core.pool_metrics import (
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedQueuePool,
+    register_pool_metrics,
+)
 
 # データベース設定
 # データベース接続設定
 
 logger = get_logger(__name__)
 
-try:
-    engine = create_engine(
-        settings.get_database_url(),
-        pool_pre_ping=True,
-        echo=False,
-        future=True,
-    )
-    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-except Exception as e:
-    logger.error(f"DB connection error. detail={e}")
+# 各engineで共通のconnection pool設定
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+}
+# SQLのコンパイル結果をキャッシュする件数(engineごと)
+query_cache_options = {"query_cache_size": settings.DB_QUERY_CACHE_SIZE}
 
-try:
+# 同期engine(psycopg2)は別のconnection poolを持つため、明示的に有効化した場合のみ作成する
+# endpointは全てasync_engineを使用する
+engine = None
+session_factory = None
+if settings.DB_SYNC_ENGINE_ENABLED:
+    try:
+        engine = create_engine(
+            settings.get_database_url(),
+            poolclass=InstrumentedQueuePool,
+            pool_pre_ping=True,
+            echo=False,
+            future=True,
+            **pool_options,
+            **query_cache_options,
+        )
+        register_pool_metrics(engine, name="sync")
+        register_query_stats(engine, name="sync")
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    except Exception as e:
+        logger.error(f"DB connection error. detail={e}")
+
+# session.infoのkey
+# FORCE_PRIMARY: Trueの場合はreplicaを使用せず、全てprimaryで実行する
+# USED_PRIMARY_FOR_WRITE: 書き込みを行ったsessionでは、以降の読み取りもprimaryで実行する(replicaの遅延対策)
+# REPLICA_ENGINE: sessionで使用するreplica。1つのsession(リクエスト)内では同じreplicaから読み取る
+FORCE_PRIMARY = "force_primary"
+USED_PRIMARY_FOR_WRITE = "used_primary_for_write"
+REPLICA_ENGINE = "replica_engine"
+
+
+def _create_async_engine(url: str, name: str) -> AsyncEngine:
     async_engine = create_async_engine(
-        settings.get_database_url(is_async=True),
+        url,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
         pool_pre_ping=True,
         echo=False,
         future=True,
+        **pool_options,
+        **query_cache_options,
     )
+    register_pool_metrics(async_engine, name=name)
+    register_query_stats(async_engine, name=name)
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        register_slow_query_log(async_engine)
+    return async_engine
+
+
+replica_engines: list[AsyncEngine] = []
+for i, replica_host in enumerate(settings.DB_REPLICA_HOSTS):
+    try:
+        replica_engines.append(
+            _create_async_engine(settings.get_database_url(is_async=True, host=replica_host), name=f"replica-{i}")
+        )
+    except Exception as e:
+        logger.error(f"DB replica connection error. host={replica_host} detail={e}")
+
+
+class RoutingSession(Session):
+    """読み取り専用のSELECTはreplicaへ、
+    それ以外(flush、INSERT/UPDATE/DELETE、SELECT FOR UPDATEなど)はprimaryへ振り分ける
+
+    replicaはsessionごとに1つ選び、session内の読み取りは全て同じreplicaで実行する
+    (遅延の異なるreplicaから読み取らない、replicaのconnectionを複数保持しないため).
+    一度primaryへ書き込んだsessionは、以降のSELECTもprimaryで実行する.
+    session.info[FORCE_PRIMARY] = True とした場合は常にprimaryを使用する.
+    """
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kw: Any) -> Any:
+        if not replica_engines:
+            return super().get_bind(mapper, clause=clause, **kw)
+
+        is_read_only = (
+            isinstance(clause, Select)
+            and clause._for_update_arg is None
+            and not self._flushing
+        )
+        if is_read_only and not self.info.get(FORCE_PRIMARY) and not self.info.get(USED_PRIMARY_FOR_WRITE):
+            if REPLICA_ENGINE not in self.info:
+                self.info[REPLICA_ENGINE] = random.choice(replica_engines)
+            return self.info[REPLICA_ENGINE].sync_engine
+
+        if not is_read_only:
+            self.info[USED_PRIMARY_FOR_WRITE] = True
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+try:
+    async_engine = _create_async_engine(settings.get_database_url(is_async=True), name="primary")
     async_session_factory = sessionmaker(
         autocommit=False,
         autoflush=False,
         bind=async_engine,
         class_=AsyncSession,
+        sync_session_class=RoutingSession,
     )
 except Exception as e:
     logger.error(f"DB connection error. detail={e}")
 
+
 def get_db() -> Generator[Session, None, None]:
     """endpointからアクセス時に、Dependで呼び出しdbセッションを生成する
     エラーがなければ、commitする
     エラー時はrollbackし、いずれの場合も最終的にcloseする.
+    DB_SYNC_ENGINE_ENABLED=Trueの場合のみ使用可能.
     """
+    if session_factory is None:
+        raise RuntimeError("sync engine is disabled. set DB_SYNC_ENGINE_ENABLED=true to use get_db().")
     db = None
     try:
         db = session_factory()
@@ -55,21 +152,89 @@ def get_db() -> Generator[Session, None, None]:
     except Exception:
         if db:
             db.rollback()
+        raise
     finally:
         if db:
             db.close()
 
+
+# CommitBeforeResponseMiddlewareが、実行中のリクエストで使用しているsessionを参照するためのContextVar
+_request_sessions: ContextVar[list[AsyncSession] | None] = ContextVar("request_sessions", default=None)
+
+
+def _register_request_session(db: AsyncSession) -> None:
+    sessions = _request_sessions.get()
+    if sessions is not None:
+        sessions.append(db)
+
+
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
-    """async用のdb-sessionの作成."""
+    """async用のdb-sessionの作成
+
+    CRUD関数はflushのみを行い、commitはリクエストごとにここで1回だけ行う(unit of work).
+    CommitBeforeResponseMiddlewareがレスポンス送信前にcommit済の場合は、ここでのcommitは何も実行しない.
+    """
+    async with async_session_factory() as db:
+        _register_request_session(db)
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+
+
+async def get_async_primary_db() -> AsyncGenerator[AsyncSession, None]:
+    """replicaを使用せず、全てのクエリをprimaryで実行するdb-sessionの作成
+    直前の書き込み結果を必ず読み取る必要があるendpointで使用する.
+    """
     async with async_session_factory() as db:
+        db.info[FORCE_PRIMARY] = True
+        _register_request_session(db)
         try:
             yield db
             await db.commit()
         except Exception:
             await db.rollback()
+            raise
         finally:
             await db.close()
 
+
+class CommitBeforeResponseMiddleware:
+    """正常系(status < 400)のレスポンスを送信する直前に、リクエスト内のsessionをcommitする
+
+    FastAPI 0.106未満では、yieldを使用したDependsの終了処理はレスポンス送信後に実行されるため、
+    get_async_dbでのcommitだけでは、クライアントがcommit前のデータを参照する可能性がある.
+    commitに失敗した場合は、レスポンス送信前のため500エラーとなる.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sessions: list[AsyncSession] = []
+        token = _request_sessions.set(sessions)
+
+        async def send_after_commit(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                for db in sessions:
+                    if db.in_transaction():
+                        await db.commit()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_after_commit)
+        finally:
+            _request_sessions.reset(token)
+
+
 def drop_all_tables() -> None:
     logger.info("start: drop_all_tables")
     """
@@ -80,10 +245,13 @@ def drop_all_tables() -> None:
         logger.info("drop_all_table() is ENV local only.")
         return
 
+    # 同期engineが無効な場合は、poolを持たない一時的なengineを使用する
+    sync_engine = engine or create_engine(settings.get_database_url(), poolclass=NullPool)
+
     metadata = MetaData()
-    metadata.reflect(bind=engine)
+    metadata.reflect(bind=sync_engine)
 
-    with engine.connect() as conn:
+    with sync_engine.connect() as conn:
         # 外部キーの制御を一時的に無効化
         conn.execute(text("SET CONSTRAINTS ALL DEFERRED"))
         # 全テーブルを削除
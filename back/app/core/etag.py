@@ -0,0 +1,93 @@
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# GETのレスポンスにETagを付与し、条件付きGET(If-None-Match)に304 Not Modifiedを返す
+# ETagはレスポンスのbodyのhashのため、全てのGETのendpointでendpoint側の対応なしに使用できる
+# DBアクセスとレスポンスの生成は通常通り行い、bodyの送信(通信量、クライアントでのparse・再描画)を省略する
+
+ETAG_HEADER = "ETag"
+# 304のレスポンスに含めないheader(bodyに関するheader)
+_BODY_HEADERS = ("content-length", "content-type", "content-encoding")
+
+
+def compute_etag(body: bytes) -> str:
+    """bodyからETag(strong)を生成する."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def is_etag_matched(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Matchのいずれかのentity-tagがetagと一致するか(弱い比較)を返す."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+
+class ETagMiddleware:
+    """GETの正常系(200)のレスポンスにbodyのhashからETagを付与し、If-None-Matchと一致する場合は304を返す
+
+    endpointでETagを付与済のレスポンスと、bodyがETAG_MAX_BODY_SIZEを超えるレスポンスはそのまま送信する.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message: Message | None = None
+        body_chunks: list[bytes] = []
+        body_size = 0
+        passthrough = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start_message, body_size, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                if message["status"] != 200 or ETAG_HEADER.lower() in Headers(raw=message["headers"]):
+                    passthrough = True
+                    await send(message)
+                    return
+                # bodyのhashを計算するまで送信を保留する
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body_chunks.append(message.get("body", b""))
+            body_size += len(body_chunks[-1])
+            if message.get("more_body", False):
+                if body_size > settings.ETAG_MAX_BODY_SIZE:
+                    # 大きなレスポンス(streaming)は保留したbodyを送信し、以降はそのまま送信する
+                    passthrough = True
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": b"".join(body_chunks), "more_body": True})
+                return
+
+            body = b"".join(body_chunks)
+            etag = compute_etag(body)
+            headers = MutableHeaders(scope=start_message)
+            headers[ETAG_HEADER] = etag
+            if is_etag_matched(if_none_match, etag):
+                start_message["status"] = 304
+                for key in _BODY_HEADERS:
+                    del headers[key]
+                body = b""
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.logger import get_logger
+
+# connection poolの利用状況を計測する
+# poolが枯渇しているのか、クエリ自体が遅いのかを切り分けるために使用する
+
+logger = get_logger(__name__)
+
+# checkout待ち時間のヒストグラムのバケット(ミリ秒)。最後のバケットはそれ以上の全て
+WAIT_TIME_BUCKETS_MS: tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """1つのengine(pool)に対する計測値を保持する."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._pool: Any = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_time_total_ms = 0.0
+        self.wait_time_max_ms = 0.0
+        self.wait_time_buckets = [0] * (len(WAIT_TIME_BUCKETS_MS) + 1)
+
+    def observe_wait(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self.wait_time_total_ms += elapsed_ms
+            self.wait_time_max_ms = max(self.wait_time_max_ms, elapsed_ms)
+            for i, upper in enumerate(WAIT_TIME_BUCKETS_MS):
+                if elapsed_ms <= upper:
+                    self.wait_time_buckets[i] += 1
+                    break
+            else:
+                self.wait_time_buckets[-1] += 1
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> dict[str, Any]:
+        pool = self._pool
+        with self._lock:
+            observed = sum(self.wait_time_buckets)
+            buckets = {f"le_{upper:g}ms": count for upper, count in zip(WAIT_TIME_BUCKETS_MS, self.wait_time_buckets)}
+            buckets["gt_{:g}ms".format(WAIT_TIME_BUCKETS_MS[-1])] = self.wait_time_buckets[-1]
+            return {
+                "name": self.name,
+                "pool_size": pool.size() if isinstance(pool, QueuePool) else None,
+                "checked_out": pool.checkedout() if isinstance(pool, QueuePool) else None,
+                "checked_in": pool.checkedin() if isinstance(pool, QueuePool) else None,
+                "overflow": pool.overflow() if isinstance(pool, QueuePool) else None,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_time_avg_ms": round(self.wait_time_total_ms / observed, 3) if observed else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max_ms, 3),
+                "wait_time_histogram": buckets,
+            }
+
+
+_registry: dict[str, PoolMetrics] = {}
+
+
+class _InstrumentedPoolMixin:
+    """checkout時の待ち時間とtimeoutを計測するpool
+
+    poolのeventにはcheckout開始時点のhookが無いため、_do_getを計測する.
+    """
+
+    metrics: PoolMetrics | None = None
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        except PoolTimeoutError:
+            if self.metrics:
+                self.metrics.incr("timeouts")
+            logger.warning(f"db pool checkout timeout. pool={self.metrics.name if self.metrics else '-'}")
+            raise
+        finally:
+            if self.metrics:
+                self.metrics.observe_wait((time.perf_counter() - start) * 1000)
+
+    def recreate(self) -> Any:
+        new_pool = super().recreate()  # type: ignore[misc]
+        new_pool.metrics = self.metrics
+        if self.metrics:
+            self.metrics._pool = new_pool
+        return new_pool
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+def register_pool_metrics(engine: Any, name: str) -> PoolMetrics:
+    """engineのpoolにevent listenerを登録し、計測を開始する
+
+    AsyncEngineの場合は内部のsync_engineのpoolに登録する.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    metrics = PoolMetrics(name)
+    metrics._pool = pool
+    if isinstance(pool, _InstrumentedPoolMixin):
+        pool.metrics = metrics
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(*args: Any) -> None:
+        metrics.incr("checkouts")
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(*args: Any) -> None:
+        metrics.incr("checkins")
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(*args: Any) -> None:
+        metrics.incr("connects")
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(*args: Any) -> None:
+        metrics.incr("invalidations")
+
+    _registry[name] = metrics
+    return metrics
+
+
+def get_pool_stats() -> list[dict[str, Any]]:
+    """登録済の全poolの計測値を返す."""
+    return [metrics.snapshot() for metrics in _registry.values()]
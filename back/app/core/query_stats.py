@@ -0,0 +1,237 @@
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+# リクエスト単位でDBアクセスを計測する
+# - DBへの往復回数(round trip): 全リクエストで計測する
+# - クエリ数、DB時間、最も遅いクエリ、N+1の検出: QUERY_STATS_SAMPLE_RATEの割合のリクエストのみ計測する
+# - SQLのコンパイル結果のキャッシュ(compiled cache)のhit/miss: engineごとに常に計測する
+# engineのeventでカウントし、middlewareでリクエストごとに集計する
+
+logger = get_logger(__name__)
+
+ROUND_TRIPS_HEADER = "X-DB-Round-Trips"
+SERVER_TIMING_HEADER = "Server-Timing"
+
+# connection.infoにクエリの開始時刻を保持するkey
+_QUERY_START_KEY = "query_stats_start"
+# ログに出力するSQLの最大文字数
+_MAX_STATEMENT_LOG_LENGTH = 500
+
+
+class RequestQueryStats:
+    """1リクエスト内のDBアクセスの計測値."""
+
+    def __init__(self, sampled: bool = False, endpoint: str | None = None) -> None:
+        self.sampled = sampled
+        self.endpoint = endpoint
+        self.round_trips = 0
+        self.query_count = 0
+        self.db_time_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement: str | None = None
+        self.compiled_cache_misses = 0
+        # bind parameterはplaceholderのままのため、SQL文字列をそのままクエリの形(shape)として扱う
+        self.statement_counts: Counter[str] = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.query_count += 1
+        self.db_time_ms += elapsed_ms
+        self.statement_counts[statement] += 1
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    def get_n_plus_one_statements(self, threshold: int) -> list[tuple[str, int]]:
+        """同じ形のクエリがthresholdを超えて実行されたものを返す."""
+        return [(statement, count) for statement, count in self.statement_counts.most_common() if count > threshold]
+
+    def get_server_timing(self) -> str:
+        return f'db;dur={self.db_time_ms:.1f};desc="{self.query_count} queries"'
+
+
+class CompiledCacheStats:
+    """engineごとのcompiled cacheのhit/miss."""
+
+    def __init__(self, name: str, engine: Any) -> None:
+        self.name = name
+        self._engine = engine
+        self.hits = 0
+        self.misses = 0
+        # ddl、exec_driver_sqlなどキャッシュの対象外のSQL
+        self.uncached = 0
+
+    def observe(self, cache_hit: Any) -> None:
+        if cache_hit == CACHE_HIT:
+            self.hits += 1
+        elif cache_hit == CACHE_MISS:
+            self.misses += 1
+        else:
+            self.uncached += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        compiled_cache = self._engine._compiled_cache
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "size": len(compiled_cache) if compiled_cache is not None else 0,
+            "capacity": compiled_cache.capacity if compiled_cache is not None else 0,
+        }
+
+
+_compiled_cache_stats: dict[str, CompiledCacheStats] = {}
+# name -> register_query_statsで登録した(engine, event名, listener)
+_registered_listeners: dict[str, list[tuple[Any, str, Any]]] = {}
+
+
+def get_compiled_cache_stats() -> list[dict[str, Any]]:
+    """登録済の全engineのcompiled cacheのhit/missを返す."""
+    return [stats.snapshot() for stats in _compiled_cache_stats.values()]
+
+
+_request_query_stats: ContextVar[RequestQueryStats | None] = ContextVar("request_query_stats", default=None)
+
+
+def get_request_query_stats() -> RequestQueryStats | None:
+    """実行中のリクエストの計測値を返す。リクエスト外(バッチなど)ではNone."""
+    return _request_query_stats.get()
+
+
+def _count_round_trip(*args: Any, **kwargs: Any) -> None:
+    stats = _request_query_stats.get()
+    if stats is not None:
+        stats.round_trips += 1
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+    stats = _request_query_stats.get()
+    if stats is None:
+        return
+    stats.round_trips += 1
+    if stats.sampled:
+        conn.info.setdefault(_QUERY_START_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    stats = _request_query_stats.get()
+    if stats is None:
+        return
+    if context.cache_hit == CACHE_MISS:
+        stats.compiled_cache_misses += 1
+    if not stats.sampled:
+        return
+    starts = conn.info.get(_QUERY_START_KEY)
+    if starts:
+        stats.record(statement, (time.perf_counter() - starts.pop()) * 1000)
+
+
+def _handle_error(exception_context: Any) -> None:
+    # エラー時はafter_cursor_executeが呼ばれないため、開始時刻を破棄する
+    conn = exception_context.connection
+    starts = conn.info.get(_QUERY_START_KEY) if conn is not None else None
+    if starts:
+        starts.pop()
+
+
+def register_query_stats(engine: Any, name: str) -> None:
+    """engineにDBアクセス計測用のevent listenerを登録する
+
+    SQLの実行に加え、BEGIN/COMMIT/ROLLBACKもそれぞれ1回の往復として数える.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    cache_stats = CompiledCacheStats(name, sync_engine)
+    _compiled_cache_stats[name] = cache_stats
+
+    def _observe_compiled_cache(
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        cache_stats.observe(context.cache_hit)
+
+    listeners = [
+        ("after_cursor_execute", _observe_compiled_cache),
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+        ("begin", _count_round_trip),
+        ("commit", _count_round_trip),
+        ("rollback", _count_round_trip),
+    ]
+    for identifier, fn in listeners:
+        event.listen(sync_engine, identifier, fn)
+    _registered_listeners[name] = [(sync_engine, identifier, fn) for identifier, fn in listeners]
+
+
+def unregister_query_stats(name: str) -> None:
+    """register_query_statsで登録したevent listenerと、compiled cacheの計測値を削除する
+    テストでengineを破棄する場合などに使用する.
+    """
+    for sync_engine, identifier, fn in _registered_listeners.pop(name, []):
+        event.remove(sync_engine, identifier, fn)
+    _compiled_cache_stats.pop(name, None)
+
+
+class QueryStatsMiddleware:
+    """リクエストごとの計測値を初期化し、レスポンスヘッダーに計測結果を付与する
+
+    サンプリング対象のリクエストでは、Server-TimingヘッダーにDB時間とクエリ数を付与し、
+    N+1の疑いがあるクエリと、QUERY_STATS_SLOW_REQUEST_MSを超えたリクエストをログに出力する.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = settings.QUERY_STATS_SAMPLE_RATE > 0 and random.random() < settings.QUERY_STATS_SAMPLE_RATE
+        stats = RequestQueryStats(sampled=sampled, endpoint=f"{scope['method']} {scope['path']}")
+        token = _request_query_stats.set(stats)
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(ROUND_TRIPS_HEADER, str(stats.round_trips))
+                if stats.sampled:
+                    headers.append(SERVER_TIMING_HEADER, stats.get_server_timing())
+                    self._log_stats(stats)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _request_query_stats.reset(token)
+
+    def _log_stats(self, stats: RequestQueryStats) -> None:
+        endpoint = stats.endpoint
+        logger.debug(
+            f"db stats {endpoint} round_trips={stats.round_trips} queries={stats.query_count} "
+            f"db_time_ms={stats.db_time_ms:.1f} slowest_ms={stats.slowest_ms:.1f} "
+            f"compiled_cache_misses={stats.compiled_cache_misses}"
+        )
+        for statement, count in stats.get_n_plus_one_statements(settings.QUERY_STATS_N_PLUS_ONE_THRESHOLD):
+            logger.warning(
+                f"N+1 query detected. {endpoint} count={count} statement={statement[:_MAX_STATEMENT_LOG_LENGTH]}"
+            )
+        if stats.db_time_ms > settings.QUERY_STATS_SLOW_REQUEST_MS and stats.slowest_statement:
+            logger.warning(
+                f"slow db request. {endpoint} db_time_ms={stats.db_time_ms:.1f} queries={stats.query_count} "
+                f"slowest_ms={stats.slowest_ms:.1f} slowest={stats.slowest_statement[:_MAX_STATEMENT_LOG_LENGTH]}"
+            )
@@ -0,0 +1,237 @@
+import asyncio
+import contextvars
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.query_stats import get_request_query_stats
+
+# 閾値(SLOW_QUERY_THRESHOLD_MS)を超えたSQLを記録する(SLOW_QUERY_LOG_ENABLED=Trueの場合のみ)
+# SQLの形(bind parameterはplaceholderのまま)ごとに集計し、実行計画(EXPLAIN)を非同期で取得する
+# 記録した内容はadmin_appの GET /admin/db/slow-queries で参照する
+
+logger = get_logger(__name__)
+
+# connection.infoにクエリの開始時刻を保持するkey
+_QUERY_START_KEY = "slow_query_start"
+_EXPLAIN_PREFIX = "EXPLAIN (ANALYZE off, FORMAT JSON) "
+# EXPLAINの対象とするSQL
+_EXPLAINABLE_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+# 1つのSQLの形に対して記録するendpointの最大数
+_MAX_ENDPOINTS_PER_ENTRY = 10
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+# IN ($1, $2, $3) や IN (%(id_1)s, %(id_2)s) のように件数で変わるplaceholderの並び
+_PLACEHOLDER_LIST_PATTERN = re.compile(r"\(\s*(?:\$\d+|%\(\w+\)s|%s|\?)(?:\s*,\s*(?:\$\d+|%\(\w+\)s|%s|\?))+\s*\)")
+
+
+def normalize_statement(statement: str) -> str:
+    """SQLの空白と、件数で変わるplaceholderの並びをまとめ、同じ形のSQLが同じ文字列となるようにする."""
+    statement = _WHITESPACE_PATTERN.sub(" ", statement).strip()
+    return _PLACEHOLDER_LIST_PATTERN.sub("(...)", statement)
+
+
+def get_bind_shape(parameters: Any, executemany: bool = False) -> Any:
+    """bind parameterの値は保持せず、型名のみを返す."""
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return {"rows": len(parameters), "row": get_bind_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class SlowQueryEntry:
+    """1つのSQLの形に対する記録."""
+
+    def __init__(self, statement: str, bind_shape: Any) -> None:
+        self.statement = statement
+        self.bind_shape = bind_shape
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.endpoints: list[str] = []
+        self.first_seen_at = datetime.now()
+        self.last_seen_at = self.first_seen_at
+        self.plan: Any = None
+        self.plan_captured_at: datetime | None = None
+        self.explain_error: str | None = None
+        # 最後にEXPLAINを実行した時刻(time.monotonic)
+        self.explained_at: float | None = None
+        self.explaining = False
+
+    def observe(self, elapsed_ms: float, endpoint: str | None) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_ms = elapsed_ms
+        self.last_seen_at = datetime.now()
+        if endpoint and endpoint not in self.endpoints:
+            self.endpoints.append(endpoint)
+            del self.endpoints[:-_MAX_ENDPOINTS_PER_ENTRY]
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "statement": self.statement,
+            "bind_shape": self.bind_shape,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "last_ms": round(self.last_ms, 3),
+            "endpoints": list(self.endpoints),
+            "first_seen_at": self.first_seen_at,
+            "last_seen_at": self.last_seen_at,
+            "plan": self.plan,
+            "plan_captured_at": self.plan_captured_at,
+            "explain_error": self.explain_error,
+        }
+
+
+class SlowQueryLog:
+    """SQLの形ごとのSlowQueryEntryを、件数上限(古いものから削除)付きで保持する."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, SlowQueryEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._explains_in_flight = 0
+        # 実行中のEXPLAINのtask(GCで破棄されないよう参照を保持する)
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def record(
+        self, statement: str, bind_shape: Any, elapsed_ms: float, endpoint: str | None
+    ) -> tuple[SlowQueryEntry, bool]:
+        """記録し、EXPLAINを実行すべきかどうかを返す."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(statement)
+            if entry is None:
+                entry = SlowQueryEntry(statement, bind_shape)
+                self._entries[statement] = entry
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(statement)
+            entry.observe(elapsed_ms, endpoint)
+
+            should_explain = (
+                settings.SLOW_QUERY_EXPLAIN_ENABLED
+                and not entry.explaining
+                and self._explains_in_flight < settings.SLOW_QUERY_EXPLAIN_MAX_CONCURRENCY
+                and (
+                    entry.explained_at is None
+                    or now - entry.explained_at >= settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+                )
+            )
+            if should_explain:
+                entry.explaining = True
+                entry.explained_at = now
+                self._explains_in_flight += 1
+        return entry, should_explain
+
+    def finish_explain(self, entry: SlowQueryEntry, plan: Any = None, error: str | None = None) -> None:
+        with self._lock:
+            entry.explaining = False
+            self._explains_in_flight -= 1
+            if error is None:
+                entry.plan = plan
+                entry.plan_captured_at = datetime.now()
+            entry.explain_error = error
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            entries = [entry.snapshot() for entry in self._entries.values()]
+        return sorted(entries, key=lambda entry: entry["max_ms"], reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(maxsize=settings.SLOW_QUERY_MAX_ENTRIES)
+
+
+async def _explain(
+    async_engine: AsyncEngine, entry: SlowQueryEntry, statement: str, parameters: Any
+) -> None:
+    try:
+        async with async_engine.connect() as conn:
+            result = await conn.exec_driver_sql(_EXPLAIN_PREFIX + statement, parameters)
+            plan = result.scalar()
+    except Exception as e:
+        logger.warning(f"slow query explain error. detail={e}")
+        slow_query_log.finish_explain(entry, error=str(e))
+    else:
+        slow_query_log.finish_explain(entry, plan=plan)
+
+
+def _schedule_explain(async_engine: AsyncEngine, entry: SlowQueryEntry, statement: str, parameters: Any) -> None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        slow_query_log.finish_explain(entry, error="event loop is not running")
+        return
+    # リクエストの計測値(query_stats)にEXPLAINが含まれないよう、空のcontextで実行する
+    task = loop.create_task(_explain(async_engine, entry, statement, parameters), context=contextvars.Context())
+    slow_query_log._tasks.add(task)
+    task.add_done_callback(slow_query_log._tasks.discard)
+
+
+def register_slow_query_log(async_engine: AsyncEngine) -> None:
+    """engineに、閾値を超えたSQLを記録するevent listenerを登録する."""
+    sync_engine = async_engine.sync_engine
+    can_explain = sync_engine.dialect.name == "postgresql"
+
+    def before_cursor_execute(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        conn.info.setdefault(_QUERY_START_KEY, []).append(time.perf_counter())
+
+    def after_cursor_execute(
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        starts = conn.info.get(_QUERY_START_KEY)
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        if elapsed_ms < settings.SLOW_QUERY_THRESHOLD_MS or statement.startswith(_EXPLAIN_PREFIX):
+            return
+
+        stats = get_request_query_stats()
+        endpoint = stats.endpoint if stats is not None else None
+        normalized_statement = normalize_statement(statement)
+        entry, should_explain = slow_query_log.record(
+            normalized_statement, get_bind_shape(parameters, executemany), elapsed_ms, endpoint
+        )
+        logger.warning(
+            f"slow query. {endpoint} elapsed_ms={elapsed_ms:.1f} statement={normalized_statement[:500]}"
+        )
+        if not should_explain:
+            return
+        if not can_explain or executemany or not normalized_statement.upper().startswith(_EXPLAINABLE_STATEMENTS):
+            slow_query_log.finish_explain(entry, error="statement is not explainable")
+            return
+        _schedule_explain(async_engine, entry, statement, parameters)
+
+    def handle_error(exception_context: Any) -> None:
+        conn = exception_context.connection
+        starts = conn.info.get(_QUERY_START_KEY) if conn is not None else None
+        if starts:
+            starts.pop()
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(sync_engine, "handle_error", handle_error)
+
+
+def get_slow_queries() -> list[dict[str, Any]]:
+    """記録済のSQLを、最大実行時間の降順で返す."""
+    return slow_query_log.snapshot()
@@ -1,4 +1,8 @@
+import os
 import socket
+import threading
+import time
+import uuid
 
 import ulid
 from fastapi import Request
@@ -9,6 +13,38 @@ from fastapi import Request
 def get_ulid() -> str:
     return ulid.new().str
 
+
+_uuid7_lock = threading.Lock()
+_uuid7_last_timestamp_ms = 0
+_uuid7_last_counter = 0
+_UUID7_COUNTER_MAX = 0xFFF
+
+
+# 作成順に並ぶUUID(UUIDv7, RFC 9562)を作る関数
+# 先頭48bitがミリ秒単位の時刻のため、INSERTがindexの末尾に集まる(uuid4のようにランダムなページへ書き込まない)
+# 同じミリ秒内では12bitのカウンタで順序を保証する
+# ULIDと同じく先頭48bitが時刻のため、ulid.from_bytes(value.bytes)でULIDとして扱うこともできる
+def get_uuid7() -> uuid.UUID:
+    global _uuid7_last_timestamp_ms, _uuid7_last_counter
+
+    with _uuid7_lock:
+        timestamp_ms = time.time_ns() // 1_000_000
+        if timestamp_ms > _uuid7_last_timestamp_ms:
+            counter = int.from_bytes(os.urandom(2)) & 0x7FF  # 上位1bitは0にして、カウンタの余裕を残す
+        else:
+            # 同じミリ秒内(または時刻が戻った場合)は前回の値からカウンタを進める
+            timestamp_ms = _uuid7_last_timestamp_ms
+            counter = _uuid7_last_counter + 1
+            if counter > _UUID7_COUNTER_MAX:
+                timestamp_ms += 1
+                counter = 0
+        _uuid7_last_timestamp_ms = timestamp_ms
+        _uuid7_last_counter = counter
+
+    rand_b = int.from_bytes(os.urandom(8)) & 0x3FFFFFFFFFFFFFFF
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
 # ウェブサイトにアクセスしてきた人の「住所」（IPアドレス）を調べる関数
 def get_request_info(request: Request) -> str:
     return request.client.host
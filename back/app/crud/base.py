@@ -1,21 +1,30 @@
+import base64
 import datetime
+import json
 import math
+from collections.abc import AsyncIterator, Iterable
 from enum import Enum
+from types import MappingProxyType
 from typing import Any, Generic, TypeVar
 
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.inspection import inspect
 from sqlalchemy.orm.properties import ColumnProperty
-from sqlalchemy.sql import func, select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import BigInteger
+from sqlalchemy.sql import any_, bindparam, cast, column, func, insert, select, table, tuple_, update
+from sqlalchemy.orm import load_only, selectinload
 
 from app import schemas
+from app.core import count_cache
+from app.core.config import settings
 from app.exceptions.core import APIException
 from app.exceptions.error_messages import ErrorMessage
 from app.models.base import Base
-from app.schemas.core import PagingQueryIn
+from app.schemas.core import CountStrategyEnum, CursorPagingQueryIn, PagingQueryIn, SortDirectionEnum
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -24,6 +33,137 @@ ResponseSchemaType = TypeVar("ResponseSchemaType", bound=BaseModel)
 ListResponseSchemaType = TypeVar("ListResponseSchemaType", bound=BaseModel)
 
 # データベース操作の「定型文」
+# 各メソッドはflushのみを行い、commitはget_async_dbでリクエストごとに1回だけ行う
+# server_default/onupdateの値はeager_defaults(RETURNING)で取得されるため、flush後のrefreshは不要
+
+# cursorの向き。next: 次のページ、prev: 前のページ
+CURSOR_NEXT = "next"
+CURSOR_PREV = "prev"
+
+
+class ModelMetadata:
+    """modelのmapperから事前に計算した、変更不可のメタデータ
+    CRUDBaseの各メソッドで毎回inspect(model)してmapper.attrsを走査しないよう、modelごとに1度だけ生成する.
+    """
+
+    __slots__ = ("model", "column_keys", "column_key_set", "column_attrs", "column_properties", "relationship_keys")
+
+    def __init__(self, model: type[Base]) -> None:
+        mapper = inspect(model)
+        column_properties = [attr for attr in mapper.attrs if isinstance(attr, ColumnProperty)]
+        self.model = model
+        # columnのkey(mapperの定義順)
+        self.column_keys: tuple[str, ...] = tuple(attr.key for attr in column_properties)
+        self.column_key_set: frozenset[str] = frozenset(self.column_keys)
+        # key -> select/where/order_byで使用するattribute(Notes.idなど)。並び替え可能なcolumn
+        self.column_attrs: MappingProxyType[str, Any] = MappingProxyType(
+            {attr.key: getattr(model, attr.key) for attr in column_properties}
+        )
+        self.column_properties: MappingProxyType[str, ColumnProperty] = MappingProxyType(
+            {attr.key: attr for attr in column_properties}
+        )
+        # key -> 関連先のmodel
+        self.relationship_keys: MappingProxyType[str, type[Base]] = MappingProxyType(
+            {relationship.key: relationship.mapper.class_ for relationship in mapper.relationships}
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if hasattr(self, name):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        super().__setattr__(name, value)
+
+    def get_column_attrs(self, keys: Iterable[str]) -> list[Any]:
+        """keysのうちcolumnであるものを、SQLが毎回同じ文字列となるようmapperの定義順で返す."""
+        key_set = set(keys)
+        return [self.column_attrs[key] for key in self.column_keys if key in key_set]
+
+
+# model -> メタデータ
+_model_metadata: dict[type[Base], ModelMetadata] = {}
+# (model, リレーションシップのpath) -> selectinloadのオプション
+_relationship_options: dict[tuple[type[Base], tuple[str, ...]], tuple[Any, ...]] = {}
+_RELATIONSHIP_OPTIONS_MAX_SIZE = 256
+
+
+def get_model_metadata(model: type[Base]) -> ModelMetadata:
+    """modelのメタデータを返す。mapperの設定が完了した後(初回使用時)に生成し、以降は同じobjectを返す."""
+    metadata = _model_metadata.get(model)
+    if metadata is None:
+        metadata = _model_metadata[model] = ModelMetadata(model)
+    return metadata
+
+
+def _get_relationship_options(model: type[Base], load_relationships: tuple[str, ...]) -> tuple[Any, ...]:
+    """"notes.training_notes"のようなリレーションシップのpathを、selectinloadのオプションに変換する
+    オプションは変更されないため、同じpathに対しては同じobjectを再利用する.
+    """
+    key = (model, load_relationships)
+    cached_options = _relationship_options.get(key)
+    if cached_options is not None:
+        return cached_options
+
+    options = []
+    for relationship in load_relationships:
+        relationship_path = []
+        current_model = model
+        for attr in relationship.split("."):
+            related_model = get_model_metadata(current_model).relationship_keys.get(attr)
+            if related_model is None:
+                continue
+            relationship_path.append(getattr(current_model, attr))
+            current_model = related_model
+        if relationship_path:
+            options.append(selectinload(*relationship_path))
+    if len(_relationship_options) >= _RELATIONSHIP_OPTIONS_MAX_SIZE:
+        _relationship_options.clear()
+    _relationship_options[key] = tuple(options)
+    return _relationship_options[key]
+
+
+def get_column_attrs(
+    model: type[Base],
+    fields: Iterable[str],
+    field_columns: dict[str, str] | None = None,
+) -> list[Any]:
+    """fieldsのうちmodelのcolumnであるものを、load_only/selectで使用するattributeとして返す
+    field_columnsには、columnではないfieldと、その値の生成に必要なcolumnの対応を指定する
+    (例: {"image_url": "image_path"}).
+    """
+    field_columns = field_columns or {}
+    return get_model_metadata(model).get_column_attrs(field_columns.get(field, field) for field in fields)
+
+
+def encode_cursor(sort_field: str, sort_value: Any, id_value: Any, direction: str) -> str:
+    """(sort_field, id)の値をcursor文字列(base64url)にする."""
+    payload = jsonable_encoder({"f": sort_field, "v": sort_value, "id": id_value, "d": direction})
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise APIException(ErrorMessage.INVALID_CURSOR)
+    if (
+        not isinstance(payload, dict)
+        or not {"f", "v", "id", "d"} <= payload.keys()
+        or payload["d"] not in (CURSOR_NEXT, CURSOR_PREV)
+    ):
+        raise APIException(ErrorMessage.INVALID_CURSOR)
+    return payload
+
+
+def convert_cursor_value(attr: Any, value: Any) -> Any:
+    """cursorに含まれるJSONの値を、columnの型(datetime, UUIDなど)に変換する."""
+    try:
+        python_type = attr.type.python_type
+    except NotImplementedError:
+        return value
+    try:
+        return TypeAdapter(python_type).validate_python(value)
+    except ValidationError:
+        raise APIException(ErrorMessage.INVALID_CURSOR)
+
 
 class CRUDBase(
     Generic[
@@ -39,45 +179,42 @@ class CRUDBase(
         model: type[ModelType],
         response_schema_class: type[ResponseSchemaType],
         list_response_class: type[ListResponseSchemaType],
+        count_strategy: CountStrategyEnum = CountStrategyEnum.exact,
     ) -> None:
         self.model = model
         self.response_schema_class = response_schema_class
         self.list_response_class = list_response_class
+        # get_paged_listで総件数を取得する方法のデフォルト
+        self.count_strategy = count_strategy
+        # ResponseSchemaに含まれるcolumnのattribute。初回使用時に生成する
+        self._schema_select_columns: tuple[Any, ...] | None = None
 
-    def _get_select_columns(self) -> list[ColumnProperty]:
-        """ResponseSchemaに含まれるfieldのみをsqlalchemyのselect用のobjectとして返す."""
-        schema_columns = list(self.response_schema_class.model_fields.keys())
-        mapper = inspect(self.model)
-        select_columns = [
-            getattr(self.model, attr.key)
-            for attr in mapper.attrs
-            if isinstance(attr, ColumnProperty) and attr.key in schema_columns
-        ]
+    @property
+    def metadata(self) -> ModelMetadata:
+        return get_model_metadata(self.model)
 
-        return select_columns
+    def _get_select_columns(self, fields: Iterable[str] | None = None) -> list[ColumnProperty]:
+        """ResponseSchemaに含まれるfield(fieldsを指定した場合はその中のfield)のみをsqlalchemyのselect用のobjectとして返す."""
+        if self._schema_select_columns is None:
+            self._schema_select_columns = tuple(
+                self.metadata.get_column_attrs(self.response_schema_class.model_fields.keys())
+            )
+        if fields is None:
+            return list(self._schema_select_columns)
+        field_set = set(fields)
+        return [column for column in self._schema_select_columns if column.key in field_set]
 
     def _filter_model_exists_fields(self, data_dict: dict[str, Any]) -> dict[str, Any]:
         """data_dictを与え、modelに存在するfieldだけをfilterして返す."""
-        data_fields = list(data_dict.keys())
-        mapper = inspect(self.model)
-        exists_data_dict = {}
-        for attr in mapper.attrs:
-            if isinstance(attr, ColumnProperty) and attr.key in data_fields:
-                exists_data_dict[attr.key] = data_dict[attr.key]
-
-        return exists_data_dict
+        column_key_set = self.metadata.column_key_set
+        return {key: value for key, value in data_dict.items() if key in column_key_set}
 
     def _get_order_by_clause(
         self,
         sort_field: Any | Enum,
     ) -> ColumnProperty | None:
         sort_field_value = sort_field.value if isinstance(sort_field, Enum) else sort_field
-        mapper = inspect(self.model)
-        order_by_clause = [
-            attr for attr in mapper.attrs if isinstance(attr, ColumnProperty) and attr.key == sort_field_value
-        ]
-
-        return order_by_clause[0] if order_by_clause else None
+        return self.metadata.column_properties.get(sort_field_value)
 
     def _add_relationship_options(
         self,
@@ -88,18 +225,15 @@ class CRUDBase(
         if not load_relationships:
             return stmt
 
-        for relationship in load_relationships:
-            relationship_path = []
-            current_model = self.model
-            for attr in relationship.split('.'):
-                if not hasattr(current_model, attr):
-                    continue
-                relationship_attr = getattr(current_model, attr)
-                relationship_path.append(relationship_attr)
-                current_model = relationship_attr.property.mapper.class_
-            if relationship_path:
-                stmt = stmt.options(selectinload(*relationship_path))
-        return stmt
+        options = _get_relationship_options(self.model, tuple(load_relationships))
+        return stmt.options(*options) if options else stmt
+
+    def _add_load_only_options(self, stmt: Any, fields: Iterable[str] | None) -> Any:
+        """fieldsを指定した場合は、ResponseSchemaに含まれるそのcolumnのみを取得するオプションを追加する."""
+        if fields is None:
+            return stmt
+        select_columns = self._get_select_columns(fields)
+        return stmt.options(load_only(*select_columns)) if select_columns else stmt
 
     async def get_db_obj_by_id(
         self,
@@ -107,12 +241,35 @@ class CRUDBase(
         id: Any,
         include_deleted: bool = False,
         load_relationships: list[str] | None = None,
+        fields: Iterable[str] | None = None,
     ) -> ModelType | None:
+        """fieldsを指定した場合は、そのcolumn(と主キー)のみを取得する."""
         stmt = select(self.model).where(self.model.id == id)
         stmt = self._add_relationship_options(stmt, load_relationships)
+        stmt = self._add_load_only_options(stmt, fields)
         stmt = stmt.execution_options(include_deleted=include_deleted)
         return (await db.execute(stmt)).scalars().first()
 
+    async def get_db_obj_list_by_ids(
+        self,
+        db: AsyncSession,
+        ids: Iterable[Any],
+        include_deleted: bool = False,
+        fields: Iterable[str] | None = None,
+    ) -> list[ModelType]:
+        """idsに一致するデータを1回のSELECTで取得する(順序は保証しない)
+        PostgreSQLでは WHERE id = ANY(:ids) とし、idの件数によらず同じSQLとなるようにする.
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+        if db.bind is not None and db.bind.dialect.name == "postgresql":
+            id_clause = self.model.id == any_(bindparam("ids", ids, type_=ARRAY(self.model.id.type)))
+        else:
+            id_clause = self.model.id.in_(ids)
+        stmt = self._add_load_only_options(select(self.model).where(id_clause), fields)
+        stmt = stmt.execution_options(include_deleted=include_deleted)
+        return list((await db.execute(stmt)).scalars().all())
 
     async def get_db_obj_list(
         self,
@@ -121,31 +278,71 @@ class CRUDBase(
         sort_query_in: schemas.SortQueryIn | None = None,
         include_deleted: bool = False,
         load_relationships: list[str] | None = None,
+        fields: Iterable[str] | None = None,
     ) -> list[ModelType]:
         where_clause = where_clause if where_clause is not None else []
         stmt = select(self.model).where(*where_clause)
         stmt = self._add_relationship_options(stmt, load_relationships)
+        stmt = self._add_load_only_options(stmt, fields)
         if sort_query_in:
             order_by_clause = self._get_order_by_clause(sort_query_in.sort_field)
             stmt = sort_query_in.apply_to_query(stmt, order_by_clause=order_by_clause)
-        db_obj_list = (await db.execute(stmt.execution_options(include_deleted=include_deleted))).unique().scalars().all()
+        result = await db.execute(stmt.execution_options(include_deleted=include_deleted))
+        db_obj_list = result.unique().scalars().all()
         return db_obj_list
 
+    async def stream_db_obj_list(
+        self,
+        db: AsyncSession,
+        where_clause: list[Any] | None = None,
+        sort_query_in: schemas.SortQueryIn | None = None,
+        include_deleted: bool = False,
+        fields: Iterable[str] | None = None,
+        yield_per: int | None = None,
+    ) -> AsyncIterator[ModelType]:
+        """get_db_obj_listと同じ条件のデータを、yield_per件ずつDBから取得しながら1件ずつ返す
+        全件をメモリに載せないため、件数の上限がないデータの処理・出力に使用する.
+        Notes
+        yield_perはjoinedloadと併用できないため、relationshipの読み込みには対応しない.
+        取得したobjectはsessionのidentity mapに弱参照で保持されるため、呼び出し側で参照を保持しなければ解放される.
+        """
+        where_clause = where_clause if where_clause is not None else []
+        stmt = select(self.model).where(*where_clause)
+        stmt = self._add_load_only_options(stmt, fields)
+        if sort_query_in:
+            order_by_clause = self._get_order_by_clause(sort_query_in.sort_field)
+            stmt = sort_query_in.apply_to_query(stmt, order_by_clause=order_by_clause)
+        stmt = stmt.execution_options(
+            include_deleted=include_deleted, yield_per=yield_per or settings.STREAM_YIELD_PER
+        )
+        async for db_obj in await db.stream_scalars(stmt):
+            yield db_obj
+
     async def get_paged_list(
         self,
         db: AsyncSession,
-        paging_query_in: PagingQueryIn,
+        paging_query_in: PagingQueryIn | CursorPagingQueryIn,
         where_clause: list[Any] | None = None,
         sort_query_in: schemas.SortQueryIn | None = None,
         include_deleted: bool = False,
         load_relationships: list[str] | None = None,
+        count_strategy: CountStrategyEnum | None = None,
     ) -> ListResponseSchemaType:
         """Notes
         include_deleted=Trueの場合は、削除フラグ=Trueのデータも返す.
+        paging_query_inにCursorPagingQueryInを指定した場合は、OFFSETではなくcursor(keyset)でページングする.
+        count_strategyを省略した場合は、CRUDBaseの生成時に指定した方法で総件数を取得する.
         """
         where_clause = where_clause if where_clause is not None else []
-        stmt = select(func.count(self.model.id)).where(*where_clause).execution_options(include_deleted=include_deleted)
-        total_count = (await db.execute(stmt)).scalar()
+        count_strategy = count_strategy or self.count_strategy
+        if isinstance(paging_query_in, CursorPagingQueryIn):
+            return await self._get_cursor_paged_list(
+                db, paging_query_in, where_clause, sort_query_in, include_deleted, load_relationships, count_strategy
+            )
+
+        total_count, used_count_strategy = await self._get_total_count(
+            db, where_clause, include_deleted, count_strategy
+        )
 
         stmt = select(self.model).where(*where_clause)
         stmt = self._add_relationship_options(stmt, load_relationships)
@@ -159,13 +356,158 @@ class CRUDBase(
         meta = schemas.PagingMeta(
             total_data_count=total_count,
             current_page=paging_query_in.page,
-            total_page_count=int(math.ceil(total_count / paging_query_in.per_page)),
+            total_page_count=self._get_total_page_count(total_count, paging_query_in.per_page),
             per_page=paging_query_in.per_page,
+            count_strategy=used_count_strategy,
         )
         data_response = [self.response_schema_class.model_validate(d) for d in db_obj_list]
         list_response = self.list_response_class(data=data_response, meta=meta)
         return list_response
 
+    @staticmethod
+    def _get_total_page_count(total_count: int | None, per_page: int) -> int | None:
+        return int(math.ceil(total_count / per_page)) if total_count is not None else None
+
+    async def _get_total_count(
+        self,
+        db: AsyncSession,
+        where_clause: list[Any],
+        include_deleted: bool,
+        count_strategy: CountStrategyEnum,
+    ) -> tuple[int | None, CountStrategyEnum]:
+        """count_strategyに応じて総件数を取得し、(件数, 実際に使用した方法)を返す."""
+        if count_strategy == CountStrategyEnum.none:
+            return None, CountStrategyEnum.none
+
+        if count_strategy == CountStrategyEnum.estimated:
+            # db.get_bind()はRoutingSessionで書き込みとして扱われ、以降の読み取りがprimaryになるため、db.bindで判定する
+            if not where_clause and db.bind is not None and db.bind.dialect.name == "postgresql":
+                estimated_count = await self._get_estimated_count(db)
+                if estimated_count is not None:
+                    return estimated_count, CountStrategyEnum.estimated
+            count_strategy = CountStrategyEnum.capped
+
+        if count_strategy == CountStrategyEnum.capped:
+            # 上限+1件まで数え、上限を超えた場合は上限の件数を返す
+            limited_stmt = select(self.model.id).where(*where_clause).limit(settings.PAGING_COUNT_CAP + 1)
+            stmt = select(func.count()).select_from(limited_stmt.subquery())
+            total_count = (await db.execute(stmt.execution_options(include_deleted=include_deleted))).scalar()
+            if total_count > settings.PAGING_COUNT_CAP:
+                return settings.PAGING_COUNT_CAP, CountStrategyEnum.capped
+            return total_count, CountStrategyEnum.exact
+
+        stmt = (
+            select(func.count(self.model.id))
+            .where(*where_clause)
+            .execution_options(include_deleted=include_deleted)
+        )
+        if count_strategy == CountStrategyEnum.cached:
+            table_name = self.model.__table__.name
+            compiled = stmt.compile()
+            cache_key = (
+                table_name,
+                count_cache.get_generation(table_name),
+                include_deleted,
+                str(compiled),
+                repr(sorted(compiled.params.items())),
+            )
+            total_count = count_cache.count_cache.get(cache_key)
+            if total_count is not None:
+                return total_count, CountStrategyEnum.cached
+            total_count = (await db.execute(stmt)).scalar()
+            count_cache.count_cache.set(cache_key, total_count)
+            return total_count, CountStrategyEnum.exact
+
+        return (await db.execute(stmt)).scalar(), CountStrategyEnum.exact
+
+    async def _get_estimated_count(self, db: AsyncSession) -> int | None:
+        """pg_class.reltuples(ANALYZE/VACUUM時点の推定行数)を返す。論理削除済の行も含む.
+
+        一度もANALYZEされていないtableの場合はNone.
+        """
+        # text()ではなくSELECTで記述し、RoutingSessionで読み取りとしてreplicaへ振り分けられるようにする
+        pg_class = table("pg_class", column("oid"), column("reltuples"))
+        stmt = select(cast(pg_class.c.reltuples, BigInteger)).where(
+            pg_class.c.oid == func.to_regclass(self.model.__table__.name)
+        )
+        estimated_count = (await db.execute(stmt)).scalar()
+        if estimated_count is None or estimated_count < 0:
+            return None
+        return estimated_count
+
+    async def _get_cursor_paged_list(
+        self,
+        db: AsyncSession,
+        paging_query_in: CursorPagingQueryIn,
+        where_clause: list[Any],
+        sort_query_in: schemas.SortQueryIn | None,
+        include_deleted: bool,
+        load_relationships: list[str] | None,
+        count_strategy: CountStrategyEnum,
+    ) -> ListResponseSchemaType:
+        """(sort_field, id)の値で絞り込む(keyset)ことで、OFFSETを使用せずにページングする
+        sort_fieldにはNULLを含まないcolumnを指定すること。未指定の場合はidで並べる.
+        """
+        sort_attr = self.model.id
+        is_desc = False
+        if sort_query_in:
+            order_by_clause = self._get_order_by_clause(sort_query_in.sort_field)
+            if order_by_clause is not None:
+                sort_attr = self.metadata.column_attrs[order_by_clause.key]
+            is_desc = sort_query_in.direction == SortDirectionEnum.desc
+        # 同じ値の行があってもページの境界が一意になるよう、idを第2キーとする
+        key_attrs = [sort_attr] if sort_attr.key == "id" else [sort_attr, self.model.id]
+
+        direction = CURSOR_NEXT
+        stmt = select(self.model).where(*where_clause)
+        if paging_query_in.cursor:
+            cursor = decode_cursor(paging_query_in.cursor)
+            if cursor["f"] != sort_attr.key:
+                raise APIException(ErrorMessage.INVALID_CURSOR)
+            direction = cursor["d"]
+            raw_values = [cursor["v"], cursor["id"]] if len(key_attrs) > 1 else [cursor["id"]]
+            cursor_values = [convert_cursor_value(attr, value) for attr, value in zip(key_attrs, raw_values)]
+        # 前のページは逆順で取得し、取得後に並べ直す
+        is_reversed = direction == CURSOR_PREV
+        is_desc_query = is_desc != is_reversed
+        if paging_query_in.cursor:
+            key_clause = tuple_(*key_attrs) if len(key_attrs) > 1 else key_attrs[0]
+            cursor_clause = tuple_(*cursor_values) if len(cursor_values) > 1 else cursor_values[0]
+            stmt = stmt.where(key_clause < cursor_clause if is_desc_query else key_clause > cursor_clause)
+
+        stmt = stmt.order_by(*[attr.desc() if is_desc_query else attr.asc() for attr in key_attrs])
+        stmt = self._add_relationship_options(stmt, load_relationships)
+        # 次のページの有無を判定するため、1件多く取得する
+        stmt = stmt.limit(paging_query_in.per_page + 1).execution_options(include_deleted=include_deleted)
+        db_obj_list = list((await db.execute(stmt)).unique().scalars().all())
+        has_more = len(db_obj_list) > paging_query_in.per_page
+        db_obj_list = db_obj_list[: paging_query_in.per_page]
+        if is_reversed:
+            db_obj_list.reverse()
+
+        next_cursor = prev_cursor = None
+        if db_obj_list:
+            if (is_reversed and paging_query_in.cursor) or (not is_reversed and has_more):
+                last = db_obj_list[-1]
+                next_cursor = encode_cursor(sort_attr.key, getattr(last, sort_attr.key), last.id, CURSOR_NEXT)
+            if (is_reversed and has_more) or (not is_reversed and paging_query_in.cursor):
+                first = db_obj_list[0]
+                prev_cursor = encode_cursor(sort_attr.key, getattr(first, sort_attr.key), first.id, CURSOR_PREV)
+
+        total_count, used_count_strategy = await self._get_total_count(
+            db, where_clause, include_deleted, count_strategy
+        )
+        meta = schemas.PagingMeta(
+            total_data_count=total_count,
+            total_page_count=self._get_total_page_count(total_count, paging_query_in.per_page),
+            per_page=paging_query_in.per_page,
+            count_strategy=used_count_strategy,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+        )
+        data_response = [self.response_schema_class.model_validate(d) for d in db_obj_list]
+        return self.list_response_class(data=data_response, meta=meta)
+
     async def create(
         self,
         db: AsyncSession,
@@ -177,7 +519,6 @@ class CRUDBase(
         db_obj = self.model(**exists_create_dict)
         db.add(db_obj)
         await db.flush()
-        await db.refresh(db_obj)
         return db_obj
 
     async def create_by_model_dump(
@@ -190,7 +531,6 @@ class CRUDBase(
         db_obj = self.model(**exists_create_dict)
         db.add(db_obj)
         await db.flush()
-        await db.refresh(db_obj)
 
         return db_obj
 
@@ -198,12 +538,18 @@ class CRUDBase(
         self,
         db: AsyncSession,
         create_schemas: list[CreateSchemaType],
+        chunk_size: int | None = None,
     ) -> list[ModelType]:
-        db_objs = [self.model(**data.model_dump()) for data in create_schemas]
-        db.add_all(db_objs)
-        await db.flush()
-        for obj in db_objs:
-            await db.refresh(obj)
+        """INSERT ... RETURNINGで一括作成し、作成したmodelを引数の順に返す
+        chunk_size件ごとに1つのINSERT文(複数行のVALUES)として実行するため、件数が多くても1件ずつのINSERTやrefreshは発生しない.
+        """
+        chunk_size = chunk_size or settings.BULK_CREATE_CHUNK_SIZE
+        rows = [self._filter_model_exists_fields(data.model_dump()) for data in create_schemas]
+        stmt = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+        db_objs: list[ModelType] = []
+        for i in range(0, len(rows), chunk_size):
+            result = await db.execute(stmt, rows[i : i + chunk_size])
+            db_objs.extend(result.scalars().all())
         return db_objs
 
     async def update(
@@ -224,7 +570,6 @@ class CRUDBase(
 
         db.add(db_obj)
         await db.flush()
-        await db.refresh(db_obj)
         return db_obj
 
     async def delete(self, db: AsyncSession, db_obj: ModelType) -> ModelType:
@@ -236,10 +581,84 @@ class CRUDBase(
         db_obj.deleted_at = datetime.datetime.now(tz=datetime.timezone.utc)
         db.add(db_obj)
         await db.flush()
-        await db.refresh(db_obj)
         return db_obj
 
     async def real_delete(self, db: AsyncSession, db_obj: ModelType) -> None:
         """実削除(real redele)."""
         await db.delete(db_obj)
         await db.flush()
+
+    def _get_not_deleted_clause(self, include_deleted: bool) -> list[Any]:
+        """UPDATE文には論理削除のfilterが自動で適用されないため、論理削除済を除外する条件を返す."""
+        if include_deleted or "deleted_at" not in self.metadata.column_key_set:
+            return []
+        return [self.model.deleted_at.is_(None)]
+
+    async def bulk_update(
+        self,
+        db: AsyncSession,
+        where_clause: list[Any],
+        values: dict[str, Any],
+        include_deleted: bool = False,
+    ) -> list[Any]:
+        """where_clauseに一致する行を1つのUPDATE文で更新し、更新した行のidを返す
+        onupdateが設定されたcolumn(updated_at)は自動で更新される.
+        """
+        values = self._filter_model_exists_fields(values)
+        if not values:
+            return []
+        stmt = (
+            update(self.model)
+            .where(*where_clause, *self._get_not_deleted_clause(include_deleted))
+            .values(**values)
+            .returning(self.model.id)
+        )
+        return list((await db.execute(stmt)).scalars().all())
+
+    async def upsert(
+        self,
+        db: AsyncSession,
+        rows: list[dict[str, Any]],
+        conflict_cols: list[str],
+        update_cols: list[str] | None = None,
+        chunk_size: int | None = None,
+    ) -> list[Any]:
+        """INSERT ... ON CONFLICT DO UPDATE(PostgreSQL)で一括登録・更新し、登録・更新した行のidを返す
+        conflict_colsには一意制約(unique index)のcolumnを指定する.
+        update_colsを省略した場合は、conflict_colsとid以外の指定されたcolumnを更新する。
+        空のlistの場合はDO NOTHINGとなり、登録した行のidのみを返す.
+        """
+        rows = [self._filter_model_exists_fields(row) for row in rows]
+        if not rows:
+            return []
+        if update_cols is None:
+            update_cols = [key for key in rows[0] if key not in conflict_cols and key != "id"]
+
+        stmt = pg_insert(self.model)
+        set_ = {key: stmt.excluded[key] for key in update_cols}
+        if set_ and "updated_at" in self.metadata.column_key_set and "updated_at" not in set_:
+            # ON CONFLICT DO UPDATEではonupdateが適用されないため明示的に更新する
+            set_["updated_at"] = func.current_timestamp()
+        if set_:
+            stmt = stmt.on_conflict_do_update(index_elements=conflict_cols, set_=set_)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=conflict_cols)
+        stmt = stmt.returning(self.model.id)
+
+        chunk_size = chunk_size or settings.BULK_CREATE_CHUNK_SIZE
+        ids: list[Any] = []
+        for i in range(0, len(rows), chunk_size):
+            ids.extend((await db.execute(stmt, rows[i : i + chunk_size])).scalars().all())
+        return ids
+
+    async def bulk_soft_delete(self, db: AsyncSession, where_clause: list[Any]) -> list[Any]:
+        """where_clauseに一致する未削除の行を1つのUPDATE文で論理削除し、削除した行のidを返す."""
+        if "deleted_at" not in self.metadata.column_key_set:
+            raise APIException(ErrorMessage.SOFT_DELETE_NOT_SUPPORTED)
+        stmt = (
+            update(self.model)
+            .where(*where_clause, self.model.deleted_at.is_(None))
+            .values(deleted_at=datetime.datetime.now(tz=datetime.timezone.utc))
+            .returning(self.model.id)
+        )
+        return list((await db.execute(stmt)).scalars().all())
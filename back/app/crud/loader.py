@@ -0,0 +1,115 @@
+import asyncio
+from collections.abc import Iterable
+from typing import Any, Generic
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase, ModelType
+
+# リクエスト内でidによるデータの取得をまとめる(DataLoader)
+# 同じevent loopのtick内にload()されたidを1回の WHERE id = ANY(:ids) で取得し、結果はリクエストの間保持する
+# 例: notes = await asyncio.gather(*(loader.load(id) for id in note_ids)) はSELECT1回となる
+
+# リクエスト(session)内のloaderを保持するsession.infoのkey
+BY_ID_LOADERS_INFO_KEY = "by_id_loaders"
+
+
+class ByIdLoader(Generic[ModelType]):
+    """idによるデータの取得をまとめるloader
+    get_by_id_loaderでsessionごとに生成し、同じsession(リクエスト)の間だけ使用する.
+
+    Notes
+    AsyncSessionは同時に1つのSQLしか実行できないため、load()の結果を待っている間に、
+    同じsessionで別のSQLを並行して実行しないこと.
+    論理削除済のデータは、get_db_obj_by_idと同様にNoneとなる.
+    idはprimary keyの型(UUIDなど)に変換してから比較するため、文字列のidを指定することもできる.
+    """
+
+    def __init__(self, db: AsyncSession, crud: CRUDBase[ModelType, Any, Any, Any, Any]) -> None:
+        self.db = db
+        self.crud = crud
+        # id -> 取得結果のFuture(取得済・取得中の両方)
+        self._futures: dict[Any, asyncio.Future[ModelType | None]] = {}
+        # 次に取得するid
+        self._pending_ids: list[Any] = []
+        # 実行中の取得task(GCで破棄されないよう参照を保持する)
+        self._tasks: set[asyncio.Task[None]] = set()
+        # primary keyの型への変換
+        self._id_adapter = TypeAdapter(crud.model.id.type.python_type)
+
+    def _to_id(self, id: Any) -> Any:
+        """idをprimary keyの型に変換する。変換できない場合はValueError."""
+        try:
+            return self._id_adapter.validate_python(id)
+        except ValidationError:
+            raise ValueError(f"{self.crud.model.__name__}のidとして不正な値です: {id!r}")
+
+    def load(self, id: Any) -> "asyncio.Future[ModelType | None]":
+        """idのデータを返すFutureを返す。同じtick内の呼び出しは1回のSELECTにまとめる."""
+        id = self._to_id(id)
+        future = self._futures.get(id)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[id] = future
+        if not self._pending_ids:
+            # 現在のtickで実行待ちの処理(gatherした他のcoroutineなど)の後に取得する
+            loop.call_soon(self._dispatch)
+        self._pending_ids.append(id)
+        return future
+
+    async def load_many(self, ids: Iterable[Any]) -> list[ModelType | None]:
+        """idsのデータをidsの順で返す。見つからないidはNoneとなる."""
+        return list(await asyncio.gather(*(self.load(id) for id in ids)))
+
+    def prime(self, db_obj: ModelType) -> None:
+        """取得済のdb_objをloaderに登録する(以降のload()でSELECTしない)."""
+        future = self._futures.get(db_obj.id)
+        if future is None or future.done():
+            future = asyncio.get_running_loop().create_future()
+            self._futures[db_obj.id] = future
+        future.set_result(db_obj)
+
+    def clear(self, id: Any | None = None) -> None:
+        """更新・削除したデータを、次のload()で再取得するよう破棄する。idを省略した場合は全て破棄する."""
+        if id is None:
+            self._futures = {id: future for id, future in self._futures.items() if not future.done()}
+        elif (future := self._futures.get(id := self._to_id(id))) is not None and future.done():
+            del self._futures[id]
+
+    def _dispatch(self) -> None:
+        ids, self._pending_ids = self._pending_ids, []
+        task = asyncio.get_running_loop().create_task(self._fetch(ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, ids: list[Any]) -> None:
+        futures = [self._futures[id] for id in ids]
+        try:
+            db_objs = await self.crud.get_db_obj_list_by_ids(self.db, ids)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            # 失敗したidは次のload()で再取得する
+            for id in ids:
+                self._futures.pop(id, None)
+            return
+
+        db_obj_by_id = {db_obj.id: db_obj for db_obj in db_objs}
+        for id, future in zip(ids, futures):
+            if not future.done():
+                future.set_result(db_obj_by_id.get(id))
+
+
+def get_by_id_loader(db: AsyncSession, crud: CRUDBase[ModelType, Any, Any, Any, Any]) -> ByIdLoader[ModelType]:
+    """sessionに紐づくcrud.modelのloaderを返す(同じリクエスト内では同じloaderを返す)."""
+    loaders = db.info.setdefault(BY_ID_LOADERS_INFO_KEY, {})
+    loader = loaders.get(crud.model)
+    if loader is None:
+        loader = ByIdLoader(db, crud)
+        loaders[crud.model] = loader
+    return loader
@@ -1,21 +1,103 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import select, desc
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, joinedload, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, case, delete, desc, event, func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from uuid import UUID
+from zoneinfo import ZoneInfo
 import json
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Sequence, Tuple
 import datetime
-from app.models.base import Notes, TrainingNotes
+from app.models.base import NOTE_SEARCH_DOCUMENT, Notes, TrainingNotes
+from app.crud.base import (
+    CURSOR_NEXT,
+    convert_cursor_value,
+    decode_cursor,
+    encode_cursor,
+    get_column_attrs,
+)
+from app.exceptions.core import APIException
+from app.exceptions.error_messages import ErrorMessage
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import REPLICA_ENGINE
 from app.core.logger import get_logger
+from app.schemas.note import NoteDetailResponse
 
 logger = get_logger(__name__)
 
+# ノート一覧で返すcolumn(assignmentは先頭のみを返す)
+NOTE_LIST_COLUMNS = (
+    Notes.id,
+    Notes.created_at,
+    Notes.theme,
+    (
+        func.substr(Notes.assignment, 1, settings.NOTE_LIST_ASSIGNMENT_PREVIEW_LENGTH)
+        if settings.NOTE_LIST_ASSIGNMENT_PREVIEW_LENGTH > 0
+        else Notes.assignment
+    ).label("assignment"),
+)
+# ノート一覧のcursorの並び順のcolumn
+NOTE_LIST_CURSOR_FIELD = "created_at"
+# ノート検索で、キーワードが含まれる場合に加算するスコア(タイトルに含まれるものを上位とする)
+NOTE_SEARCH_WEIGHTS = ((Notes.theme, 3), (Notes.assignment, 2), (Notes.practice, 1))
+# ノート詳細のcolumnではないfieldと、その値の生成に必要なcolumn
+NOTE_DETAIL_FIELD_COLUMNS = {"my_video_url": "my_video"}
+
+# note_id -> ノート詳細のレスポンス(fields指定なし) のキャッシュ
+# ノートの更新・削除時に該当のnote_idを削除する
+# プロセス内のキャッシュのため、他のインスタンス(Cloud Run)での更新・削除はTTL(最大60秒)経過まで反映されない
+note_detail_cache: TTLCache[UUID, NoteDetailResponse] = TTLCache(
+    maxsize=settings.NOTE_DETAIL_CACHE_MAX_SIZE, ttl=settings.NOTE_DETAIL_CACHE_TTL_SECONDS
+)
+
+# 更新・削除したnote_idを、commit時にキャッシュから削除するためのsession.infoのkey
+NOTE_DETAIL_INVALIDATED_INFO_KEY = "note_detail_invalidated"
+
+
+def invalidate_note_detail_cache(db: AsyncSession, note_id: UUID) -> None:
+    """ノートの更新・削除時に、ノート詳細のキャッシュを削除する
+    commitまでの間に他のリクエストが変更前のデータをキャッシュした場合に備え、commit時にも削除する.
+    """
+    note_detail_cache.delete(note_id)
+    db.info.setdefault(NOTE_DETAIL_INVALIDATED_INFO_KEY, set()).add(note_id)
+
+
+def set_note_detail_cache(db: AsyncSession, note_id: UUID, response: NoteDetailResponse) -> None:
+    """ノート詳細のレスポンスをキャッシュする
+    replicaから読み取ったデータは、更新の反映前(キャッシュ削除後)の古いデータの可能性があるため、キャッシュしない.
+    """
+    if REPLICA_ENGINE in db.info:
+        return
+    note_detail_cache.set(note_id, response)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_note_details(session: Session) -> None:
+    for note_id in session.info.pop(NOTE_DETAIL_INVALIDATED_INFO_KEY, ()):
+        note_detail_cache.delete(note_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_invalidated_note_details(session: Session) -> None:
+    session.info.pop(NOTE_DETAIL_INVALIDATED_INFO_KEY, None)
+
 
 async def create_note(
     db: AsyncSession, user_id: UUID, note_data: dict, video_path: Optional[str] = None
-) -> Notes:
-    """野球ノートを作成する"""
+) -> Tuple[Notes, List[TrainingNotes]]:
+    """野球ノートを作成し、作成したノートとトレーニングノートを返す
+    ノートと全てのトレーニングノートを、それぞれ1回の INSERT ... RETURNING で登録するため、登録後の再取得は不要
+    """
+    # 不正なJSONの場合は、ノートを登録する前にエラーとする
+    trainings_data = json.loads(note_data["trainings"])
+    # training_id -> count(同じトレーニングが複数ある場合は、update_noteと同様に後のものを使用する)
+    counts = {
+        UUID(training["training_id"]): int(training["count"])
+        for training in trainings_data
+    }
 
     # 新しいノートの作成
     new_note = Notes(
@@ -30,109 +112,225 @@ async def create_note(
         practice=note_data.get("practice"),
     )
 
-    # データベースに追加
+    # データベースに追加(created_at, updated_atはRETURNINGで取得される)
     db.add(new_note)
-    await db.flush()  # IDを取得するためにflush
-
-    # トレーニングの関連付け
-    trainings_data = json.loads(note_data["trainings"])
-    for training in trainings_data:
-        training_note = TrainingNotes(
-            note_id=new_note.id,
-            training_id=UUID(training["training_id"]),
-            count=int(training["count"]),
+    await db.flush()
+
+    # トレーニングの関連付け(commitはリクエスト終了時にget_async_dbで1回だけ行う)
+    training_notes: List[TrainingNotes] = []
+    if counts:
+        stmt = insert(TrainingNotes).returning(TrainingNotes, sort_by_parameter_order=True)
+        result = await db.execute(
+            stmt,
+            [
+                {"note_id": new_note.id, "training_id": training_id, "count": count}
+                for training_id, count in counts.items()
+            ],
+        )
+        training_notes = list(result.scalars().all())
+
+    return new_note, training_notes
+
+
+async def get_note(
+    db: AsyncSession,
+    user_id: UUID,
+    fields: Optional[List[str]] = None,
+    per_page: Optional[int] = None,
+    cursor: Optional[str] = None,
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """ユーザーIDに紐づくノート一覧を簡易形式で取得する（id, created_at, theme, assignmentの先頭のみ）
+    fieldsを指定した場合は、そのcolumnのみを取得する
+    from_date, to_dateを指定した場合は、その期間(両端の日付を含む、NOTE_DATE_TIMEZONEの日付)に
+    作成したノートのみを取得する
+    per_pageを指定した場合は、作成日時の新しい順にper_page件ずつ(created_at, id)のcursorでページングし、
+    (ノート一覧, 次のページのcursor)を返す
+    """
+    columns: Sequence[Any] = NOTE_LIST_COLUMNS
+    if fields is not None:
+        columns = [column for column in NOTE_LIST_COLUMNS if column.key in fields]
+    # cursorの生成に必要なcolumnは、fieldsに含まれなくても取得する
+    column_keys = [column.key for column in columns]
+    key_columns = [Notes.created_at, Notes.id] if per_page is not None else []
+    select_columns = [*columns, *[column for column in key_columns if column.key not in column_keys]]
+
+    # (user_id, created_at)のindex(ix_notes_user_id_created_at)で絞り込み・並び替えを行う
+    stmt = select(*select_columns).where(Notes.user_id == user_id)
+    # 日付はNOTE_DATE_TIMEZONEの0時で区切る(created_atはtimestamptzのため、tzinfoのないdatetimeと比較しない)
+    note_date_tz = ZoneInfo(settings.NOTE_DATE_TIMEZONE)
+    if from_date is not None:
+        stmt = stmt.where(
+            Notes.created_at >= datetime.datetime.combine(from_date, datetime.time.min, tzinfo=note_date_tz)
+        )
+    if to_date is not None:
+        stmt = stmt.where(
+            Notes.created_at
+            < datetime.datetime.combine(to_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=note_date_tz)
         )
-        db.add(training_note)
-
-    # 変更をコミット
-    await db.commit()
-    await db.refresh(new_note)
-
-    return new_note
-
-
-def get_note(db: Session, user_id: UUID) -> List[Dict]:
-    """ユーザーIDに紐づくノート一覧を簡易形式で取得する（id, created_at, theme, assignmentのみ）同期バージョン"""
 
+    if per_page is None:
+        result = await db.execute(stmt.order_by(desc(Notes.created_at)))
+        return [dict(row._mapping) for row in result], None
+
+    if cursor is not None:
+        cursor_payload = decode_cursor(cursor)
+        if cursor_payload["f"] != NOTE_LIST_CURSOR_FIELD or cursor_payload["d"] != CURSOR_NEXT:
+            raise APIException(ErrorMessage.INVALID_CURSOR)
+        stmt = stmt.where(
+            tuple_(Notes.created_at, Notes.id)
+            < tuple_(
+                convert_cursor_value(Notes.created_at, cursor_payload["v"]),
+                convert_cursor_value(Notes.id, cursor_payload["id"]),
+            )
+        )
+    # 次のページの有無を判定するため、1件多く取得する
+    stmt = stmt.order_by(desc(Notes.created_at), desc(Notes.id)).limit(per_page + 1)
+    rows = (await db.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            NOTE_LIST_CURSOR_FIELD, last.created_at, last.id, CURSOR_NEXT
+        )
+    notes = [{key: row._mapping[key] for key in column_keys} for row in rows]
+    return notes, next_cursor
+
+
+def _to_like_pattern(keyword: str) -> str:
+    """キーワードを部分一致のLIKEのパターンにする(%, _ はそのまま検索する)."""
+    escaped = keyword.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{escaped}%"
+
+
+async def search_notes(
+    db: AsyncSession,
+    keyword: str,
+    page: int = 1,
+    per_page: int = 20,
+    user_id: Optional[UUID] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """theme, assignment, practiceにキーワードを含むノートを検索し、(ノート一覧, 次のページの有無)を返す
+    空白区切りで複数のキーワードを指定した場合は、全てのキーワードを含むノートを返す
+    スコア(キーワードを含むcolumnの重みの合計)の高い順、作成日時の新しい順に並べる
+    絞り込みはpg_trgmのindex(ix_notes_search_trgm)で行う。3文字未満のキーワードはindexで絞り込めないため遅くなる
+    """
+    patterns = [_to_like_pattern(word) for word in keyword.split()]
+    if not patterns:
+        return [], False
+    score = sum(
+        case((column.ilike(pattern, escape="/"), weight), else_=0)
+        for pattern in patterns
+        for column, weight in NOTE_SEARCH_WEIGHTS
+    ).label("score")
+
+    stmt = select(*NOTE_LIST_COLUMNS, Notes.user_id, score).where(
+        and_(*[NOTE_SEARCH_DOCUMENT.ilike(pattern, escape="/") for pattern in patterns])
+    )
+    if user_id is not None:
+        stmt = stmt.where(Notes.user_id == user_id)
+    # 次のページの有無を判定するため、1件多く取得する
     stmt = (
-        select(Notes.id, Notes.created_at, Notes.theme, Notes.assignment)
-        .where(Notes.user_id == user_id, Notes.deleted_at.is_(None))
-        .order_by(desc(Notes.created_at))
+        stmt.order_by(desc(score), desc(Notes.created_at), desc(Notes.id))
+        .offset((page - 1) * per_page)
+        .limit(per_page + 1)
     )
+    rows = (await db.execute(stmt)).all()
+    return [dict(row._mapping) for row in rows[:per_page]], len(rows) > per_page
 
-    result = db.execute(stmt)
-    notes = []
-
-    for row in result:
-        notes.append(
-            {
-                "id": row.id,
-                "created_at": row.created_at,
-                "theme": row.theme,
-                "assignment": row.assignment,
-            }
-        )
-
-    return notes
 
-
-def delete_note(db: Session, note_id: UUID) -> bool:
+async def delete_note(db: AsyncSession, note_id: UUID) -> bool:
     """ノートを論理削除します"""
 
-    note = (
-        db.query(Notes).filter(Notes.id == note_id, Notes.deleted_at.is_(None)).first()
+    result = await db.execute(
+        select(Notes).where(Notes.id == note_id)
     )
+    note = result.scalar_one_or_none()
     if not note:
         return False
-    training_notes = (
-        db.query(TrainingNotes)
-        .filter(TrainingNotes.note_id == note_id, TrainingNotes.deleted_at.is_(None))
-        .all()
+    result = await db.execute(
+        select(TrainingNotes).where(TrainingNotes.note_id == note_id)
     )
+    training_notes = result.scalars().all()
     # 関連するトレーニングノートがあれば論理削除
     if training_notes:
         for training_note in training_notes:
             training_note.deleted_at = datetime.datetime.now()
 
     note.deleted_at = datetime.datetime.now()
-    db.commit()
+    await db.flush()
+    invalidate_note_detail_cache(db, note_id)
     return True
 
 
-def get_note_detail(db: Session, note_id: UUID):
-    """ノートの詳細情報を取得する(同期バージョン)"""
+async def get_note_detail(
+    db: AsyncSession, note_id: UUID, fields: Optional[List[str]] = None
+):
+    """ノートの詳細情報を、トレーニングノート・トレーニング情報と一緒に1回のSELECTで取得する
+    fieldsを指定した場合は、Notesのそのcolumn(と主キー)のみを取得する(training_notesを含む場合のみトレーニングノートも取得する)
+    """
 
-    # ノートとトレーニングノート、トレーニング情報を一緒に取得
-    note = (
-        db.query(Notes)
-        .options(joinedload(Notes.training_notes).joinedload(TrainingNotes.training))
-        .filter(Notes.id == note_id, Notes.deleted_at.is_(None))
-        .first()
-    )
+    stmt = select(Notes).where(Notes.id == note_id)
+    if fields is not None:
+        stmt = stmt.options(
+            load_only(
+                Notes.id, *get_column_attrs(Notes, fields, NOTE_DETAIL_FIELD_COLUMNS)
+            )
+        )
+    if fields is None or "training_notes" in fields:
+        # ノートとトレーニングノート、トレーニング情報を一緒に取得
+        stmt = stmt.options(
+            joinedload(Notes.training_notes).joinedload(TrainingNotes.training)
+        )
 
-    if not note:
-        return None
+    result = await db.execute(stmt)
+    note = result.unique().scalar_one_or_none()
 
     return note
 
 
+async def get_note_details(db: AsyncSession, note_ids: List[UUID]) -> List[Notes]:
+    """複数のノートの詳細情報を、トレーニングノート・トレーニング情報と一緒に1回のSELECTで取得する(順序は保証しない)"""
+    if not note_ids:
+        return []
+    stmt = (
+        select(Notes)
+        .where(Notes.id.in_(note_ids))
+        .options(joinedload(Notes.training_notes).joinedload(TrainingNotes.training))
+    )
+    result = await db.execute(stmt)
+    return list(result.unique().scalars().all())
+
+
 async def get_note_by_id(db: AsyncSession, note_id: UUID) -> Optional[Notes]:
     """IDでノートを取得する（非同期版）"""
     result = await db.execute(
-        select(Notes).where(Notes.id == note_id, Notes.deleted_at.is_(None))
+        select(Notes).where(Notes.id == note_id)
     )
     return result.scalar_one_or_none()
 
 
-async def update_note(db: AsyncSession, note_id: UUID, note_data: dict) -> Notes:
-    """野球ノートを更新する"""
+async def update_note(
+    db: AsyncSession, note_id: UUID, note_data: dict
+) -> Optional[Tuple[Notes, List[TrainingNotes]]]:
+    """野球ノートを更新し、更新したノートと更新後のトレーニングノートを返す
+    更新後のトレーニングノートは、取得済のトレーニングノートと INSERT ... RETURNING の結果から生成するため、
+    更新後の再取得は不要
+    """
     # 既存のノートを取得
-    stmt = select(Notes).where(Notes.id == note_id, Notes.deleted_at.is_(None))
+    stmt = select(Notes).where(Notes.id == note_id)
     result = await db.execute(stmt)
     note = result.scalar_one_or_none()
 
     if not note:
         return None
+    # 同じリクエストでトレーニングノートを取得済(get_note_detail)の場合は、再取得しない
+    if "training_notes" in inspect(note).unloaded:
+        await db.refresh(note, ["training_notes"])
+    training_notes = list(note.training_notes)
 
     # 既存のノートに新しいデータを挿入して上書きする
     note.theme = note_data["theme"]
@@ -148,40 +346,57 @@ async def update_note(db: AsyncSession, note_id: UUID, note_data: dict) -> Notes
     note.looked_day = note_data["looked_day"]
     note.practice = note_data.get("practice")
 
-    # トレーニングの更新
+    # トレーニングの更新(変更のあった行のみを書き込む)
     if "trainings" in note_data:
-        # 既存のトレーニングノートを削除
-        delete_stmt = select(TrainingNotes).where(TrainingNotes.note_id == note_id)
-        existing_trainings = await db.execute(delete_stmt)
-        for training in existing_trainings.scalars().all():
-            await db.delete(training)
-
-        # 新しいトレーニングノートを追加
         trainings_data = json.loads(note_data["trainings"])
-        for training in trainings_data:
-            training_note = TrainingNotes(
-                note_id=note_id,
-                training_id=UUID(training["training_id"]),
-                count=int(training["count"]),
+        # training_id -> count(同じトレーニングが複数ある場合は後のものを使用する)
+        counts = {
+            UUID(training["training_id"]): int(training["count"])
+            for training in trainings_data
+        }
+
+        # 送信されなかったトレーニングを1回のDELETEで削除
+        await db.execute(
+            delete(TrainingNotes).where(
+                TrainingNotes.note_id == note_id,
+                TrainingNotes.training_id.not_in(counts),
             )
-            db.add(training_note)
-
-    # 変更をコミット　noteをリターンしているけど、そこにトレーニングが入っていないことに注意
-    await db.commit()
-    await db.refresh(note)  # 最新の状態にしてリターンするために
+        )
 
-    return note
+        # 追加・回数を変更したトレーニングのみを1回の INSERT ... ON CONFLICT で書き込む
+        # 回数が同じ行は更新しないため、不要な行の書き換え(dead tuple)が発生しない
+        if counts:
+            stmt = pg_insert(TrainingNotes).values(
+                [
+                    {"note_id": note_id, "training_id": training_id, "count": count}
+                    for training_id, count in counts.items()
+                ]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[TrainingNotes.note_id, TrainingNotes.training_id],
+                set_={"count": stmt.excluded.count, "updated_at": func.current_timestamp()},
+                where=TrainingNotes.count != stmt.excluded.count,
+            )
+            # 書き込んだ行はsession内のobjectにも反映する
+            written = await db.execute(
+                stmt.returning(TrainingNotes),
+                execution_options={"populate_existing": True},
+            )
+            written_training_notes = written.scalars().all()
+        else:
+            written_training_notes = []
 
+        # 削除した行を除き、追加した行を加えたものが更新後のトレーニングノートとなる
+        training_notes = [tn for tn in training_notes if tn.training_id in counts]
+        kept_ids = {tn.id for tn in training_notes}
+        training_notes += [tn for tn in written_training_notes if tn.id not in kept_ids]
+        # 変更履歴を残さずにcollectionを置き換える(flush時にDELETE済の行を再度削除しないため)
+        set_committed_value(note, "training_notes", training_notes)
 
-async def get_note_detail_async(db: AsyncSession, note_id: UUID):
-    """ノートの詳細情報を取得する（非同期版）"""
-    stmt = (
-        select(Notes)
-        .options(joinedload(Notes.training_notes).joinedload(TrainingNotes.training))
-        .where(Notes.id == note_id, Notes.deleted_at.is_(None))
-    )
+    # 変更をflush(created_at, updated_atはRETURNINGで取得される)
+    # noteをリターンしているけど、そこにトレーニングが入っていないことに注意
+    await db.flush()
+    invalidate_note_detail_cache(db, note_id)
 
-    result = await db.execute(stmt)
-    note = result.unique().scalar_one_or_none()
+    return note, training_notes
 
-    return note
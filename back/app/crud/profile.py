@@ -1,14 +1,29 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from sqlalchemy import select
-from app.models.base import Profiles, Users
+from sqlalchemy.orm import load_only
+from app.models.base import Profiles
+from app.crud import user as user_crud
+from app.crud.base import get_column_attrs
 from app.schemas.profile import CreateProfile, UpdateProfile
 from app.core.logger import get_logger
-from typing import List
+from typing import Any, List
 
 
 logger = get_logger(__name__)
 
+# プロフィールのcolumnではないfieldと、その値の生成に必要なcolumn
+PROFILE_FIELD_COLUMNS = {"image_url": "image_path"}
+
+
+def _load_only_fields(stmt: Any, fields: List[str] | None) -> Any:
+    """fieldsを指定した場合は、そのcolumn(と主キー)のみを取得する"""
+    if fields is None:
+        return stmt
+    return stmt.options(
+        load_only(Profiles.id, *get_column_attrs(Profiles, fields, PROFILE_FIELD_COLUMNS))
+    )
+
 
 async def create_profile(db: AsyncSession, profile: CreateProfile) -> Profiles:
     # 既存のプロフィールがあるか確認
@@ -20,21 +35,26 @@ async def create_profile(db: AsyncSession, profile: CreateProfile) -> Profiles:
 
     db_profile = Profiles(**profile.model_dump())
     db.add(db_profile)
-    await db.commit()
-    await db.refresh(db_profile)
+    await db.flush()
     return db_profile
 
 
-async def get_profile_by_user_id(db: AsyncSession, user_id: UUID) -> Profiles | None:
+async def get_profile_by_user_id(
+    db: AsyncSession, user_id: UUID, fields: List[str] | None = None
+) -> Profiles | None:
     # db.execute(): このSQLを実行する
-    result = await db.execute(select(Profiles).where(Profiles.user_id == user_id))
+    stmt = _load_only_fields(select(Profiles).where(Profiles.user_id == user_id), fields)
+    result = await db.execute(stmt)
     profile = result.scalar_one_or_none()
     return profile
 
 
-async def get_all_profile(db: AsyncSession) -> List[Profiles]:
+async def get_all_profile(
+    db: AsyncSession, fields: List[str] | None = None
+) -> List[Profiles]:
     """すべてのプロフィールを取得する"""
-    result = await db.execute(select(Profiles).order_by(Profiles.created_at.desc()))
+    stmt = _load_only_fields(select(Profiles).order_by(Profiles.created_at.desc()), fields)
+    result = await db.execute(stmt)
     return result.scalars().all()
 
 
@@ -42,20 +62,22 @@ async def update_profile(
     db: AsyncSession, profile_id: UUID, profile: UpdateProfile
 ) -> Profiles | None:
     result = await db.execute(select(Profiles).where(Profiles.id == profile_id))
-    # IDが一致するプロフィールが1つ見つかればそれを返し、見つからなければ None を返します。複数見つかった場合はエラーになります。
+    # IDが一致するプロフィールが1つ見つかればそれを返し、見つからなければ None を返します。
+    # 複数見つかった場合はエラーになります。
     db_profile = result.scalar_one_or_none()
 
     if db_profile is None:
         return None
         # UpdateProfileの更新されたフィールドのみを辞書として取得。ここでは変更があった値のみを辞書型として抽出している
-        # setattrでデータベースオブジェクトの対応する属性を更新する  exclude_unset=Trueで明示的に値が設定されたフィールドのみと限定している
-        # setattr（オブジェクト名、オブジェクトのカラム名、　新しい値）これで、変更できるように設定して、そのあと、データベースに保存してようやく修正が完了
+        # setattrでデータベースオブジェクトの対応する属性を更新する
+        # exclude_unset=Trueで明示的に値が設定されたフィールドのみと限定している
+        # setattr（オブジェクト名、オブジェクトのカラム名、　新しい値）これで、変更できるように設定して、
+        # そのあと、データベースに保存してようやく修正が完了
         # この時点では、変更はメモリ上のオブジェクトにのみ適用されている（DBには保存されていない）
     for key, value in profile.model_dump(exclude_unset=True).items():
         setattr(db_profile, key, value)  # ブジェクトの属性を動的に設定
 
-    await db.commit()
-    await db.refresh(db_profile)
+    await db.flush()
     return db_profile
 
 
@@ -67,22 +89,21 @@ async def get_profile_by_id(db: AsyncSession, profile_id: UUID) -> Profiles | No
 
 
 async def get_profile_by_firebase_uid(
-    db: AsyncSession, firebase_uid: str
+    db: AsyncSession, firebase_uid: str, fields: List[str] | None = None
 ) -> Profiles | None:
     """Firebase UIDからプロフィールを取得する"""
     logger.info(f"Firebase UIDでプロフィール検索: {firebase_uid}")
-    # まずUsersテーブルからFirebase UIDに対応するユーザーを検索
-    result = await db.execute(select(Users).where(Users.firebase_uid == firebase_uid))
-    user = result.scalar_one_or_none()
+    # まずFirebase UIDに対応するユーザーを検索(リクエスト内/TTLキャッシュ済の場合はDBに問い合わせない)
+    user = await user_crud.resolve_current_user(db, firebase_uid)
 
     if not user:
         logger.info(f"Firebase UID {firebase_uid} のユーザーが見つかりません")
         return None
 
-    logger.info(f"ユーザー発見: ID={user.id}, Email={user.email}")
+    logger.info(f"ユーザー発見: ID={user.id}")
 
     # ユーザーが見つかったら、そのIDでプロフィールを検索
-    profile = await get_profile_by_user_id(db, user.id)
+    profile = await get_profile_by_user_id(db, user.id, fields)
     if profile:
         logger.info(f"プロフィール発見: ID={profile.id}")
     else:
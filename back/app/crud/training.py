@@ -1,46 +1,51 @@
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List
 from uuid import UUID
 
-from app.models.base import Trainings, Users
-from app.schemas.training import TrainingCreate
+from app.crud.base import CRUDBase
+from app.models.base import Trainings
+from app.schemas.training import TrainingCreate, TrainingList, TrainingResponse
 from datetime import datetime
 
+# idによる取得(get_by_id_loaderでのまとめての取得など)に使用する
+training_crud_base: CRUDBase[Trainings, TrainingResponse, TrainingCreate, Any, TrainingList] = CRUDBase(
+    Trainings, TrainingResponse, TrainingList
+)
 
-def create_training(db: Session, training_data: TrainingCreate) -> Trainings:
-    user = (
-        db.query(Users).filter(Users.firebase_uid == training_data.firebase_uid).first()
-    )
-    if not user:
-        return None
+
+async def create_training(
+    db: AsyncSession, training_data: TrainingCreate, user_id: UUID
+) -> Trainings:
     # これはクラスのインスタンス化です
-    db_training = Trainings(menu=training_data.menu, user_id=user.id)
+    db_training = Trainings(menu=training_data.menu, user_id=user_id)
     db.add(db_training)
-    db.commit()
-    db.refresh(db_training)
+    await db.flush()
     return db_training
 
 
-def get_specific_trainings(db: Session, firebase_uid: str) -> List[Trainings]:
-    user = db.query(Users).filter(Users.firebase_uid == firebase_uid).first()
-    return (
-        db.query(Trainings)
-        .filter(Trainings.user_id == user.id, Trainings.deleted_at.is_(None))
-        .all()
+async def get_specific_trainings(db: AsyncSession, user_id: UUID) -> List[Trainings]:
+    result = await db.execute(
+        select(Trainings).where(
+            Trainings.user_id == user_id, Trainings.deleted_at.is_(None)
+        )
     )
+    return result.scalars().all()
 
 
-def delete_training(db: Session, training_id: UUID) -> bool:
-    db_training = db.query(Trainings).filter(Trainings.id == training_id).first()
+async def delete_training(db: AsyncSession, training_id: UUID) -> bool:
+    result = await db.execute(select(Trainings).where(Trainings.id == training_id))
+    db_training = result.scalar_one_or_none()
     if not db_training:
         return False
 
     # 物理削除から論理削除に変更
     db_training.deleted_at = datetime.now()
-    db.commit()
+    await db.flush()
     return True
 
 
-def get_all_trainings(db: Session) -> List[Trainings]:
+async def get_all_trainings(db: AsyncSession) -> List[Trainings]:
     """すべてのトレーニングメニューを取得する"""
-    return db.query(Trainings).filter(Trainings.deleted_at.is_(None)).all()
+    result = await db.execute(select(Trainings).where(Trainings.deleted_at.is_(None)))
+    return result.scalars().all()
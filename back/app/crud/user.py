@@ -1,50 +1,111 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import event, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import REPLICA_ENGINE
 from app.models.base import Users
-from app.schemas.auth import UserCreate
+from app.schemas.auth import CurrentUser, UserCreate
 from uuid import UUID
 
+# firebase_uid -> CurrentUser(id, role) のキャッシュ
+# ユーザーの作成・更新時に該当のfirebase_uidを削除する
+current_user_cache: TTLCache[str, CurrentUser] = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
 
-def get_user_by_id(db: Session, user_id: UUID):
-    return db.query(Users).filter(Users.id == user_id).first()
+# リクエスト(session)内で解決済のユーザーを保持するsession.infoのkey
+CURRENT_USERS_INFO_KEY = "current_users"
+# 作成・更新したユーザーのfirebase_uidを、commit時にキャッシュから削除するためのsession.infoのkey
+CURRENT_USER_INVALIDATED_INFO_KEY = "current_user_invalidated"
 
 
-def get_user_by_firebase_uid(db: Session, firebase_uid: str):
-    return db.query(Users).filter(Users.firebase_uid == firebase_uid).first()
+async def get_user_by_id(db: AsyncSession, user_id: UUID):
+    result = await db.execute(select(Users).where(Users.id == user_id))
+    return result.scalar_one_or_none()
 
 
-async def get_user_by_firebase_uid_async(db: AsyncSession, firebase_uid: str):
+async def get_user_by_firebase_uid(db: AsyncSession, firebase_uid: str):
     result = await db.execute(select(Users).where(Users.firebase_uid == firebase_uid))
     return result.scalar_one_or_none()
 
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(Users).filter(Users.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(Users).where(Users.email == email))
+    return result.scalar_one_or_none()
+
+
+async def resolve_current_user(
+    db: AsyncSession, firebase_uid: str
+) -> CurrentUser | None:
+    """firebase_uidからユーザーのid, roleを取得する
+
+    同一リクエスト内ではsession.infoに保持した結果を、それ以外ではTTLキャッシュを使用し、
+    どちらにも無い場合のみDBに問い合わせる(TTLキャッシュにはprimaryから読み取ったユーザーのみを登録する).
+    """
+    request_users = db.info.setdefault(CURRENT_USERS_INFO_KEY, {})
+    if firebase_uid in request_users:
+        return request_users[firebase_uid]
+
+    current_user = current_user_cache.get(firebase_uid)
+    if current_user is None:
+        result = await db.execute(
+            select(Users.id, Users.role).where(Users.firebase_uid == firebase_uid)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        current_user = CurrentUser(id=row.id, firebase_uid=firebase_uid, role=row.role)
+        # replicaから読み取ったユーザーは、更新の反映前(キャッシュ削除後)の古いroleの可能性があるため、キャッシュしない
+        if REPLICA_ENGINE not in db.info:
+            current_user_cache.set(firebase_uid, current_user)
+
+    request_users[firebase_uid] = current_user
+    return current_user
+
+
+def invalidate_current_user(db: AsyncSession, firebase_uid: str) -> None:
+    """ユーザー情報の更新時に、キャッシュから該当ユーザーを削除する.
+    commitまでの間に他のリクエストが変更前のユーザーをキャッシュした場合に備え、commit時にも削除する.
+    """
+    current_user_cache.delete(firebase_uid)
+    db.info.get(CURRENT_USERS_INFO_KEY, {}).pop(firebase_uid, None)
+    db.info.setdefault(CURRENT_USER_INVALIDATED_INFO_KEY, set()).add(firebase_uid)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_current_users(session: Session) -> None:
+    for firebase_uid in session.info.pop(CURRENT_USER_INVALIDATED_INFO_KEY, ()):
+        current_user_cache.delete(firebase_uid)
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_invalidated_current_users(session: Session) -> None:
+    session.info.pop(CURRENT_USER_INVALIDATED_INFO_KEY, None)
 
 
-def create_user(db: Session, user: UserCreate):
+async def create_user(db: AsyncSession, user: UserCreate):
     db_user = Users(firebase_uid=user.firebase_uid, email=user.email, role=user.role)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()
+    invalidate_current_user(db, db_user.firebase_uid)
     return db_user
 
 
-def update_user_role(db: Session, user_id: UUID, role: int):
-    db_user = get_user_by_id(db, user_id)
+async def update_user_role(db: AsyncSession, user_id: UUID, role: int):
+    db_user = await get_user_by_id(db, user_id)
 
     if db_user:
         db_user.role = role
-        db.commit()
-        db.refresh(db_user)
+        await db.flush()
+        invalidate_current_user(db, db_user.firebase_uid)
     return db_user
 
 
-def update_user_email(db: Session, firebase_uid: str, new_email: str):
-    db_user = get_user_by_firebase_uid(db, firebase_uid)
+async def update_user_email(db: AsyncSession, firebase_uid: str, new_email: str):
+    db_user = await get_user_by_firebase_uid(db, firebase_uid)
     if db_user:
         db_user.email = new_email
-        db.commit()
-        db.refresh(db_user)
+        await db.flush()
+        invalidate_current_user(db, firebase_uid)
     return db_user
@@ -54,6 +54,9 @@ class ErrorMessage:
     class COLUMN_NOT_ALLOWED(BaseMessage):
         text = "このカラムは指定できません"
 
+    class INVALID_CURSOR(BaseMessage):
+        text = "カーソルが不正です"
+
     # ユーザー
     class ALREADY_REGISTED_EMAIL(BaseMessage):
         text = "登録済のメールアドレスです"
@@ -14,7 +14,10 @@ from app.api.apps import admin_app
 
 from app.app_manager import FastAPIAppManager
 from app.core.config import settings
+from app.core.database import CommitBeforeResponseMiddleware
+from app.core.etag import ETAG_HEADER, ETagMiddleware
 from app.core.logger import get_logger
+from app.core.query_stats import ROUND_TRIPS_HEADER, SERVER_TIMING_HEADER, QueryStatsMiddleware
 
 # FastAPIアプリケーションの主要な設定と起動を担当するファイル
 
@@ -48,12 +51,17 @@ app_manager = FastAPIAppManager(root_app=app)
 #         "*",
 #     ],  # Next.jsのURL
 
+# 内側から順に、レスポンス送信前のcommit -> ETag(304 Not Modified) -> DBアクセス回数の計測
+app.add_middleware(CommitBeforeResponseMiddleware)
+app.add_middleware(ETagMiddleware)
+app.add_middleware(QueryStatsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[ROUND_TRIPS_HEADER, SERVER_TIMING_HEADER, ETAG_HEADER],
 )
 # # アップロードディレクトリの作成
 # os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
@@ -1,6 +1,5 @@
 from datetime import datetime
-from typing import Any
-import uuid
+from typing import Any, List
 from enum import IntEnum, Enum as PyEnum
 
 from sqlalchemy import (
@@ -12,13 +11,17 @@ from sqlalchemy import (
     Integer,
     Enum,
     ForeignKey,
+    Index,
     Text,
     DECIMAL,
+    UniqueConstraint,
+    literal_column,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.core.logger import get_logger
+from app.core.utils import get_uuid7
 
 # データベースのテーブルの基本となる共通の設定（ベースモデル）を定義
 
@@ -27,7 +30,9 @@ logger = get_logger(__name__)
 
 
 class Base(DeclarativeBase):
-    pass
+    # flush時にserver_default/onupdateの値(created_at, updated_atなど)をRETURNINGで取得する
+    # これによりflush後のrefresh(追加のSELECT)が不要になる
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class ModelBaseMixin:
@@ -80,9 +85,10 @@ class UserRole(IntEnum):
 class Users(Base, ModelBaseMixin):
     __tablename__ = "users"
 
-    # PythonのUUIDオブジェクトとして取り扱う　新規レコード作成時に自動的にUUIDを生成　as_uuid=Trueとunique=Trueは削除しても可
+    # PythonのUUIDオブジェクトとして取り扱う　新規レコード作成時に自動的にUUIDを生成
+    # as_uuid=Trueとunique=Trueは削除しても可
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True
+        UUID(as_uuid=True), primary_key=True, default=get_uuid7, unique=True
     )
     firebase_uid: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
     email: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
@@ -134,7 +140,7 @@ class Profiles(Base, ModelBaseMixinWithoutDeletedAt):
     __tablename__ = "profiles"
 
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True
+        UUID(as_uuid=True), primary_key=True, default=get_uuid7, unique=True
     )
 
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -164,7 +170,7 @@ class Notes(Base, ModelBaseMixin):
     __tablename__ = "notes"
 
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True
+        UUID(as_uuid=True), primary_key=True, default=get_uuid7, unique=True
     )
 
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -182,7 +188,7 @@ class Notes(Base, ModelBaseMixin):
 
     comments: Mapped["Comments"] = relationship("Comments", back_populates="note")
 
-    training_notes: Mapped["TrainingNotes"] = relationship(
+    training_notes: Mapped[List["TrainingNotes"]] = relationship(
         "TrainingNotes",
         back_populates="notes",
         cascade="all, delete-orphan",  # ノートが削除されたとき、関連するtraining_notesも削除
@@ -193,7 +199,7 @@ class Trainings(Base, ModelBaseMixinWithoutUpdatedAt):
     __tablename__ = "trainings"
 
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True
+        UUID(as_uuid=True), primary_key=True, default=get_uuid7, unique=True
     )
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
 
@@ -211,7 +217,7 @@ class Comments(Base, ModelBaseMixin):
     __tablename__ = "comments"
 
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True
+        UUID(as_uuid=True), primary_key=True, default=get_uuid7, unique=True
     )
 
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -227,9 +233,17 @@ class Comments(Base, ModelBaseMixin):
 # 多対多関係ではsecondaryパラメータで中間テーブルを指定
 class TrainingNotes(Base, ModelBaseMixin):
     __tablename__ = "training_notes"
+    # 1つのノートに同じトレーニングは1件のみ(update_noteのupsertで使用する)
+    # note_idが先頭のため、note_idでの検索にもこの制約のindexを使用する
+    # (alembic/versions/20261018-1400_add_training_notes_unique_constraint.py で作成)
+    __table_args__ = (
+        UniqueConstraint(
+            "note_id", "training_id", name="uq_training_notes_note_id_training_id"
+        ),
+    )
 
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True
+        UUID(as_uuid=True), primary_key=True, default=get_uuid7, unique=True
     )
 
     training_id: Mapped[UUID] = mapped_column(
@@ -245,9 +259,64 @@ class TrainingNotes(Base, ModelBaseMixin):
     )
 
 
+# 検索・並び替えで使用するindex(alembic/versions/20261018-1330_add_secondary_indexes.py で作成)
+# 論理削除済の行は通常の検索対象外のため、deleted_at IS NULL の部分indexとする
+Index(
+    "ix_notes_user_id_created_at",
+    Notes.user_id,
+    Notes.created_at.desc(),
+    postgresql_where=Notes.deleted_at.is_(None),
+)
+
+# ノートの全文検索(GET /note/search)の対象の文字列(theme, assignment, practice)
+# indexの式とSQLの式が一致しないとindexが使用されないため、区切り文字はbind parameterではなくliteralとする
+NOTE_SEARCH_DOCUMENT = (
+    Notes.theme
+    + literal_column("' '")
+    + Notes.assignment
+    + literal_column("' '")
+    + func.coalesce(Notes.practice, literal_column("''"))
+)
+# 日本語は単語の区切りが無いため、形態素解析ではなく3文字単位(pg_trgm)のindexで部分一致検索を行う
+# (alembic/versions/20261018-1430_add_notes_search_index.py で作成)
+Index(
+    "ix_notes_search_trgm",
+    NOTE_SEARCH_DOCUMENT.label("document"),
+    postgresql_using="gin",
+    postgresql_ops={"document": "gin_trgm_ops"},
+    postgresql_where=Notes.deleted_at.is_(None),
+)
+Index(
+    "ix_trainings_user_id_created_at",
+    Trainings.user_id,
+    Trainings.created_at.desc(),
+    postgresql_where=Trainings.deleted_at.is_(None),
+)
+Index("ix_profiles_user_id", Profiles.user_id)
+Index("ix_profiles_created_at", Profiles.created_at.desc())
+Index(
+    "ix_comments_note_id",
+    Comments.note_id,
+    postgresql_where=Comments.deleted_at.is_(None),
+)
+
+
+# 論理削除用のfilter
+# 毎回optionを生成せずに同じインスタンスを使用することで、optionの生成と、cache keyの計算を最小限にする
+# lambdaはclosureを持たないため、SQLのコンパイル結果はキャッシュされる
+# (hit/missは GET /admin/db/compiled-cache で確認可能)
+_FILTERING_DELETED_AT_OPTION = orm.with_loader_criteria(
+    ModelBaseMixin,
+    lambda cls: cls.deleted_at.is_(None),
+    include_aliases=True,
+)
+
+
 @event.listens_for(Session, "do_orm_execute")
 def _add_filtering_deleted_at(execute_state: Any) -> None:
     """論理削除用のfilterを自動的に適用する
+    ModelBaseMixinを継承したmodelでは、CRUD側で deleted_at IS NULL を指定する必要はない
+    (重複した条件となるため指定しない)
     以下のようにすると、論理削除済のデータも含めて取得可能
     select(...).filter(...).execution_options(include_deleted=True).
     """
@@ -257,10 +326,4 @@ def _add_filtering_deleted_at(execute_state: Any) -> None:
         and not execute_state.is_relationship_load
         and not execute_state.execution_options.get("include_deleted", False)
     ):
-        execute_state.statement = execute_state.statement.options(
-            orm.with_loader_criteria(  # ignore[mypy]
-                ModelBaseMixin,
-                lambda cls: cls.deleted_at.is_(None),
-                include_aliases=True,
-            ),
-        )
+        execute_state.statement = execute_state.statement.options(_FILTERING_DELETED_AT_OPTION)
@@ -2,7 +2,7 @@ import importlib
 import os
 from pathlib import Path
 
-from .core import BaseSchema, PagingMeta, PagingQueryIn, SortQueryIn
+from .core import BaseSchema, CountStrategyEnum, CursorPagingQueryIn, PagingMeta, PagingQueryIn, SortQueryIn
 
 # 自動的にモジュールをインポートする仕組みを実装
 
@@ -21,6 +21,13 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+# リクエスト中に使用するログインユーザーの情報(キャッシュされるため最小限の項目のみ)
+class CurrentUser(BaseModel):
+    id: UUID
+    firebase_uid: str
+    role: int
+
+
 class UserRoleResponse(BaseModel):
     role: int
 
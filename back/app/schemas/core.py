@@ -21,11 +21,35 @@ class BaseSchema(BaseModel):
     model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True, strict=True)
 
 
+class CountStrategyEnum(Enum):
+    """ページングの総件数の取得方法
+
+    exact: COUNT(*)で正確な件数を数える
+    cached: exactの結果をTTL付きでキャッシュする(対象tableへの書き込みで無効になる)
+    estimated: pg_class.reltuplesの推定値(絞り込み条件がある場合はcappedで数える)
+    capped: PAGING_COUNT_CAPを上限として数える
+    none: 数えない(total_data_count, total_page_countはNone)
+    """
+
+    exact = "exact"
+    cached = "cached"
+    estimated = "estimated"
+    capped = "capped"
+    none = "none"
+
+
 class PagingMeta(BaseSchema):
-    current_page: int
-    total_page_count: int
-    total_data_count: int
+    # cursorでのページングの場合、current_pageはNoneとなる
+    current_page: int | None = None
+    total_page_count: int | None
+    total_data_count: int | None
     per_page: int
+    # total_data_countを算出した方法
+    # cachedでキャッシュが無かった場合や、cappedで上限に達しなかった場合は正確な件数のためexactとなる
+    count_strategy: CountStrategyEnum = CountStrategyEnum.exact
+    # cursorでのページングの場合のみ。次(前)のページが無い場合はNone
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
 
 class PagingQueryIn(BaseSchema):
@@ -48,6 +72,21 @@ class PagingQueryIn(BaseSchema):
         return query.offset(offset).limit(self.per_page)
 
 
+class CursorPagingQueryIn(BaseSchema):
+    """cursor(keyset)でのページング
+
+    cursorには前回のレスポンスのmeta.next_cursor(またはprev_cursor)をそのまま指定する。未指定の場合は先頭のページ.
+    OFFSETを使用しないため、後ろのページでも先頭のページと同じコストで取得できる.
+    """
+
+    cursor: str | None = Query(None)
+    per_page: int = Query(20)
+
+    @field_validator("per_page", mode="before")
+    def validate_per_page(cls, v: int) -> int:
+        return 20 if not v >= 1 else v
+
+
 class SortDirectionEnum(Enum):
     asc: str = "asc"
     desc: str = "desc"
@@ -1,8 +1,8 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
-from app.utils.video import get_video_url
+from app.core.config import settings
 
 
 # トレーニング入力用モデル
@@ -44,7 +44,7 @@ class NoteResponse(BaseModel):
         from_attributes = True
 
 
-# 選手のホーム画面のノート一覧の情報のオブジェクト
+# 選手のホーム画面のノート一覧の情報のオブジェクト(assignmentは先頭のみ)
 class NoteListItem(BaseModel):
     id: UUID
     created_at: datetime
@@ -52,9 +52,26 @@ class NoteListItem(BaseModel):
     assignment: str
 
 
-# 選手のホーム画面のノート一覧の情報をリスト形式で全て取得
+# 選手のホーム画面のノート一覧の情報をリスト形式で取得
 class NoteListResponse(BaseModel):
     items: List[NoteListItem]
+    # per_pageを指定した場合の次のページのcursor。次のページが無い場合はNone
+    next_cursor: Optional[str] = None
+
+
+# ノート検索結果の1件分(assignmentは先頭のみ)
+class NoteSearchItem(NoteListItem):
+    user_id: UUID
+    # キーワードを含むcolumnの重みの合計(theme: 3, assignment: 2, practice: 1)
+    score: int
+
+
+# ノート検索結果
+class NoteSearchResponse(BaseModel):
+    items: List[NoteSearchItem]
+    page: int
+    per_page: int
+    has_next: bool
 
 
 # trainingの型定義
@@ -88,6 +105,8 @@ class NoteDetailResponse(BaseModel):
     assignment: str
     practice_video: Optional[str] = None
     my_video: Optional[str] = None
+    # my_videoの署名付きURL。Firebase Storageへのアクセスが必要なため、
+    # event loopを止めないようにエンドポイント側でget_video_url_asyncで生成して渡す
     my_video_url: Optional[str] = None
     weight: float
     sleep: float
@@ -100,11 +119,12 @@ class NoteDetailResponse(BaseModel):
     class Config:
         from_attributes = True
 
-    # my_video_urlに値がNoneであった場合でもmy_videoが存在すれば生成することができる
-    # 詳細画面のレスポンスではmy_video_urlを記述していないけど、こちらのコードでmy_videoが存在した場合にレスポンスに挿入して返す
-    @validator("my_video_url", pre=True, always=True)
-    def generate_video_url(cls, v, values):
-        """my_videoパスからURLを生成"""
-        if not v and values.get("my_video"):
-            return get_video_url(values.get("my_video"))
-        return v
+
+# ノート詳細の一括取得のリクエスト
+class NoteDetailsRequest(BaseModel):
+    note_ids: List[UUID] = Field(..., min_length=1, max_length=settings.NOTE_DETAILS_MAX_IDS)
+
+
+# ノート詳細の一括取得のレスポンス(リクエストのnote_idsの順)
+class NoteDetailsResponse(BaseModel):
+    items: List[NoteDetailResponse]
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import uuid
 from fastapi import UploadFile, HTTPException
@@ -102,6 +103,13 @@ def get_video_url(video_path: str) -> str:
         return None
 
 
+async def get_video_url_async(video_path: str | None) -> str | None:
+    """get_video_urlをthreadで実行する(Firebase Storageへのアクセスでevent loopを止めないため)"""
+    if not video_path:
+        return None
+    return await asyncio.to_thread(get_video_url, video_path)
+
+
 async def delete_note_video(video_path: str) -> bool:
     """Firebase Storageから動画を削除する"""
     if not video_path:
@@ -21,7 +21,7 @@ from app.core.config import Settings
 from app.core.database import get_async_db
 from app.main import app
 from app.models.base import Base
-from app.models.users import User
+from app.models.base import Users as User
 
 from unittest.mock import MagicMock, patch
 from google.oauth2 import service_account
@@ -40,11 +40,31 @@ pytest.ACCESS_TOKEN: str | None = None
 logger.info("root-conftest")
 
 
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption("--run-slow", action="store_true", default=False, help="slowマーカーのテストも実行する")
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers", "slow: 大量のデータを登録するなど時間のかかるテスト(--run-slowを指定した場合のみ実行する)"
+    )
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="--run-slowを指定した場合のみ実行する")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
 class TestSettings(Settings):
     """テストのみで使用する設定を記述"""
 
     TEST_USER_UID: str = "test-uid"
     TEST_USER_NAME: str = "test-user"
+    TEST_USER_EMAIL: str = "test-user@example.com"
 
     model_config = SettingsConfigDict(env_file=".env.test")
     def get_database_url(self, is_async: bool = False) -> str:
@@ -66,8 +86,8 @@ logger.debug("end:postgres_proc")
 
 
 TEST_USER_CREATE_SCHEMA = schemas.UserCreate(
-    uid=settings.TEST_USER_UID,
-    name=settings.TEST_USER_NAME,
+    firebase_uid=settings.TEST_USER_UID,
+    email=settings.TEST_USER_EMAIL,
 )
 
 
@@ -100,19 +120,14 @@ async def engine(
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
-        await create_enums(conn)
+        await create_extensions(conn)
         await conn.run_sync(Base.metadata.create_all)
     return engine
 
 
-async def create_enums(conn):
-    await conn.execute(sa.text("""
-        CREATE TYPE instagrampostreservationstatusenum AS ENUM (
-            'SUCCESS',
-            'FAILED',
-            'NOT_EXECUTE'
-        );
-    """))
+async def create_extensions(conn):
+    # notesの検索用index(ix_notes_search_trgm)で使用する
+    await conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
 
 @pytest_asyncio.fixture
@@ -205,7 +220,5 @@ def mock_google_auth():
         return mock_credentials, "test-project"
     with patch('google.auth.default', mock_default_creds):
         with patch('google.cloud.storage.Client') as mock_storage:
-            with patch('google.cloud.discoveryengine_v1alpha.ConversationalSearchServiceClient') as mock_search:
-                mock_storage.return_value = MagicMock()
-                mock_search.return_value = MagicMock()
-                yield
+            mock_storage.return_value = MagicMock()
+            yield
@@ -0,0 +1,411 @@
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+from uuid import UUID
+
+import pytest
+import pytest_asyncio
+import sqlalchemy as sa
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core import count_cache
+from app.core.config import settings
+from app.crud.base import CURSOR_NEXT, CRUDBase, encode_cursor
+from app.exceptions.core import APIException
+from app.models.base import Profiles, Trainings, Users
+from app.schemas import CountStrategyEnum, CursorPagingQueryIn, PagingMeta, SortQueryIn
+from app.schemas.core import SortDirectionEnum
+from app.schemas.training import TrainingList, TrainingResponse
+
+
+STREAM_ROW_COUNT = 1_000_000
+# この件数を読み終えた時点のメモリ使用量を基準にする
+STREAM_BASELINE_ROW_COUNT = 100_000
+
+training_crud = CRUDBase(Trainings, TrainingResponse, TrainingList)
+users_crud = CRUDBase(Users, None, None)
+
+
+class TrainingPage(BaseModel):
+    """get_paged_listのレスポンス"""
+
+    data: list[TrainingResponse]
+    meta: PagingMeta
+
+
+training_page_crud = CRUDBase(Trainings, TrainingResponse, TrainingPage)
+
+
+@pytest_asyncio.fixture
+async def seeded_trainings(db: AsyncSession) -> AsyncSession:
+    """fixture: 1ユーザーにSTREAM_ROW_COUNT件のトレーニングを登録したdb-session"""
+    user = Users(firebase_uid="stream-user", email="stream-user@example.com")
+    db.add(user)
+    await db.flush()
+    await db.execute(
+        sa.text(
+            "INSERT INTO trainings (id, user_id, menu) "
+            "SELECT gen_random_uuid(), :user_id, 'menu-' || i FROM generate_series(1, :row_count) AS i"
+        ),
+        {"user_id": user.id, "row_count": STREAM_ROW_COUNT},
+    )
+    await db.commit()
+    return db
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_stream_db_obj_list_memory_is_flat(seeded_trainings: AsyncSession) -> None:
+    row_count = 0
+    baseline_peak = 0
+    tracemalloc.start()
+    try:
+        async for training in training_crud.stream_db_obj_list(seeded_trainings, yield_per=1000):
+            row_count += 1
+            if row_count == STREAM_BASELINE_ROW_COUNT:
+                baseline_peak = tracemalloc.get_traced_memory()[1]
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert row_count == STREAM_ROW_COUNT
+    # 全件をメモリに載せないため、10倍の件数を読んでもメモリ使用量のピークはほぼ増えない
+    assert peak < baseline_peak * 1.2, f"baseline_peak={baseline_peak}, peak={peak}"
+
+
+class TrainingRow(BaseModel):
+    """bulk_createに渡すトレーニングの作成スキーマ"""
+
+    user_id: UUID
+    menu: str
+
+
+@contextmanager
+def capture_statements(engine: AsyncEngine) -> Iterator[list[str]]:
+    """ブロック内で実行したSQLを集める"""
+    statements: list[str] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+
+async def _create_user(db: AsyncSession, firebase_uid: str = "crud-user") -> UUID:
+    user = Users(firebase_uid=firebase_uid, email=f"{firebase_uid}@example.com")
+    db.add(user)
+    await db.flush()
+    user_id = user.id
+    await db.commit()
+    return user_id
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_keeps_order_across_chunks(engine: AsyncEngine, db: AsyncSession) -> None:
+    user_id = await _create_user(db)
+    rows = [TrainingRow(user_id=user_id, menu=f"menu-{i}") for i in range(5)]
+
+    with capture_statements(engine) as statements:
+        trainings = await training_crud.bulk_create(db, rows, chunk_size=2)
+
+    # chunk_size件ごとに1つのINSERT文(2件, 2件, 1件)となり、結果は引数の順に返す
+    assert len(statements) == 3
+    assert all(statement.startswith("INSERT INTO trainings") for statement in statements)
+    assert [training.menu for training in trainings] == [row.menu for row in rows]
+    assert len({training.id for training in trainings}) == len(rows)
+    assert all(training.created_at is not None for training in trainings)
+    stored = await db.execute(sa.select(Trainings.menu).where(Trainings.user_id == user_id))
+    assert sorted(stored.scalars().all()) == sorted(row.menu for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_empty(engine: AsyncEngine, db: AsyncSession) -> None:
+    with capture_statements(engine) as statements:
+        assert await training_crud.bulk_create(db, []) == []
+
+    assert statements == []
+
+
+async def _create_trainings(db: AsyncSession, user_id: UUID, menus: list[str], deleted_menus: set[str]) -> list[UUID]:
+    """トレーニングを登録し、idを引数の順に返す(deleted_menusのものは論理削除済とする)"""
+    trainings = [
+        Trainings(user_id=user_id, menu=menu, deleted_at=sa.func.now() if menu in deleted_menus else None)
+        for menu in menus
+    ]
+    db.add_all(trainings)
+    await db.flush()
+    training_ids = [training.id for training in trainings]
+    await db.commit()
+    return training_ids
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_skips_soft_deleted_rows(db: AsyncSession) -> None:
+    user_id = await _create_user(db)
+    active_id, other_id, deleted_id = await _create_trainings(db, user_id, ["a", "b", "c"], {"c"})
+
+    updated_ids = await training_crud.bulk_update(
+        db, [Trainings.user_id == user_id], {"menu": "updated", "not_a_column": 1}
+    )
+
+    # 論理削除済の行は更新しない(modelに存在しないcolumnは無視する)
+    assert sorted(updated_ids) == sorted([active_id, other_id])
+    stmt = sa.select(Trainings.id, Trainings.menu).execution_options(include_deleted=True)
+    menus = dict((await db.execute(stmt)).all())
+    assert menus == {active_id: "updated", other_id: "updated", deleted_id: "c"}
+
+    updated_ids = await training_crud.bulk_update(
+        db, [Trainings.id == deleted_id], {"menu": "restored"}, include_deleted=True
+    )
+    assert updated_ids == [deleted_id]
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_sets_updated_at(db: AsyncSession) -> None:
+    user_id = await _create_user(db)
+    before = await db.scalar(sa.select(Users.updated_at).where(Users.id == user_id))
+
+    assert await users_crud.bulk_update(db, [Users.id == user_id], {"role": 1}) == [user_id]
+
+    # onupdateが設定されたupdated_atも更新する
+    role, updated_at = (await db.execute(sa.select(Users.role, Users.updated_at).where(Users.id == user_id))).one()
+    assert role == 1
+    assert updated_at > before
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_without_known_columns(engine: AsyncEngine, db: AsyncSession) -> None:
+    with capture_statements(engine) as statements:
+        assert await training_crud.bulk_update(db, [], {"not_a_column": 1}) == []
+
+    assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_upsert_updates_on_conflict(engine: AsyncEngine, db: AsyncSession) -> None:
+    user_id = await _create_user(db, "upsert-user")
+    before = await db.scalar(sa.select(Users.updated_at).where(Users.id == user_id))
+    rows = [
+        {"firebase_uid": "upsert-user", "email": "changed@example.com"},
+        {"firebase_uid": "upsert-new", "email": "upsert-new@example.com"},
+    ]
+
+    with capture_statements(engine) as statements:
+        upserted_ids = await users_crud.upsert(db, rows, conflict_cols=["firebase_uid"], chunk_size=1)
+
+    # chunk_size件ごとに1つのINSERT ... ON CONFLICT文となる
+    assert len(statements) == 2
+    assert len(upserted_ids) == 2
+    assert user_id in upserted_ids
+    users = {
+        user.firebase_uid: user
+        for user in (await db.execute(sa.select(Users).where(Users.firebase_uid.like("upsert-%")))).scalars()
+    }
+    # 既存の行はconflict_cols以外のcolumnとupdated_atを更新し、idは変わらない
+    assert users["upsert-user"].id == user_id
+    assert users["upsert-user"].email == "changed@example.com"
+    assert users["upsert-user"].updated_at > before
+    assert users["upsert-new"].id in upserted_ids
+
+
+@pytest.mark.asyncio
+async def test_upsert_with_empty_update_cols_does_nothing_on_conflict(db: AsyncSession) -> None:
+    user_id = await _create_user(db, "upsert-user")
+    rows = [
+        {"firebase_uid": "upsert-user", "email": "changed@example.com"},
+        {"firebase_uid": "upsert-new", "email": "upsert-new@example.com"},
+    ]
+
+    upserted_ids = await users_crud.upsert(db, rows, conflict_cols=["firebase_uid"], update_cols=[])
+
+    # DO NOTHINGのため、既存の行は更新せず、登録した行のidのみを返す
+    assert user_id not in upserted_ids
+    assert len(upserted_ids) == 1
+    assert await db.scalar(sa.select(Users.email).where(Users.id == user_id)) == "upsert-user@example.com"
+
+
+@pytest.mark.asyncio
+async def test_bulk_soft_delete(db: AsyncSession) -> None:
+    active_id, other_id, deleted_id = [await _create_user(db, f"soft-delete-{i}") for i in range(3)]
+    await users_crud.bulk_soft_delete(db, [Users.id == deleted_id])
+
+    deleted_ids = await users_crud.bulk_soft_delete(db, [Users.id.in_([active_id, deleted_id])])
+
+    # 論理削除済の行は再度削除しない
+    assert deleted_ids == [active_id]
+    # 論理削除した行は通常の検索の対象外となる
+    remaining = await users_crud.get_db_obj_list(db, where_clause=[Users.firebase_uid.like("soft-delete-%")])
+    assert [user.id for user in remaining] == [other_id]
+
+
+@pytest.mark.asyncio
+async def test_bulk_soft_delete_requires_deleted_at(db: AsyncSession) -> None:
+    profiles_crud = CRUDBase(Profiles, None, None)
+
+    with pytest.raises(APIException):
+        await profiles_crud.bulk_soft_delete(db, [Profiles.user_id.is_(None)])
+
+
+async def _create_trainings_with_tied_created_at(db: AsyncSession) -> tuple[UUID, list[Trainings]]:
+    """created_atが同じトレーニングを含むデータを登録し、(user_id, (created_at, id)の昇順のトレーニング)を返す
+    同じtransactionで登録した行のcreated_at(current_timestamp)は同じ値となる.
+    """
+    user_id = await _create_user(db)
+    for batch in (range(0, 4), range(4, 7)):
+        db.add_all(Trainings(user_id=user_id, menu=f"menu-{i}") for i in batch)
+        await db.commit()
+    result = await db.execute(
+        sa.select(Trainings).where(Trainings.user_id == user_id).order_by(Trainings.created_at, Trainings.id)
+    )
+    return user_id, list(result.scalars().all())
+
+
+async def _get_page(
+    db: AsyncSession, user_id: UUID, cursor: str | None, direction: SortDirectionEnum = SortDirectionEnum.asc
+) -> TrainingPage:
+    return await training_page_crud.get_paged_list(
+        db,
+        CursorPagingQueryIn(cursor=cursor, per_page=3),
+        where_clause=[Trainings.user_id == user_id],
+        sort_query_in=SortQueryIn(sort_field="created_at", direction=direction),
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("direction", [SortDirectionEnum.asc, SortDirectionEnum.desc])
+async def test_cursor_paging_round_trip(db: AsyncSession, direction: SortDirectionEnum) -> None:
+    user_id, trainings = await _create_trainings_with_tied_created_at(db)
+    expected_ids = [training.id for training in trainings]
+    if direction == SortDirectionEnum.desc:
+        expected_ids.reverse()
+
+    # next_cursorで最後のページまで進む(created_atが同じ行もidで区切り、重複・欠落なく返す)
+    pages = [await _get_page(db, user_id, None, direction)]
+    assert pages[0].meta.prev_cursor is None
+    while pages[-1].meta.next_cursor is not None:
+        pages.append(await _get_page(db, user_id, pages[-1].meta.next_cursor, direction))
+    page_ids = [[training.id for training in page.data] for page in pages]
+    assert page_ids == [expected_ids[0:3], expected_ids[3:6], expected_ids[6:7]]
+    assert all(page.meta.total_data_count == len(trainings) for page in pages)
+
+    # prev_cursorで先頭のページまで戻る(同じページを同じ順序で返す)
+    back_pages = [pages[-1]]
+    while back_pages[-1].meta.prev_cursor is not None:
+        back_pages.append(await _get_page(db, user_id, back_pages[-1].meta.prev_cursor, direction))
+    assert [[training.id for training in page.data] for page in reversed(back_pages)] == page_ids
+    # 戻った先頭のページからも、次のページへ進める
+    assert back_pages[-1].meta.next_cursor is not None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        encode_cursor("created_at", "2026-01-01T00:00:00", "00000000-0000-0000-0000-000000000000", "sideways"),
+        # sort_fieldと異なるcolumnのcursor
+        encode_cursor("menu", "menu-1", "00000000-0000-0000-0000-000000000000", CURSOR_NEXT),
+        # 型の合わない値
+        encode_cursor("created_at", "not-a-datetime", "00000000-0000-0000-0000-000000000000", CURSOR_NEXT),
+        encode_cursor("created_at", "2026-01-01T00:00:00", "not-a-uuid", CURSOR_NEXT),
+        # JSONだがcursorの形式ではない
+        "W10",
+    ],
+)
+async def test_cursor_paging_rejects_invalid_cursor(db: AsyncSession, cursor: str) -> None:
+    user_id = await _create_user(db)
+
+    # 改ざん・破損したcursorは500ではなく400とする
+    with pytest.raises(APIException) as exc_info:
+        await _get_page(db, user_id, cursor)
+    assert exc_info.value.status_code == 400
+
+
+async def _create_counted_trainings(db: AsyncSession, count: int) -> list[Any]:
+    """count件のトレーニングを登録し、そのユーザーで絞り込むwhere_clauseを返す"""
+    user_id = await _create_user(db)
+    await _create_trainings(db, user_id, [f"menu-{i}" for i in range(count)], set())
+    return [Trainings.user_id == user_id]
+
+
+@pytest.mark.asyncio
+async def test_total_count_none_and_exact(engine: AsyncEngine, db: AsyncSession) -> None:
+    where_clause = await _create_counted_trainings(db, 3)
+
+    # noneの場合は数えない(SQLを実行しない)
+    with capture_statements(engine) as statements:
+        total = await training_crud._get_total_count(db, where_clause, False, CountStrategyEnum.none)
+    assert total == (None, CountStrategyEnum.none)
+    assert statements == []
+
+    total = await training_crud._get_total_count(db, where_clause, False, CountStrategyEnum.exact)
+    assert total == (3, CountStrategyEnum.exact)
+
+
+@pytest.mark.asyncio
+async def test_total_count_capped(db: AsyncSession, monkeypatch: pytest.MonkeyPatch) -> None:
+    where_clause = await _create_counted_trainings(db, 3)
+
+    # 上限を超えた場合は上限の件数を返す
+    monkeypatch.setattr(settings, "PAGING_COUNT_CAP", 2)
+    total = await training_crud._get_total_count(db, where_clause, False, CountStrategyEnum.capped)
+    assert total == (2, CountStrategyEnum.capped)
+
+    # 上限に達しない場合は正確な件数のためexactとなる
+    monkeypatch.setattr(settings, "PAGING_COUNT_CAP", 10)
+    total = await training_crud._get_total_count(db, where_clause, False, CountStrategyEnum.capped)
+    assert total == (3, CountStrategyEnum.exact)
+
+
+@pytest.fixture
+def empty_count_cache() -> Iterator[None]:
+    """fixture: 総件数のキャッシュを空にする(テスト終了時にも空にする)"""
+    count_cache.count_cache.clear()
+    yield
+    count_cache.count_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_total_count_cached(engine: AsyncEngine, db: AsyncSession, empty_count_cache: None) -> None:
+    where_clause = await _create_counted_trainings(db, 3)
+
+    total = await training_crud._get_total_count(db, where_clause, False, CountStrategyEnum.cached)
+    assert total == (3, CountStrategyEnum.exact)
+
+    # 2回目はキャッシュから返す(SQLを実行しない)
+    with capture_statements(engine) as statements:
+        total = await training_crud._get_total_count(db, where_clause, False, CountStrategyEnum.cached)
+    assert total == (3, CountStrategyEnum.cached)
+    assert statements == []
+
+    # tableへの書き込みでキャッシュは無効になる
+    user_id = (await db.execute(sa.select(Trainings.user_id).limit(1))).scalar_one()
+    db.add(Trainings(user_id=user_id, menu="menu-added"))
+    await db.flush()
+    total = await training_crud._get_total_count(db, where_clause, False, CountStrategyEnum.cached)
+    assert total == (4, CountStrategyEnum.exact)
+
+
+@pytest.mark.asyncio
+async def test_total_count_estimated(db: AsyncSession, monkeypatch: pytest.MonkeyPatch) -> None:
+    where_clause = await _create_counted_trainings(db, 3)
+    monkeypatch.setattr(settings, "PAGING_COUNT_CAP", 2)
+
+    # 絞り込み条件がある場合は推定できないため、cappedで数える
+    total = await training_crud._get_total_count(db, where_clause, False, CountStrategyEnum.estimated)
+    assert total == (2, CountStrategyEnum.capped)
+
+    # ANALYZE前(推定値が無い)もcappedで数える
+    total = await training_crud._get_total_count(db, [], False, CountStrategyEnum.estimated)
+    assert total == (2, CountStrategyEnum.capped)
+
+    await db.execute(sa.text("ANALYZE trainings"))
+    total = await training_crud._get_total_count(db, [], False, CountStrategyEnum.estimated)
+    assert total == (3, CountStrategyEnum.estimated)
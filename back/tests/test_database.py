@@ -0,0 +1,116 @@
+from collections.abc import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.core import database
+from app.core.database import FORCE_PRIMARY, RoutingSession
+from app.crud.base import CRUDBase
+from app.models.base import Users
+from app.schemas import CountStrategyEnum
+from tests.conftest import settings
+
+
+REPLICA_COUNT = 2
+
+
+@pytest_asyncio.fixture
+async def replica_engines(
+    engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch
+) -> AsyncGenerator[list[AsyncEngine], None]:
+    """fixture: replica用のengineを作成する(テスト用DBにprimaryとは別のconnection poolで接続する)"""
+    uri = settings.get_database_url(is_async=True)
+    engines = [create_async_engine(uri, echo=False, poolclass=NullPool) for _ in range(REPLICA_COUNT)]
+    monkeypatch.setattr(database, "replica_engines", engines)
+    yield engines
+    for replica_engine in engines:
+        await replica_engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def routing_db(
+    engine: AsyncEngine, replica_engines: list[AsyncEngine]
+) -> AsyncGenerator[AsyncSession, None]:
+    """fixture: RoutingSessionを使用するdb-sessionの作成"""
+    routing_session_factory = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=engine,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+    )
+    async with routing_session_factory() as session:
+        yield session
+        await session.rollback()
+
+
+def _count_transactions(engines: list[AsyncEngine]) -> list[int]:
+    """engineごとに開始したtransactionの数を数える"""
+    counts = [0] * len(engines)
+    for i, target_engine in enumerate(engines):
+        event.listen(target_engine.sync_engine, "begin", lambda conn, i=i: counts.__setitem__(i, counts[i] + 1))
+    return counts
+
+
+@pytest.mark.asyncio
+async def test_reads_use_one_replica_per_session(
+    engine: AsyncEngine, replica_engines: list[AsyncEngine], routing_db: AsyncSession
+) -> None:
+    primary_counts = _count_transactions([engine])
+    replica_counts = _count_transactions(replica_engines)
+
+    for _ in range(20):
+        await routing_db.execute(select(Users))
+
+    # session内の読み取りは全て同じreplicaで実行し、primaryは使用しない
+    assert sorted(replica_counts) == [0] * (REPLICA_COUNT - 1) + [1]
+    assert primary_counts == [0]
+
+
+@pytest.mark.asyncio
+async def test_reads_after_write_use_primary(
+    engine: AsyncEngine, replica_engines: list[AsyncEngine], routing_db: AsyncSession
+) -> None:
+    stmt = select(Users)
+    assert routing_db.get_bind(clause=stmt) in [e.sync_engine for e in replica_engines]
+
+    await routing_db.execute(update(Users).where(Users.firebase_uid == "not-exists").values(role=0))
+
+    # 書き込み後の読み取りはreplicaの遅延の影響を受けないようにprimaryで実行する
+    assert routing_db.get_bind(clause=stmt) is engine.sync_engine
+
+
+@pytest.mark.asyncio
+async def test_select_for_update_uses_primary(
+    engine: AsyncEngine, replica_engines: list[AsyncEngine], routing_db: AsyncSession
+) -> None:
+    assert routing_db.get_bind(clause=select(Users).with_for_update()) is engine.sync_engine
+
+
+@pytest.mark.asyncio
+async def test_force_primary(
+    engine: AsyncEngine, replica_engines: list[AsyncEngine], routing_db: AsyncSession
+) -> None:
+    routing_db.info[FORCE_PRIMARY] = True
+    replica_counts = _count_transactions(replica_engines)
+
+    await routing_db.execute(select(Users))
+
+    assert routing_db.get_bind(clause=select(Users)) is engine.sync_engine
+    assert replica_counts == [0] * REPLICA_COUNT
+
+
+@pytest.mark.asyncio
+async def test_estimated_count_keeps_reads_on_replica(
+    engine: AsyncEngine, replica_engines: list[AsyncEngine], routing_db: AsyncSession
+) -> None:
+    users_crud = CRUDBase(Users, None, None)
+
+    await users_crud._get_total_count(routing_db, [], False, CountStrategyEnum.estimated)
+
+    # 推定件数の取得(pg_class)は読み取りのため、以降の読み取りもreplicaで実行する
+    assert routing_db.get_bind(clause=select(Users)) in [e.sync_engine for e in replica_engines]
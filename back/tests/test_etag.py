@@ -0,0 +1,162 @@
+from collections.abc import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from fastapi import status
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.core.etag import ETAG_HEADER, ETagMiddleware, compute_etag, is_etag_matched
+
+BODY = {"message": "hello"}
+
+
+async def _json(request: Request) -> Response:
+    return JSONResponse(BODY)
+
+
+async def _not_found(request: Request) -> Response:
+    return JSONResponse(BODY, status_code=status.HTTP_404_NOT_FOUND)
+
+
+async def _with_etag(request: Request) -> Response:
+    return JSONResponse(BODY, headers={ETAG_HEADER: '"endpoint"'})
+
+
+async def _stream(request: Request) -> Response:
+    chunk_size = int(request.query_params["chunk_size"])
+
+    async def chunks() -> AsyncGenerator[bytes, None]:
+        for _ in range(3):
+            yield b"x" * chunk_size
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+async def _echo(request: Request) -> Response:
+    return PlainTextResponse(request.method)
+
+
+etag_app = Starlette(
+    routes=[
+        Route("/json", _json),
+        Route("/not-found", _not_found),
+        Route("/with-etag", _with_etag),
+        Route("/stream", _stream),
+        Route("/echo", _echo, methods=["GET", "POST"]),
+    ]
+)
+etag_app.add_middleware(ETagMiddleware)
+
+
+@pytest_asyncio.fixture
+async def etag_client() -> AsyncGenerator[AsyncClient, None]:
+    async with AsyncClient(app=etag_app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        (None, False),
+        ("", False),
+        ("*", True),
+        ('"etag"', True),
+        ('W/"etag"', True),
+        ('"other", "etag"', True),
+        ('"other"', False),
+    ],
+)
+def test_is_etag_matched(if_none_match: str | None, expected: bool) -> None:
+    assert is_etag_matched(if_none_match, '"etag"') is expected
+
+
+@pytest.mark.asyncio
+async def test_etag_is_added_to_get_response(etag_client: AsyncClient) -> None:
+    res = await etag_client.get("/json")
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers[ETAG_HEADER] == compute_etag(res.content)
+    assert res.json() == BODY
+
+
+@pytest.mark.asyncio
+async def test_matched_if_none_match_returns_not_modified(etag_client: AsyncClient) -> None:
+    etag = (await etag_client.get("/json")).headers[ETAG_HEADER]
+
+    res = await etag_client.get("/json", headers={"If-None-Match": etag})
+
+    # 304はbodyとbodyに関するheaderを含めず、ETagのみを返す
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+    assert res.content == b""
+    assert res.headers[ETAG_HEADER] == etag
+    assert "content-type" not in res.headers
+    assert res.headers.get("content-length", "0") == "0"
+
+
+@pytest.mark.asyncio
+async def test_unmatched_if_none_match_returns_body(etag_client: AsyncClient) -> None:
+    res = await etag_client.get("/json", headers={"If-None-Match": '"stale"'})
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json() == BODY
+
+
+@pytest.mark.asyncio
+async def test_non_get_response_is_passed_through(etag_client: AsyncClient) -> None:
+    res = await etag_client.post("/echo", headers={"If-None-Match": "*"})
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.text == "POST"
+    assert ETAG_HEADER not in res.headers
+
+
+@pytest.mark.asyncio
+async def test_non_200_response_is_passed_through(etag_client: AsyncClient) -> None:
+    res = await etag_client.get("/not-found", headers={"If-None-Match": "*"})
+
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+    assert res.json() == BODY
+    assert ETAG_HEADER not in res.headers
+
+
+@pytest.mark.asyncio
+async def test_endpoint_etag_is_kept(etag_client: AsyncClient) -> None:
+    res = await etag_client.get("/with-etag", headers={"If-None-Match": '"endpoint"'})
+
+    # endpointで付与したETagはそのまま送信し、304の判定もendpointに任せる
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers[ETAG_HEADER] == '"endpoint"'
+    assert res.json() == BODY
+
+
+@pytest.mark.asyncio
+async def test_small_streaming_response_has_etag(etag_client: AsyncClient) -> None:
+    res = await etag_client.get("/stream", params={"chunk_size": 10})
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.content == b"x" * 30
+    assert res.headers[ETAG_HEADER] == compute_etag(res.content)
+
+    res = await etag_client.get(
+        "/stream", params={"chunk_size": 10}, headers={"If-None-Match": res.headers[ETAG_HEADER]}
+    )
+
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+    assert res.content == b""
+
+
+@pytest.mark.asyncio
+async def test_large_streaming_response_is_passed_through(etag_client: AsyncClient) -> None:
+    chunk_size = settings.ETAG_MAX_BODY_SIZE // 2 + 1
+
+    res = await etag_client.get("/stream", params={"chunk_size": chunk_size}, headers={"If-None-Match": "*"})
+
+    # ETAG_MAX_BODY_SIZEを超えたstreamingはETagを付与せず、保留したbodyを含めて全て送信する
+    assert res.status_code == status.HTTP_200_OK
+    assert res.content == b"x" * chunk_size * 3
+    assert ETAG_HEADER not in res.headers
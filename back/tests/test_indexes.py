@@ -0,0 +1,195 @@
+import json
+from typing import Any, Awaitable, Callable
+
+import pytest
+import pytest_asyncio
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.crud import note as note_crud
+from app.crud import profile as profile_crud
+from app.crud import training as training_crud
+from app.models.base import Users
+
+
+SEED_USER_COUNT = 2000
+SEED_NOTES_PER_USER = 20
+SEED_TRAININGS_PER_USER = 5
+# ノート検索の実行時間を確認する件数と、目標とする実行時間
+SEARCH_SEED_NOTE_COUNT = 1_000_000
+SEARCH_MAX_EXECUTION_MS = 50
+
+# 検証用のデータ(index scanが選択される程度の件数)をSQLで一括登録する
+SEED_STATEMENTS = [
+    f"""
+    INSERT INTO users (id, firebase_uid, email, role)
+    SELECT gen_random_uuid(), 'seed-' || i, 'seed-' || i || '@example.com', 0
+    FROM generate_series(1, {SEED_USER_COUNT}) AS i
+    """,
+    """
+    INSERT INTO profiles (id, user_id, name, team_name, birthday, player_dominant, player_position)
+    SELECT gen_random_uuid(), id, 'name', 'team', now(), 'RIGHT_RIGHT', 'PITCHER'
+    FROM users
+    """,
+    f"""
+    INSERT INTO notes (id, user_id, theme, assignment, weight, sleep, looked_day, created_at)
+    SELECT gen_random_uuid(), u.id, 'theme', 'assignment', 60.0, 7.0, 'day', now() - i * interval '1 day'
+    FROM users u CROSS JOIN generate_series(1, {SEED_NOTES_PER_USER}) AS i
+    """,
+    f"""
+    INSERT INTO trainings (id, user_id, menu)
+    SELECT gen_random_uuid(), u.id, 'menu-' || i
+    FROM users u CROSS JOIN generate_series(1, {SEED_TRAININGS_PER_USER}) AS i
+    """,
+    """
+    INSERT INTO training_notes (id, training_id, note_id, count)
+    SELECT gen_random_uuid(), t.id, n.id, 1
+    FROM notes n JOIN trainings t ON t.user_id = n.user_id AND t.menu = 'menu-1'
+    """,
+    "ANALYZE",
+]
+
+
+@pytest_asyncio.fixture
+async def seeded_db(db: AsyncSession) -> AsyncSession:
+    """fixture: 検証用のデータを登録したdb-session"""
+    for statement in SEED_STATEMENTS:
+        await db.execute(sa.text(statement))
+    await db.commit()
+    return db
+
+
+def _collect_index_names(plan: dict[str, Any]) -> set[str]:
+    """実行計画で使用しているindexの名前を集める"""
+    index_names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        index_names |= _collect_index_names(child)
+    return index_names
+
+
+async def _explain(
+    engine: AsyncEngine, db: AsyncSession, run_query: Callable[[], Awaitable[Any]], analyze: bool = False
+) -> list[dict[str, Any]]:
+    """run_queryで実行したSQLを、同じパラメータでEXPLAINした結果(SQLごとの実行計画)を返す"""
+    statements: list[tuple[str, Any]] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, parameters: Any, *args: Any) -> None:
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        await run_query()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert statements, "SQLが実行されていません"
+    conn = await db.connection()
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    explained: list[dict[str, Any]] = []
+    for statement, parameters in statements:
+        result = await conn.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters)
+        plan = result.scalar_one()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        explained.append(plan[0])
+    return explained
+
+
+async def _used_index_names(
+    engine: AsyncEngine, db: AsyncSession, run_query: Callable[[], Awaitable[Any]]
+) -> set[str]:
+    """run_queryで実行したSQLを、同じパラメータでEXPLAINして使用しているindexの名前を返す"""
+    index_names: set[str] = set()
+    for explained in await _explain(engine, db, run_query):
+        index_names |= _collect_index_names(explained["Plan"])
+    return index_names
+
+
+async def _get_seed_user_id(db: AsyncSession) -> Any:
+    return (await db.execute(sa.text("SELECT id FROM users WHERE firebase_uid = 'seed-1'"))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_note_list_uses_user_id_created_at_index(engine: AsyncEngine, seeded_db: AsyncSession) -> None:
+    user_id = await _get_seed_user_id(seeded_db)
+
+    index_names = await _used_index_names(
+        engine, seeded_db, lambda: note_crud.get_note(seeded_db, user_id, per_page=10)
+    )
+
+    assert "ix_notes_user_id_created_at" in index_names
+
+
+@pytest.mark.asyncio
+async def test_note_detail_uses_training_notes_note_id_index(engine: AsyncEngine, seeded_db: AsyncSession) -> None:
+    note_id = (await seeded_db.execute(sa.text("SELECT id FROM notes LIMIT 1"))).scalar_one()
+
+    index_names = await _used_index_names(
+        engine, seeded_db, lambda: note_crud.get_note_detail(seeded_db, note_id)
+    )
+
+    # training_notesのnote_idでの絞り込みは、(note_id, training_id)のunique制約のindexを使用する
+    assert "uq_training_notes_note_id_training_id" in index_names
+
+
+@pytest.mark.asyncio
+async def test_training_list_uses_user_id_created_at_index(engine: AsyncEngine, seeded_db: AsyncSession) -> None:
+    user_id = await _get_seed_user_id(seeded_db)
+
+    index_names = await _used_index_names(
+        engine, seeded_db, lambda: training_crud.get_specific_trainings(seeded_db, user_id)
+    )
+
+    assert "ix_trainings_user_id_created_at" in index_names
+
+
+@pytest.mark.asyncio
+async def test_profile_by_user_id_uses_user_id_index(engine: AsyncEngine, seeded_db: AsyncSession) -> None:
+    user_id = await _get_seed_user_id(seeded_db)
+
+    index_names = await _used_index_names(
+        engine, seeded_db, lambda: profile_crud.get_profile_by_user_id(seeded_db, user_id)
+    )
+
+    assert "ix_profiles_user_id" in index_names
+
+
+@pytest.mark.asyncio
+async def test_note_search_uses_trgm_index(engine: AsyncEngine, seeded_db: AsyncSession) -> None:
+    await seeded_db.execute(
+        sa.text("UPDATE notes SET practice = 'curveball grip' WHERE id IN (SELECT id FROM notes LIMIT 5)")
+    )
+    await seeded_db.execute(sa.text("ANALYZE notes"))
+
+    index_names = await _used_index_names(
+        engine, seeded_db, lambda: note_crud.search_notes(seeded_db, "curveball")
+    )
+
+    # theme, assignment, practiceを連結した文字列のILIKEは、pg_trgmのGIN index(部分index)で絞り込む
+    assert "ix_notes_search_trgm" in index_names
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_note_search_execution_time(engine: AsyncEngine, db: AsyncSession) -> None:
+    user = Users(firebase_uid="search-user", email="search-user@example.com")
+    db.add(user)
+    await db.flush()
+    # 検索対象の文字列が行ごとに異なるよう、md5の値を含める
+    await db.execute(
+        sa.text(
+            "INSERT INTO notes (id, user_id, theme, assignment, practice, weight, sleep, looked_day) "
+            "SELECT gen_random_uuid(), :user_id, 'theme ' || md5(i::text), 'assignment ' || md5((i + 1)::text), "
+            "'practice ' || md5((i + 2)::text), 60.0, 7.0, 'day' "
+            "FROM generate_series(1, :note_count) AS i"
+        ),
+        {"user_id": user.id, "note_count": SEARCH_SEED_NOTE_COUNT},
+    )
+    await db.commit()
+    await db.execute(sa.text("ANALYZE notes"))
+    keyword = (await db.execute(sa.text("SELECT left(md5('12345'), 10)"))).scalar_one()
+
+    explained = await _explain(engine, db, lambda: note_crud.search_notes(db, keyword), analyze=True)
+
+    assert "ix_notes_search_trgm" in _collect_index_names(explained[0]["Plan"])
+    assert explained[0]["Execution Time"] < SEARCH_MAX_EXECUTION_MS, explained[0]["Execution Time"]
@@ -0,0 +1,72 @@
+import asyncio
+from uuid import UUID
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.crud.base import CRUDBase
+from app.crud.loader import get_by_id_loader
+from app.models.base import Trainings, Users
+from app.schemas.training import TrainingList, TrainingResponse
+
+
+training_crud = CRUDBase(Trainings, TrainingResponse, TrainingList)
+
+
+async def _create_training_ids(db: AsyncSession, count: int) -> list[UUID]:
+    user = Users(firebase_uid="loader-user", email="loader-user@example.com")
+    db.add(user)
+    await db.flush()
+    trainings = [Trainings(user_id=user.id, menu=f"menu-{i}") for i in range(count)]
+    db.add_all(trainings)
+    await db.flush()
+    training_ids = [training.id for training in trainings]
+    await db.commit()
+    db.expunge_all()
+    return training_ids
+
+
+def _capture_statements(engine: AsyncEngine) -> list[str]:
+    statements: list[str] = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_load_batches_ids_into_one_select(engine: AsyncEngine, db: AsyncSession) -> None:
+    training_ids = await _create_training_ids(db, 3)
+    loader = get_by_id_loader(db, training_crud)
+    statements = _capture_statements(engine)
+
+    results = await asyncio.gather(*(loader.load(training_id) for training_id in training_ids))
+
+    assert [result.id for result in results] == training_ids
+    assert len(statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_load_normalizes_string_ids(engine: AsyncEngine, db: AsyncSession) -> None:
+    training_id = (await _create_training_ids(db, 1))[0]
+    loader = get_by_id_loader(db, training_crud)
+    statements = _capture_statements(engine)
+
+    # 文字列のidもUUIDのidと同じキーとして扱い、2回目はSELECTしない
+    by_str = await loader.load(str(training_id))
+    by_uuid = await loader.load(training_id)
+
+    assert by_str is by_uuid
+    assert by_str.id == training_id
+    assert len(statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_load_invalid_id(db: AsyncSession) -> None:
+    loader = get_by_id_loader(db, training_crud)
+
+    with pytest.raises(ValueError):
+        loader.load("not-a-uuid")
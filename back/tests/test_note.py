@@ -0,0 +1,307 @@
+import datetime
+import json
+from collections.abc import Generator
+from typing import Any
+from unittest.mock import MagicMock
+from uuid import UUID, uuid4
+from zoneinfo import ZoneInfo
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.core.database import REPLICA_ENGINE
+from app.core.query_stats import ROUND_TRIPS_HEADER, register_query_stats, unregister_query_stats
+from app.crud import note as note_crud
+from app.crud.user import current_user_cache
+from app.models.base import Notes, Trainings, Users
+from app.schemas.note import NoteDetailResponse
+
+
+TRAINING_COUNT = 3
+
+
+@pytest.fixture(autouse=True)
+def clear_caches() -> Generator[None, None, None]:
+    """fixture: テストごとにプロセス内のキャッシュを空にする(テスト間でユーザー・ノートのキャッシュを共有しない)"""
+    current_user_cache.clear()
+    note_crud.note_detail_cache.clear()
+    yield
+    current_user_cache.clear()
+    note_crud.note_detail_cache.clear()
+
+
+@pytest.fixture
+def query_stats_engine(engine: AsyncEngine) -> Generator[AsyncEngine, None, None]:
+    """fixture: DBアクセスの計測用のevent listenerを登録したengine(テスト終了時に削除する)"""
+    register_query_stats(engine, "test")
+    yield engine
+    unregister_query_stats("test")
+
+
+async def _create_user_with_trainings(db: AsyncSession) -> tuple[Users, list[Trainings]]:
+    """ユーザーとトレーニングを登録する(commit後も属性を参照できるよう、sessionから切り離して返す)"""
+    user = Users(firebase_uid="note-user", email="note-user@example.com")
+    db.add(user)
+    await db.flush()
+    trainings = [Trainings(user_id=user.id, menu=f"menu-{i}") for i in range(TRAINING_COUNT)]
+    db.add_all(trainings)
+    await db.flush()
+    db.expunge_all()
+    await db.commit()
+    return user, trainings
+
+
+@pytest.mark.asyncio
+async def test_create_note_round_trips(
+    query_stats_engine: AsyncEngine, client: AsyncClient, db: AsyncSession
+) -> None:
+    engine = query_stats_engine
+    user, trainings = await _create_user_with_trainings(db)
+    form = {
+        "firebase_uid": user.firebase_uid,
+        "theme": "theme",
+        "assignment": "assignment",
+        "weight": "60.5",
+        "sleep": "7.5",
+        "looked_day": "day",
+        "trainings": json.dumps(
+            [{"training_id": str(training.id), "count": i + 1} for i, training in enumerate(trainings)]
+        ),
+    }
+    statements: list[str] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        res = await client.post("/note/create", data=form)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert res.status_code == status.HTTP_201_CREATED
+    body = res.json()
+    assert body["user_id"] == str(user.id)
+    assert sorted((tn["training_id"], tn["count"]) for tn in body["training_notes"]) == sorted(
+        (str(training.id), i + 1) for i, training in enumerate(trainings)
+    )
+    # ユーザーの取得、ノートのINSERT、トレーニングノートの一括INSERTのみで、登録後の再取得は行わない
+    assert len(statements) == 3
+    assert statements[1].startswith("INSERT INTO notes")
+    assert statements[2].startswith("INSERT INTO training_notes")
+    # BEGIN + 上記3クエリ(テスト用のget_dbはレスポンスの送信後にcommitするため、COMMITは含まない)
+    assert res.headers[ROUND_TRIPS_HEADER] == "4"
+
+
+@pytest.mark.asyncio
+async def test_create_note_collapses_duplicate_trainings(client: AsyncClient, db: AsyncSession) -> None:
+    user, trainings = await _create_user_with_trainings(db)
+    training_id = str(trainings[0].id)
+    form = {
+        "firebase_uid": user.firebase_uid,
+        "theme": "theme",
+        "assignment": "assignment",
+        "weight": "60.5",
+        "sleep": "7.5",
+        "looked_day": "day",
+        "trainings": json.dumps([{"training_id": training_id, "count": 1}, {"training_id": training_id, "count": 5}]),
+    }
+
+    res = await client.post("/note/create", data=form)
+
+    # 同じトレーニングは1行にまとめ、後に指定した回数を使用する(unique制約違反で500にしない)
+    assert res.status_code == status.HTTP_201_CREATED
+    assert [(tn["training_id"], tn["count"]) for tn in res.json()["training_notes"]] == [(training_id, 5)]
+
+
+@pytest.mark.asyncio
+async def test_note_detail_cache_skips_replica_reads(db: AsyncSession) -> None:
+    note_id = uuid4()
+    response = MagicMock(spec=NoteDetailResponse)
+
+    # replicaから読み取ったsessionのレスポンスは、更新前のデータの可能性があるためキャッシュしない
+    db.info[REPLICA_ENGINE] = MagicMock()
+    note_crud.set_note_detail_cache(db, note_id, response)
+    assert note_crud.note_detail_cache.get(note_id) is None
+
+    del db.info[REPLICA_ENGINE]
+    note_crud.set_note_detail_cache(db, note_id, response)
+    assert note_crud.note_detail_cache.get(note_id) is response
+
+
+@pytest.mark.asyncio
+async def test_get_note_date_range_uses_note_date_timezone(db: AsyncSession) -> None:
+    user, _ = await _create_user_with_trainings(db)
+    tz = ZoneInfo(settings.NOTE_DATE_TIMEZONE)
+    created_ats = [
+        datetime.datetime(2026, 1, 1, 0, 0, tzinfo=tz),
+        datetime.datetime(2026, 1, 1, 23, 59, tzinfo=tz),
+        # UTCでは同じ日付だが、NOTE_DATE_TIMEZONEでは前日・翌日のノート
+        datetime.datetime(2025, 12, 31, 23, 59, tzinfo=tz),
+        datetime.datetime(2026, 1, 2, 0, 0, tzinfo=tz),
+    ]
+    db.add_all(
+        Notes(
+            user_id=user.id, theme="theme", assignment="assignment", weight=60.0, sleep=7.0, looked_day="day",
+            created_at=created_at,
+        )
+        for created_at in created_ats
+    )
+    await db.commit()
+
+    notes, _ = await note_crud.get_note(
+        db, user.id, from_date=datetime.date(2026, 1, 1), to_date=datetime.date(2026, 1, 1)
+    )
+
+    assert sorted(note["created_at"] for note in notes) == created_ats[:2]
+
+
+async def _create_notes(db: AsyncSession, user_id: UUID, note_texts: list[tuple[str, str]]) -> None:
+    """(theme, assignment)のノートを、指定順に1日ずつ新しい作成日時で登録する"""
+    base_time = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    db.add_all(
+        Notes(
+            user_id=user_id, theme=theme, assignment=assignment, weight=60.0, sleep=7.0, looked_day="day",
+            created_at=base_time + datetime.timedelta(days=i),
+        )
+        for i, (theme, assignment) in enumerate(note_texts)
+    )
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_search_notes_orders_by_score(db: AsyncSession) -> None:
+    user, _ = await _create_user_with_trainings(db)
+    await _create_notes(
+        db,
+        user.id,
+        [
+            ("バッティング", "素振り"),
+            ("守備", "バッティングの確認"),
+            ("走塁", "ベースランニング"),
+            ("バッティング 素振り", "素振り"),
+        ],
+    )
+
+    notes, has_next = await note_crud.search_notes(db, "バッティング")
+
+    # themeに含むノート(作成日時の新しい順)、assignmentのみに含むノートの順に返す
+    assert [note["theme"] for note in notes] == ["バッティング 素振り", "バッティング", "守備"]
+    assert [note["score"] for note in notes] == [3, 3, 2]
+    assert has_next is False
+
+
+@pytest.mark.asyncio
+async def test_search_notes_requires_all_keywords(db: AsyncSession) -> None:
+    user, _ = await _create_user_with_trainings(db)
+    await _create_notes(db, user.id, [("バッティング", "素振り"), ("バッティング", "ティー"), ("守備", "素振り")])
+
+    notes, _ = await note_crud.search_notes(db, "バッティング  素振り")
+
+    assert [(note["theme"], note["assignment"]) for note in notes] == [("バッティング", "素振り")]
+
+
+@pytest.mark.asyncio
+async def test_search_notes_escapes_like_wildcards(db: AsyncSession) -> None:
+    user, _ = await _create_user_with_trainings(db)
+    await _create_notes(
+        db,
+        user.id,
+        [("打率100%", "a"), ("打率1000", "a"), ("a_b", "a"), ("axb", "a"), ("1/2", "a"), ("12", "a")],
+    )
+
+    # %, _ と、escape文字の / はワイルドカードではなく文字として検索する
+    for keyword, expected_themes in [("100%", ["打率100%"]), ("a_b", ["a_b"]), ("1/2", ["1/2"]), ("%", ["打率100%"])]:
+        notes, _ = await note_crud.search_notes(db, keyword)
+        assert [note["theme"] for note in notes] == expected_themes, keyword
+
+
+@pytest.mark.asyncio
+async def test_search_notes_paging_and_user_filter(db: AsyncSession) -> None:
+    user, _ = await _create_user_with_trainings(db)
+    other_user = Users(firebase_uid="other-note-user", email="other-note-user@example.com")
+    db.add(other_user)
+    await db.flush()
+    other_user_id = other_user.id
+    await _create_notes(db, user.id, [(f"投球{i}", "a") for i in range(3)])
+    await _create_notes(db, other_user_id, [("投球", "a")])
+
+    first_page, has_next = await note_crud.search_notes(db, "投球", page=1, per_page=2, user_id=user.id)
+    second_page, has_next_after_second = await note_crud.search_notes(db, "投球", page=2, per_page=2, user_id=user.id)
+
+    assert [note["theme"] for note in first_page] == ["投球2", "投球1"]
+    assert has_next is True
+    assert [note["theme"] for note in second_page] == ["投球0"]
+    assert has_next_after_second is False
+    assert all(note["user_id"] == user.id for note in first_page + second_page)
+
+    # 空白のみのキーワードは検索しない
+    assert await note_crud.search_notes(db, "  ") == ([], False)
+
+
+async def _create_detail_notes(db: AsyncSession) -> tuple[list[UUID], UUID]:
+    """ノート3件(うち1件は論理削除済)を登録し、(有効なノートのID, 論理削除済のノートのID)を返す"""
+    user, _ = await _create_user_with_trainings(db)
+    notes = [
+        Notes(user_id=user.id, theme=f"theme-{i}", assignment="assignment", weight=60.0, sleep=7.0, looked_day="day")
+        for i in range(3)
+    ]
+    notes[2].deleted_at = datetime.datetime.now(datetime.timezone.utc)
+    db.add_all(notes)
+    await db.flush()
+    note_ids = [note.id for note in notes]
+    await db.commit()
+    return note_ids[:2], note_ids[2]
+
+
+@pytest.mark.asyncio
+async def test_get_note_details_keeps_request_order_and_collapses_duplicates(
+    client: AsyncClient, db: AsyncSession
+) -> None:
+    note_ids, _ = await _create_detail_notes(db)
+    request_ids = [note_ids[1], note_ids[0], note_ids[1]]
+
+    res = await client.post("/note/details", json={"note_ids": [str(note_id) for note_id in request_ids]})
+
+    # リクエストの順で、重複したIDは最初の位置に1件のみ返す
+    assert res.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in res.json()["items"]] == [str(note_ids[1]), str(note_ids[0])]
+    assert [item["theme"] for item in res.json()["items"]] == ["theme-1", "theme-0"]
+
+
+@pytest.mark.asyncio
+async def test_get_note_details_skips_missing_notes(client: AsyncClient, db: AsyncSession) -> None:
+    note_ids, deleted_note_id = await _create_detail_notes(db)
+    request_ids = [uuid4(), note_ids[0], deleted_note_id]
+
+    res = await client.post("/note/details", json={"note_ids": [str(note_id) for note_id in request_ids]})
+
+    # 存在しないノート・論理削除済のノートはエラーにせず、結果に含めない
+    assert res.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in res.json()["items"]] == [str(note_ids[0])]
+
+
+@pytest.mark.asyncio
+async def test_get_note_details_uses_cache(client: AsyncClient, db: AsyncSession) -> None:
+    note_ids, _ = await _create_detail_notes(db)
+    json_body = {"note_ids": [str(note_id) for note_id in note_ids]}
+    first = await client.post("/note/details", json=json_body)
+    assert all(note_crud.note_detail_cache.get(note_id) is not None for note_id in note_ids)
+
+    res = await client.post("/note/details", json=json_body)
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json() == first.json()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", [0, settings.NOTE_DETAILS_MAX_IDS + 1])
+async def test_get_note_details_rejects_invalid_id_count(client: AsyncClient, count: int) -> None:
+    res = await client.post("/note/details", json={"note_ids": [str(uuid4()) for _ in range(count)]})
+
+    # 0件、NOTE_DETAILS_MAX_IDSを超える件数はバリデーションエラーとする
+    assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
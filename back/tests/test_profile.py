@@ -0,0 +1,101 @@
+import datetime
+from collections.abc import Generator
+from typing import Any
+from uuid import UUID
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.api.endpoints import profile as profile_endpoint
+from app.models.base import DominantHand, Position, Profiles, Users
+
+
+@pytest.fixture(autouse=True)
+def mock_image_url(monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    """fixture: 画像URLの生成(Firebase Storageへのアクセス)をモック化する"""
+    monkeypatch.setattr(profile_endpoint, "get_image_url", lambda image_path: f"https://example.com/{image_path}")
+    yield
+
+
+async def _create_profile(db: AsyncSession) -> UUID:
+    """プロフィールを登録し、ユーザーIDを返す"""
+    user = Users(firebase_uid="profile-user", email="profile-user@example.com")
+    db.add(user)
+    await db.flush()
+    db.add(
+        Profiles(
+            user_id=user.id,
+            name="name",
+            team_name="team",
+            birthday=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc),
+            player_dominant=DominantHand.RIGHT_RIGHT,
+            player_position=Position.PITCHER,
+            introduction="introduction",
+            image_path="profiles/image.png",
+        )
+    )
+    user_id = user.id
+    await db.commit()
+    return user_id
+
+
+@pytest.mark.asyncio
+async def test_get_profile_with_fields(engine: AsyncEngine, client: AsyncClient, db: AsyncSession) -> None:
+    user_id = await _create_profile(db)
+    statements: list[str] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        res = await client.get(f"/profile/by-userid/{user_id}", params={"fields": "name,image_url"})
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert res.status_code == status.HTTP_200_OK
+    # 指定したfieldのみを返し、image_urlはimage_pathから生成する
+    assert res.json() == {"name": "name", "image_url": "https://example.com/profiles/image.png"}
+    # 指定したfield(と主キー、image_urlの生成に必要なimage_path)のcolumnのみをSELECTする
+    profile_selects = [statement for statement in statements if "FROM profiles" in statement]
+    assert len(profile_selects) == 1
+    select_columns = profile_selects[0].split("FROM")[0]
+    assert "profiles.name" in select_columns
+    assert "profiles.image_path" in select_columns
+    assert "profiles.introduction" not in select_columns
+    assert "profiles.team_name" not in select_columns
+
+
+@pytest.mark.asyncio
+async def test_get_profile_without_fields(client: AsyncClient, db: AsyncSession) -> None:
+    user_id = await _create_profile(db)
+
+    res = await client.get(f"/profile/by-userid/{user_id}")
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json()["introduction"] == "introduction"
+    assert res.json()["team_name"] == "team"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fields", ["name,unknown", "password", " , "])
+async def test_get_profile_with_invalid_fields(client: AsyncClient, db: AsyncSession, fields: str) -> None:
+    user_id = await _create_profile(db)
+
+    # レスポンスに存在しないfieldは400とする
+    res = await client.get(f"/profile/by-userid/{user_id}", params={"fields": fields})
+
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_get_all_profiles_with_fields(client: AsyncClient, db: AsyncSession) -> None:
+    user_id = await _create_profile(db)
+
+    res = await client.get("/profile/all", params={"fields": "user_id,image_url"})
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json() == {"items": [{"user_id": str(user_id), "image_url": "https://example.com/profiles/image.png"}]}
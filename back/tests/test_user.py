@@ -0,0 +1,36 @@
+from collections.abc import Generator
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import REPLICA_ENGINE
+from app.crud import user as user_crud
+from app.models.base import Users
+
+
+@pytest.fixture(autouse=True)
+def clear_current_user_cache() -> Generator[None, None, None]:
+    """fixture: テストごとにユーザーのキャッシュを空にする"""
+    user_crud.current_user_cache.clear()
+    yield
+    user_crud.current_user_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_current_user_cache_skips_replica_reads(db: AsyncSession) -> None:
+    user = Users(firebase_uid="cache-user", email="cache-user@example.com")
+    db.add(user)
+    await db.commit()
+
+    # replicaから読み取ったユーザーは、更新前のroleの可能性があるためキャッシュしない
+    db.info[REPLICA_ENGINE] = MagicMock()
+    current_user = await user_crud.resolve_current_user(db, "cache-user")
+    assert current_user is not None
+    assert user_crud.current_user_cache.get("cache-user") is None
+
+    # primaryから読み取った場合はキャッシュする
+    del db.info[REPLICA_ENGINE]
+    db.info.pop(user_crud.CURRENT_USERS_INFO_KEY)
+    current_user = await user_crud.resolve_current_user(db, "cache-user")
+    assert user_crud.current_user_cache.get("cache-user") == current_user
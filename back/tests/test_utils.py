@@ -0,0 +1,91 @@
+import time
+import uuid
+from typing import Any, Callable
+
+import pytest
+import sqlalchemy as sa
+import ulid
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import utils
+from app.core.utils import get_uuid7
+
+
+UUID_COUNT = 100_000
+# 挿入性能・index sizeの比較に使用する行数
+BENCHMARK_ROW_COUNT = 1_000_000
+BENCHMARK_BATCH_SIZE = 100_000
+
+
+def test_uuid7_version_and_variant() -> None:
+    value = get_uuid7()
+
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    # 先頭48bitはミリ秒単位のUNIX時刻
+    assert abs((value.int >> 80) - time.time_ns() // 1_000_000) < 1000
+    # ULIDとしても同じ時刻となる
+    assert ulid.from_bytes(value.bytes).timestamp().int == value.int >> 80
+
+
+def test_uuid7_is_unique_and_ordered() -> None:
+    values = [get_uuid7() for _ in range(UUID_COUNT)]
+
+    assert len(set(values)) == UUID_COUNT
+    assert values == sorted(values)
+
+
+def test_uuid7_is_monotonic_within_one_millisecond(monkeypatch: pytest.MonkeyPatch) -> None:
+    # 同じミリ秒内でカウンタ(12bit)が上限に達した場合も、次のミリ秒に進めて順序を保つ
+    monkeypatch.setattr(utils, "_uuid7_last_timestamp_ms", 0)
+    monkeypatch.setattr(time, "time_ns", lambda: 1_700_000_000_000 * 1_000_000)
+    values = [get_uuid7() for _ in range(utils._UUID7_COUNTER_MAX + 10)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    assert values[0].int >> 80 == 1_700_000_000_000
+    assert values[-1].int >> 80 == 1_700_000_000_001
+
+
+def test_uuid7_is_monotonic_when_clock_goes_back(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(utils, "_uuid7_last_timestamp_ms", 0)
+    now_ms = [1_700_000_000_000]
+    monkeypatch.setattr(time, "time_ns", lambda: now_ms[0] * 1_000_000)
+    before = get_uuid7()
+
+    now_ms[0] -= 1000
+    after = get_uuid7()
+
+    assert after > before
+
+
+async def _insert_ids(db: AsyncSession, table_name: str, generate: Callable[[], uuid.UUID]) -> tuple[float, int]:
+    """BENCHMARK_ROW_COUNT件のidを挿入し、(挿入にかかった秒数, primary keyのindexのサイズ)を返す"""
+    await db.execute(sa.text(f"CREATE TABLE {table_name} (id uuid PRIMARY KEY, created_at timestamptz DEFAULT now())"))
+    elapsed = 0.0
+    for _ in range(0, BENCHMARK_ROW_COUNT, BENCHMARK_BATCH_SIZE):
+        ids = [generate() for _ in range(BENCHMARK_BATCH_SIZE)]
+        started = time.perf_counter()
+        await db.execute(sa.text(f"INSERT INTO {table_name} (id) SELECT unnest(CAST(:ids AS uuid[]))"), {"ids": ids})
+        elapsed += time.perf_counter() - started
+    index_size = (
+        await db.execute(sa.text(f"SELECT pg_relation_size('{table_name}_pkey')"))
+    ).scalar_one()
+    return elapsed, index_size
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_uuid7_insert_locality(db: AsyncSession, capsys: Any) -> None:
+    uuid4_elapsed, uuid4_index_size = await _insert_ids(db, "bench_uuid4", uuid.uuid4)
+    uuid7_elapsed, uuid7_index_size = await _insert_ids(db, "bench_uuid7", get_uuid7)
+    await db.rollback()
+
+    with capsys.disabled():
+        print(
+            f"\n{BENCHMARK_ROW_COUNT} rows: "
+            f"uuid4 {BENCHMARK_ROW_COUNT / uuid4_elapsed:.0f} rows/s index={uuid4_index_size / 1024 / 1024:.1f}MiB, "
+            f"uuid7 {BENCHMARK_ROW_COUNT / uuid7_elapsed:.0f} rows/s index={uuid7_index_size / 1024 / 1024:.1f}MiB"
+        )
+    # uuid7はindexの末尾に追加されるため、ページ分割で空きの多いページが生じず、indexが小さくなる
+    assert uuid7_index_size < uuid4_index_size * 0.9